@@ -0,0 +1,64 @@
+import math
+
+# Twilio media streams carry 8 kHz, 8-bit G.711 µ-law audio
+SAMPLE_RATE = 8000
+BYTES_PER_MS = SAMPLE_RATE // 1000
+
+# µ-law byte that decodes to (near) zero amplitude
+ULAW_SILENCE = 0xFF
+
+def _ulaw_to_linear(value):
+    """Decode one G.711 µ-law byte to a 16-bit linear PCM sample"""
+    value = ~value & 0xFF
+    sign = value & 0x80
+    exponent = (value >> 4) & 0x07
+    mantissa = value & 0x0F
+    sample = (((mantissa << 3) + 0x84) << exponent) - 0x84
+    return -sample if sign else sample
+
+def linear_to_ulaw(sample):
+    """Encode one 16-bit linear PCM sample as a G.711 µ-law byte"""
+    sign = 0
+    if sample < 0:
+        sample = -sample
+        sign = 0x80
+    sample = min(sample, 32635) + 0x84
+    exponent = 7
+    mask = 0x4000
+    while exponent > 0 and not sample & mask:
+        exponent -= 1
+        mask >>= 1
+    mantissa = (sample >> (exponent + 3)) & 0x0F
+    return ~(sign | (exponent << 4) | mantissa) & 0xFF
+
+# Lookup tables: µ-law byte -> linear sample, and -> absolute amplitude
+ULAW_TO_LINEAR = [_ulaw_to_linear(value) for value in range(256)]
+ULAW_ABS = [abs(sample) for sample in ULAW_TO_LINEAR]
+
+def ulaw_frame_energy(frame):
+    """Mean absolute linear amplitude (0-32124) of a µ-law frame"""
+    if not frame:
+        return 0
+    return sum(map(ULAW_ABS.__getitem__, frame)) / len(frame)
+
+def frame_duration_ms(frame):
+    """Duration of a µ-law frame in milliseconds"""
+    return len(frame) / BYTES_PER_MS
+
+def synthetic_speech(duration_ms, frequency=220.0, amplitude=8000, seed=0):
+    """
+    Generate deterministic speech-like µ-law audio (a tone with syllable-rate
+    amplitude modulation) for benchmarks and offline tests
+    """
+    samples = int(duration_ms * BYTES_PER_MS)
+    phase = seed * 0.37
+    audio = bytearray(samples)
+    for i in range(samples):
+        t = i / SAMPLE_RATE
+        envelope = 0.6 + 0.4 * math.sin(2 * math.pi * 4.0 * t + phase)
+        audio[i] = linear_to_ulaw(int(amplitude * envelope * math.sin(2 * math.pi * frequency * t + phase)))
+    return bytes(audio)
+
+def silence(duration_ms):
+    """µ-law silence of the given duration"""
+    return bytes([ULAW_SILENCE]) * int(duration_ms * BYTES_PER_MS)
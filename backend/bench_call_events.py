@@ -0,0 +1,215 @@
+import os
+import json
+import time
+import uuid
+import random
+import argparse
+from datetime import datetime, timezone, timedelta
+
+from metrics import Histogram
+
+# Query latency benchmark for the analysis time-series tables.
+#
+# Seeds one busy call (10k events by default) among many quieter calls, then
+# times the queries the web dashboard runs per page load: all events for a
+# call ordered by timestamp, the latest 25 scores, and the aggregates row.
+# With --compare the composite (call_id, timestamp) indexes are dropped and
+# the queries timed again.
+#
+#   python bench_call_events.py --events 10000 --compare
+#   python bench_call_events.py --database-url postgresql://... --events 10000
+
+# ANSI colors for terminal output
+class Colors:
+    GREEN = '\033[92m'
+    YELLOW = '\033[93m'
+    RED = '\033[91m'
+    BLUE = '\033[94m'
+    ENDC = '\033[0m'
+    BOLD = '\033[1m'
+
+EVENT_TYPES = ["rudeness", "profanity", "threat", "off_topic"]
+
+# Same statements as web/src/app/api/calls/[id]/{events,scores,aggregates}/route.ts
+QUERIES = {
+    "events": "SELECT * FROM call_events WHERE call_id = :call_id ORDER BY timestamp ASC",
+    "scores": "SELECT * FROM call_scores WHERE call_id = :call_id ORDER BY timestamp DESC LIMIT 25",
+    "aggregates": "SELECT * FROM call_aggregates WHERE call_id = :call_id",
+}
+
+INDEXES = {
+    "call_events_call_id_timestamp_idx": "call_events (call_id, timestamp)",
+    "call_scores_call_id_timestamp_idx": "call_scores (call_id, timestamp)",
+}
+
+def call_rows(call_id, events, scores, started_at, rng):
+    """Synthetic event and score rows spread over a call"""
+    event_rows = []
+    for i in range(events):
+        timestamp = started_at + timedelta(milliseconds=i * 250 + rng.randint(0, 200))
+        event_rows.append({
+            "id": str(uuid.uuid4()),
+            "call_id": call_id,
+            "timestamp": timestamp.replace(tzinfo=None),
+            "epoch": int(timestamp.timestamp()),
+            "time_into_call": int((timestamp - started_at).total_seconds()),
+            "type": rng.choice(EVENT_TYPES),
+            "description": "Synthetic benchmark event",
+        })
+    score_rows = []
+    for i in range(scores):
+        timestamp = started_at + timedelta(seconds=i * 5)
+        score_rows.append({
+            "id": str(uuid.uuid4()),
+            "call_id": call_id,
+            "timestamp": timestamp.replace(tzinfo=None),
+            "epoch": int(timestamp.timestamp()),
+            "politeness_score": round(rng.uniform(1, 10), 2),
+        })
+    return event_rows, score_rows
+
+def seed(engine, busy_call_id, args, rng):
+    from sqlalchemy import text
+
+    insert_event = text("""
+        INSERT INTO call_events (id, call_id, timestamp, epoch, time_into_call, type, description)
+        VALUES (:id, :call_id, :timestamp, :epoch, :time_into_call, :type, :description)
+    """)
+    insert_score = text("""
+        INSERT INTO call_scores (id, call_id, timestamp, epoch, politeness_score)
+        VALUES (:id, :call_id, :timestamp, :epoch, :politeness_score)
+    """)
+    now = datetime.now(timezone.utc)
+    calls = [(busy_call_id, args.events, args.scores)]
+    calls += [(f"bench-{i:05d}", args.noise_events, args.noise_scores) for i in range(args.noise_calls)]
+
+    started_at = time.perf_counter()
+    with engine.begin() as conn:
+        for index, (call_id, events, scores) in enumerate(calls):
+            # Interleave calls in time so a busy call's rows are not contiguous
+            call_start = now - timedelta(hours=2) + timedelta(seconds=index)
+            event_rows, score_rows = call_rows(call_id, events, scores, call_start, rng)
+            if event_rows:
+                conn.execute(insert_event, event_rows)
+            if score_rows:
+                conn.execute(insert_score, score_rows)
+        conn.execute(text("""
+            INSERT INTO call_aggregates (call_id, event_count, score_count, updated_epoch)
+            SELECT call_id, COUNT(*), 0, MAX(epoch) FROM call_events GROUP BY call_id
+        """))
+    return time.perf_counter() - started_at, sum(c[1] for c in calls), sum(c[2] for c in calls)
+
+def time_queries(engine, call_id, iterations):
+    from sqlalchemy import text
+
+    results = {}
+    with engine.connect() as conn:
+        for name, sql in QUERIES.items():
+            statement = text(sql)
+            # Warm up caches and the connection's statement cache
+            rows = len(conn.execute(statement, {"call_id": call_id}).fetchall())
+            histogram = Histogram(window=iterations)
+            for _ in range(iterations):
+                started_at = time.perf_counter()
+                conn.execute(statement, {"call_id": call_id}).fetchall()
+                histogram.observe(time.perf_counter() - started_at)
+            results[name] = dict(histogram.snapshot(), rows=rows)
+    return results
+
+def drop_indexes(engine):
+    from sqlalchemy import text
+
+    with engine.begin() as conn:
+        for name in INDEXES:
+            conn.execute(text(f"DROP INDEX IF EXISTS {name}"))
+
+def run_benchmark(args):
+    database_url = args.database_url or f"sqlite:///{os.path.abspath(args.sqlite_path)}"
+    if not args.database_url and os.path.exists(args.sqlite_path):
+        os.remove(args.sqlite_path)
+    os.environ["DATABASE_URL"] = database_url
+
+    from sqlalchemy import create_engine, text
+    import migrations
+
+    engine = create_engine(database_url)
+    migrations.migrate(engine)
+
+    rng = random.Random(args.seed)
+    busy_call_id = f"bench-busy-{uuid.uuid4().hex[:8]}"
+    print(f"{Colors.BLUE}Seeding {args.events} events for {busy_call_id} plus {args.noise_calls} other calls...{Colors.ENDC}")
+    seed_seconds, total_events, total_scores = seed(engine, busy_call_id, args, rng)
+
+    with engine.connect() as conn:
+        partitioned = {table: migrations.is_partitioned(conn, table) for table in migrations.PARTITIONED_TABLES}
+
+    report = {
+        "database": engine.dialect.name,
+        "partitioned": partitioned,
+        "busy_call_events": args.events,
+        "total_events": total_events,
+        "total_scores": total_scores,
+        "seed_seconds": round(seed_seconds, 2),
+        "with_indexes": time_queries(engine, busy_call_id, args.iterations),
+    }
+    if args.compare:
+        drop_indexes(engine)
+        report["without_indexes"] = time_queries(engine, busy_call_id, args.iterations)
+        # Restore the indexes for a reused --database-url
+        with engine.begin() as conn:
+            for name, target in INDEXES.items():
+                conn.execute(text(f"CREATE INDEX IF NOT EXISTS {name} ON {target}"))
+
+    if args.database_url and not args.keep:
+        with engine.begin() as conn:
+            for table in ("call_events", "call_scores", "call_aggregates"):
+                conn.execute(text(f"DELETE FROM {table} WHERE call_id LIKE 'bench-%'"))
+    return report
+
+def print_report(report):
+    def ms(value):
+        return f"{value * 1000:.2f}" if value is not None else "-"
+
+    print(f"\n{Colors.BOLD}===== call_events / call_scores query benchmark ====={Colors.ENDC}")
+    print(f"Database: {report['database']}  Partitioned: {report['partitioned']}")
+    print(f"Rows: {report['total_events']} events, {report['total_scores']} scores (busy call: {report['busy_call_events']} events)")
+    print(f"Seeded in {report['seed_seconds']}s")
+    for label in ("with_indexes", "without_indexes"):
+        if label not in report:
+            continue
+        print(f"\n{label.replace('_', ' ')}")
+        print(f"{'query':<14}{'rows':>8}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'max ms':>10}")
+        for name, summary in report[label].items():
+            print(f"{name:<14}{summary['rows']:>8}{ms(summary['p50']):>10}{ms(summary['p95']):>10}{ms(summary['p99']):>10}{ms(summary['max']):>10}")
+    if "without_indexes" in report:
+        print()
+        for name in ("events", "scores"):
+            before = report["without_indexes"][name]["p50"]
+            after = report["with_indexes"][name]["p50"]
+            if before and after:
+                print(f"{Colors.GREEN}{name} p50: {before / after:.1f}x faster with the (call_id, timestamp) index{Colors.ENDC}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark dashboard queries against a busy call's events and scores")
+    parser.add_argument("--events", type=int, default=10000, help="Events for the busy call")
+    parser.add_argument("--scores", type=int, default=2000, help="Scores for the busy call")
+    parser.add_argument("--noise-calls", type=int, default=200, help="Other calls in the tables")
+    parser.add_argument("--noise-events", type=int, default=200, help="Events per other call")
+    parser.add_argument("--noise-scores", type=int, default=40, help="Scores per other call")
+    parser.add_argument("--iterations", type=int, default=50, help="Timed runs per query")
+    parser.add_argument("--compare", action="store_true", help="Also time the queries without the composite indexes")
+    parser.add_argument("--database-url", help="Benchmark this database instead of a fresh SQLite file")
+    parser.add_argument("--sqlite-path", default="bench_events.sqlite3")
+    parser.add_argument("--keep", action="store_true", help="Keep seeded rows in --database-url")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--json", action="store_true", help="Print the report as JSON")
+    args = parser.parse_args()
+
+    report = run_benchmark(args)
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        print_report(report)
+
+if __name__ == "__main__":
+    main()
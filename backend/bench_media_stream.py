@@ -0,0 +1,345 @@
+import os
+import sys
+import json
+import time
+import asyncio
+import argparse
+import subprocess
+from types import SimpleNamespace
+
+import websockets
+
+from metrics import Histogram
+from audio_utils import synthetic_speech, silence, BYTES_PER_MS
+
+# Offline concurrency benchmark for phone_caller.stream_endpoint.
+#
+# Runs phone_caller in a subprocess with deterministic local fakes for STT
+# (an in-process Google Speech client stand-in), LLM and TTS (fake_providers),
+# then opens many websocket connections that stream µ-law speech at real-time
+# pace and measures per-connection CPU/memory, server event-loop lag and turn
+# latency (end of user speech -> first response audio byte).
+#
+#   python bench_media_stream.py --connections 200 --utterances 3
+#   python bench_media_stream.py --connections 50 --audio recorded_8k.ulaw
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# 20 ms frames, the packetization Twilio uses for media streams
+FRAME_MS = 20
+
+# ANSI colors for terminal output
+class Colors:
+    GREEN = '\033[92m'
+    YELLOW = '\033[93m'
+    RED = '\033[91m'
+    BLUE = '\033[94m'
+    ENDC = '\033[0m'
+    BOLD = '\033[1m'
+
+BENCH_WORDS = ["I", "would", "like", "to", "check", "on", "my", "order", "please", "thanks"]
+
+# ==================== SERVER SIDE (--serve) ====================
+
+class DeterministicSpeechClient:
+    """Stand-in for google.cloud.speech.SpeechClient with fixed latency and output"""
+
+    latency_seconds = float(os.getenv("BENCH_STT_LATENCY_MS", "150")) / 1000.0
+
+    def __init__(self, *args, **kwargs):
+        pass
+
+    def recognize(self, config=None, audio=None, **kwargs):
+        # Blocking on purpose: the real client call in transcribe_audio blocks too
+        time.sleep(self.latency_seconds)
+        content = getattr(audio, "content", b"") or b""
+        words = max(1, len(content) // (BYTES_PER_MS * 400))
+        transcript = " ".join(BENCH_WORDS[i % len(BENCH_WORDS)] for i in range(words))
+        alternative = SimpleNamespace(transcript=transcript, confidence=0.99)
+        return SimpleNamespace(results=[SimpleNamespace(alternatives=[alternative], is_final=True)])
+
+    def streaming_recognize(self, requests, **kwargs):
+        for _ in requests:
+            pass
+        return iter(())
+
+def read_process_stats():
+    """CPU seconds used and current RSS (bytes) of this process"""
+    times = os.times()
+    rss = None
+    try:
+        with open("/proc/self/statm") as f:
+            rss = int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError):
+        import resource
+        rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+    return {"cpu_seconds": times.user + times.system, "rss_bytes": rss}
+
+def serve(args):
+    """Run phone_caller with fake STT and a loop-lag sampler"""
+    from google.cloud import speech
+    speech.SpeechClient = DeterministicSpeechClient
+
+    import uvicorn
+    import phone_caller
+
+    loop_lag = Histogram(buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0), window=100000)
+
+    async def sample_loop_lag():
+        interval = 0.05
+        while True:
+            started_at = time.perf_counter()
+            await asyncio.sleep(interval)
+            loop_lag.observe(max(0.0, time.perf_counter() - started_at - interval))
+
+    async def start_sampler():
+        asyncio.get_running_loop().create_task(sample_loop_lag())
+
+    async def bench_stats():
+        return {
+            "process": read_process_stats(),
+            "loop_lag": loop_lag.snapshot(),
+            "open_streams": sum(1 for c in phone_caller.conversations.values() if c.get("state")),
+            "latency": phone_caller.turn_latency.snapshot(),
+        }
+
+    phone_caller.app.add_event_handler("startup", start_sampler)
+    phone_caller.app.add_api_route("/bench/stats", bench_stats, methods=["GET"])
+    uvicorn.run(phone_caller.app, host="127.0.0.1", port=args.server_port, log_config=None, ws="websockets")
+
+# ==================== CLIENT SIDE ====================
+
+class ConnectionResult:
+    def __init__(self):
+        self.connected = False
+        self.error = None
+        self.turns = 0
+        self.timeouts = 0
+        self.response_bytes = 0
+        self.waiting_since = None
+        self.response_started = asyncio.Event()
+
+async def send_realtime(websocket, audio, deadline_state):
+    """Send audio in 20 ms frames on a drift-free real-time schedule"""
+    frame_bytes = FRAME_MS * BYTES_PER_MS
+    for offset in range(0, len(audio), frame_bytes):
+        await websocket.send(audio[offset:offset + frame_bytes])
+        deadline_state["next"] += FRAME_MS / 1000.0
+        delay = deadline_state["next"] - time.perf_counter()
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+async def receive_responses(websocket, result, turn_latency):
+    async for message in websocket:
+        # Heartbeats are a single 0x00 byte; anything longer is response audio
+        if isinstance(message, bytes) and len(message) > 1:
+            result.response_bytes += len(message)
+            if result.waiting_since is not None:
+                turn_latency.observe(time.perf_counter() - result.waiting_since)
+                result.waiting_since = None
+                result.response_started.set()
+
+async def run_connection(index, args, speech_audio, turn_latency):
+    result = ConnectionResult()
+    frame_silence = silence(FRAME_MS)
+    try:
+        async with websockets.connect(f"ws://127.0.0.1:{args.server_port}/stream/BENCH{index:06d}", max_size=None) as websocket:
+            result.connected = True
+            receiver = asyncio.create_task(receive_responses(websocket, result, turn_latency))
+            deadline_state = {"next": time.perf_counter()}
+
+            # Lead-in silence, as a caller would produce before speaking
+            await send_realtime(websocket, silence(args.lead_in_ms), deadline_state)
+
+            for _ in range(args.utterances):
+                result.response_started.clear()
+                await send_realtime(websocket, speech_audio, deadline_state)
+                result.waiting_since = time.perf_counter()
+
+                # Keep streaming silence (Twilio never stops sending) until the response arrives
+                wait_deadline = time.perf_counter() + args.turn_timeout
+                while not result.response_started.is_set() and time.perf_counter() < wait_deadline:
+                    await send_realtime(websocket, frame_silence, deadline_state)
+
+                if result.response_started.is_set():
+                    result.turns += 1
+                else:
+                    result.timeouts += 1
+                    result.waiting_since = None
+
+                # Let the response play out before the next utterance
+                await send_realtime(websocket, silence(args.gap_ms), deadline_state)
+
+            receiver.cancel()
+    except Exception as e:
+        result.error = str(e)
+    return result
+
+async def sample_client_lag(histogram, stop_event):
+    interval = 0.05
+    while not stop_event.is_set():
+        started_at = time.perf_counter()
+        await asyncio.sleep(interval)
+        histogram.observe(max(0.0, time.perf_counter() - started_at - interval))
+
+async def fetch_json(url):
+    """Minimal GET returning JSON, without adding an HTTP client dependency"""
+    loop = asyncio.get_running_loop()
+
+    def get():
+        import urllib.request
+        with urllib.request.urlopen(url, timeout=5) as response:
+            return json.loads(response.read())
+
+    return await loop.run_in_executor(None, get)
+
+async def wait_until_ready(url, timeout=60.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            return await fetch_json(url)
+        except Exception:
+            await asyncio.sleep(0.25)
+    return None
+
+async def run_benchmark(args):
+    fake_url = f"http://127.0.0.1:{args.fake_port}"
+    server_url = f"http://127.0.0.1:{args.server_port}"
+
+    env = dict(
+        os.environ,
+        FAKE_PROVIDER_LATENCY_MS=str(args.provider_latency_ms),
+        BENCH_STT_LATENCY_MS=str(args.stt_latency_ms),
+        OPENAI_API_BASE=f"{fake_url}/v1",
+        OPENAI_API_KEY="bench",
+        ELEVENLABS_BASE_URL=fake_url,
+        ELEVENLABS_API_KEY="bench",
+        TWILIO_ACCOUNT_SID=os.getenv("TWILIO_ACCOUNT_SID", "ACbench"),
+        TWILIO_AUTH_TOKEN=os.getenv("TWILIO_AUTH_TOKEN", "bench"),
+        LOG_LEVEL=args.server_log_level,
+        # The fake LLM repeats its replies, so a TTS cache would hide synthesis cost
+        TTS_CACHE_ENABLED=os.getenv("TTS_CACHE_ENABLED", "0"),
+        TTS_WARMUP_ON_STARTUP="0",
+    )
+    processes = [
+        subprocess.Popen([sys.executable, "-m", "uvicorn", "fake_providers:app", "--port", str(args.fake_port), "--log-level", "warning"],
+                         cwd=BACKEND_DIR, env=env, stdout=subprocess.DEVNULL),
+        subprocess.Popen([sys.executable, os.path.abspath(__file__), "--serve", "--server-port", str(args.server_port)],
+                         cwd=BACKEND_DIR, env=env),
+    ]
+
+    try:
+        if await wait_until_ready(f"{fake_url}/_stats") is None or await wait_until_ready(f"{server_url}/bench/stats") is None:
+            print(f"{Colors.RED}Services did not start in time{Colors.ENDC}")
+            return None
+
+        if args.audio:
+            with open(args.audio, "rb") as f:
+                speech_audio = f.read()
+        else:
+            speech_audio = synthetic_speech(args.speech_ms)
+
+        baseline = await fetch_json(f"{server_url}/bench/stats")
+        turn_latency = Histogram(window=1_000_000)
+        client_lag = Histogram(window=100000)
+        stop_event = asyncio.Event()
+        lag_task = asyncio.create_task(sample_client_lag(client_lag, stop_event))
+
+        print(f"{Colors.BLUE}Opening {args.connections} streams over {args.ramp_seconds}s...{Colors.ENDC}")
+        started_at = time.perf_counter()
+        tasks = []
+        for index in range(args.connections):
+            tasks.append(asyncio.create_task(run_connection(index, args, speech_audio, turn_latency)))
+            if args.ramp_seconds:
+                await asyncio.sleep(args.ramp_seconds / args.connections)
+
+        # Sample the server while every stream is open
+        await asyncio.sleep(max(0.0, args.ramp_seconds * 0.1))
+        peak = await fetch_json(f"{server_url}/bench/stats")
+
+        results = await asyncio.gather(*tasks)
+        elapsed = time.perf_counter() - started_at
+        final = await fetch_json(f"{server_url}/bench/stats")
+        stop_event.set()
+        await lag_task
+    finally:
+        for process in processes:
+            process.terminate()
+        for process in processes:
+            try:
+                process.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                process.kill()
+
+    connected = sum(1 for r in results if r.connected)
+    cpu_used = final["process"]["cpu_seconds"] - baseline["process"]["cpu_seconds"]
+    rss_growth = max(peak["process"]["rss_bytes"], final["process"]["rss_bytes"]) - baseline["process"]["rss_bytes"]
+
+    return {
+        "connections": args.connections,
+        "connected": connected,
+        "errors": sorted({r.error for r in results if r.error}),
+        "turns_completed": sum(r.turns for r in results),
+        "turn_timeouts": sum(r.timeouts for r in results),
+        "elapsed_seconds": round(elapsed, 2),
+        "turn_latency": turn_latency.snapshot(),
+        "server_loop_lag": final["loop_lag"],
+        "client_loop_lag": client_lag.snapshot(),
+        "server_stage_latency": final["latency"],
+        "server_cpu_seconds": round(cpu_used, 3),
+        "cpu_percent_per_connection": round(100.0 * cpu_used / elapsed / connected, 3) if connected and elapsed else None,
+        "rss_growth_bytes": rss_growth,
+        "rss_bytes_per_connection": int(rss_growth / connected) if connected else None,
+    }
+
+def print_report(report):
+    def ms(value):
+        return f"{value * 1000:.1f} ms" if value is not None else "-"
+
+    print(f"\n{Colors.BOLD}===== phone_caller media stream benchmark ====={Colors.ENDC}")
+    print(f"Connections: {report['connected']}/{report['connections']}  Elapsed: {report['elapsed_seconds']}s")
+    if report["errors"]:
+        print(f"{Colors.RED}Errors: {report['errors'][:5]}{Colors.ENDC}")
+    color = Colors.RED if report["turn_timeouts"] else Colors.GREEN
+    print(f"Turns: {report['turns_completed']}  Timeouts: {color}{report['turn_timeouts']}{Colors.ENDC}")
+    for name in ("turn_latency", "server_loop_lag", "client_loop_lag"):
+        summary = report[name]
+        print(f"{name:<18} p50 {ms(summary['p50']):>10}  p95 {ms(summary['p95']):>10}  p99 {ms(summary['p99']):>10}  max {ms(summary['max']):>10}")
+    print(f"Server CPU: {report['server_cpu_seconds']}s  ({report['cpu_percent_per_connection']}% of a core per connection)")
+    print(f"Server RSS growth: {report['rss_growth_bytes'] / 1e6:.1f} MB  ({report['rss_bytes_per_connection']} bytes per connection)")
+    if report["client_loop_lag"]["p99"] and report["client_loop_lag"]["p99"] > 0.02:
+        print(f"{Colors.YELLOW}Client loop lag is high; the load generator itself may be the bottleneck{Colors.ENDC}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark phone_caller media-stream concurrency with synthetic callers")
+    parser.add_argument("--serve", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--connections", type=int, default=50, help="Concurrent websocket streams")
+    parser.add_argument("--ramp-seconds", type=float, default=5.0, help="Spread connection setup over this many seconds")
+    parser.add_argument("--utterances", type=int, default=3, help="Utterances per connection")
+    parser.add_argument("--speech-ms", type=int, default=1500, help="Synthetic utterance length")
+    parser.add_argument("--audio", help="Raw 8 kHz µ-law file to use as the utterance instead of synthetic speech")
+    parser.add_argument("--lead-in-ms", type=int, default=200)
+    parser.add_argument("--gap-ms", type=int, default=1500, help="Silence after each response before speaking again")
+    parser.add_argument("--turn-timeout", type=float, default=10.0, help="Seconds to wait for response audio")
+    parser.add_argument("--stt-latency-ms", type=float, default=150)
+    parser.add_argument("--provider-latency-ms", type=float, default=100, help="Fake LLM/TTS latency")
+    parser.add_argument("--server-port", type=int, default=8300)
+    parser.add_argument("--fake-port", type=int, default=8101)
+    parser.add_argument("--server-log-level", default="WARNING")
+    parser.add_argument("--json", action="store_true", help="Print the report as JSON")
+    args = parser.parse_args()
+
+    if args.serve:
+        serve(args)
+        return
+
+    report = asyncio.run(run_benchmark(args))
+    if report is None:
+        sys.exit(1)
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        print_report(report)
+
+if __name__ == "__main__":
+    main()
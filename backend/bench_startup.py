@@ -0,0 +1,172 @@
+import os
+import re
+import sys
+import json
+import time
+import argparse
+import statistics
+import subprocess
+
+# Startup-time benchmark for the backend entry points.
+#
+# Imports each module in a fresh interpreter with `python -X importtime` and
+# reports the module's cumulative import time, the process wall time, and
+# the heaviest imports the module makes directly. --with-clients also builds
+# the STT/LLM provider clients after the import, i.e. the work that used to
+# happen at import time and now happens on first use or in the background
+# pre-warm.
+# Results can be saved with --json and compared against a saved run.
+#
+#   python bench_startup.py
+#   python bench_startup.py --modules phone_caller --runs 10 --with-clients
+#   python bench_startup.py --json > startup.json
+#   python bench_startup.py --baseline startup.json --max-regression 20
+
+# ANSI colors for terminal output
+class Colors:
+    GREEN = '\033[92m'
+    YELLOW = '\033[93m'
+    RED = '\033[91m'
+    BLUE = '\033[94m'
+    ENDC = '\033[0m'
+    BOLD = '\033[1m'
+
+DEFAULT_MODULES = ["phone_caller", "vapi_server", "test_api_keys"]
+
+# "import time:       412 |        980 |   encodings.utf_8"
+IMPORT_TIME_LINE = re.compile(r"^import time:\s+(\d+) \|\s+(\d+) \|( +)(\S+)$")
+
+BUILD_CLIENTS = "import provider_clients; [c.get() for c in (provider_clients.google_speech, provider_clients.openai_client)]"
+
+def run_once(module, with_clients=False):
+    """
+    Import a module in a fresh interpreter
+
+    Returns:
+        dict: wall time, the module's cumulative import time and
+            (package, cumulative) for each import the module made directly, in ms
+    """
+    code = f"import {module}"
+    if with_clients:
+        code += f"; {BUILD_CLIENTS}"
+    backend_dir = os.path.dirname(os.path.abspath(__file__))
+    # Configuration the servers read at import (the engine is not connected)
+    env = dict(os.environ)
+    env.setdefault("DATABASE_URL", "sqlite:///bench_startup.sqlite3")
+    env.setdefault("API_BASE_URL", "http://localhost:8000")
+    started_at = time.perf_counter()
+    completed = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        cwd=backend_dir, env=env, capture_output=True, text=True
+    )
+    wall_ms = (time.perf_counter() - started_at) * 1000
+    if completed.returncode != 0:
+        error = completed.stderr.strip().splitlines()[-1] if completed.stderr.strip() else "no output"
+        raise RuntimeError(f"import {module} failed: {error}")
+
+    # Lines come in completion order, indented two spaces per nesting level,
+    # so a module's direct imports are the level-1 lines just before it
+    direct = []
+    children = []
+    module_ms = None
+    for line in completed.stderr.splitlines():
+        match = IMPORT_TIME_LINE.match(line)
+        if not match:
+            continue
+        cumulative_ms = int(match.group(2)) / 1000.0
+        package = match.group(4)
+        depth = (len(match.group(3)) - 1) // 2
+        if depth == 1:
+            children.append((package, cumulative_ms))
+        elif depth == 0:
+            if package == module:
+                module_ms = cumulative_ms
+                direct = children
+            children = []
+    return {"wall_ms": wall_ms, "import_ms": module_ms, "direct": direct}
+
+def bench_module(module, runs, with_clients=False, top=10):
+    # One untimed run so bytecode compilation is not measured
+    run_once(module, with_clients)
+    samples = [run_once(module, with_clients) for _ in range(runs)]
+
+    heaviest = {}
+    for sample in samples:
+        for package, cumulative_ms in sample["direct"]:
+            heaviest.setdefault(package, []).append(cumulative_ms)
+    heaviest = sorted(((package, statistics.median(values)) for package, values in heaviest.items()), key=lambda item: -item[1])
+
+    import_times = [sample["import_ms"] for sample in samples if sample["import_ms"] is not None]
+    return {
+        "module": module,
+        "with_clients": with_clients,
+        "runs": runs,
+        "wall_ms": round(statistics.median(sample["wall_ms"] for sample in samples), 1),
+        "import_ms": round(statistics.median(import_times), 1) if import_times else None,
+        "import_ms_min": round(min(import_times), 1) if import_times else None,
+        "heaviest": [{"package": package, "cumulative_ms": round(ms, 1)} for package, ms in heaviest[:top]],
+    }
+
+def _key(result):
+    return f"{result['module']}{'+clients' if result['with_clients'] else ''}"
+
+def compare(results, baseline_path, max_regression):
+    """Print changes against a saved run; True if every import stayed within max_regression percent"""
+    with open(baseline_path) as f:
+        baseline = {_key(result): result for result in json.load(f)}
+    ok = True
+    print(f"\n{Colors.BOLD}===== Compared with {baseline_path} ====={Colors.ENDC}")
+    for result in results:
+        before = baseline.get(_key(result))
+        if not before or not before.get("import_ms") or result["import_ms"] is None:
+            print(f"  {_key(result):<28} no baseline")
+            continue
+        change = (result["import_ms"] - before["import_ms"]) / before["import_ms"] * 100
+        regressed = max_regression is not None and change > max_regression
+        ok = ok and not regressed
+        color = Colors.RED if regressed else Colors.GREEN if change <= 0 else Colors.YELLOW
+        print(f"  {_key(result):<28} {before['import_ms']:>8.1f} -> {result['import_ms']:>8.1f} ms  {color}{change:+.1f}%{Colors.ENDC}")
+    return ok
+
+def print_results(results):
+    for result in results:
+        title = _key(result)
+        print(f"\n{Colors.BOLD}===== {title} ({result['runs']} runs, median) ====={Colors.ENDC}")
+        import_ms = f"{result['import_ms']:.1f} ms" if result["import_ms"] is not None else "-"
+        print(f"  Import:  {Colors.GREEN}{import_ms}{Colors.ENDC}  (min {result['import_ms_min']} ms)")
+        print(f"  Process: {result['wall_ms']:.1f} ms (interpreter start to exit)")
+        print(f"  Heaviest imports made by {result['module']}:")
+        for entry in result["heaviest"]:
+            print(f"    {entry['cumulative_ms']:>8.1f} ms  {entry['package']}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark import/startup time with python -X importtime")
+    parser.add_argument("--modules", nargs="+", default=DEFAULT_MODULES)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=10, help="Heaviest imports to list")
+    parser.add_argument("--with-clients", action="store_true", help="Also time import plus provider client construction")
+    parser.add_argument("--baseline", help="JSON from an earlier --json run to compare with")
+    parser.add_argument("--max-regression", type=float, help="Exit 1 if an import got slower by more than this percent")
+    parser.add_argument("--json", action="store_true", help="Print results as JSON")
+    args = parser.parse_args()
+
+    results = []
+    failed = False
+    for module in args.modules:
+        for with_clients in ([False, True] if args.with_clients else [False]):
+            try:
+                results.append(bench_module(module, args.runs, with_clients, args.top))
+            except RuntimeError as e:
+                failed = True
+                print(f"{Colors.RED}{e}{Colors.ENDC}", file=sys.stderr)
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        print_results(results)
+    if args.baseline and not compare(results, args.baseline, args.max_regression):
+        return 1
+    return 1 if failed else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
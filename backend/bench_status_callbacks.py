@@ -0,0 +1,226 @@
+import os
+import sys
+import json
+import time
+import uuid
+import hmac
+import base64
+import random
+import asyncio
+import hashlib
+import argparse
+from urllib.parse import urlencode, unquote_plus, parse_qsl
+
+from metrics import Histogram
+from twilio_callbacks import CallStatusEvent, SignatureValidator, StatusBatcher, parse_form
+
+# Throughput benchmark for Twilio status callback ingestion.
+#
+# In-process (default) it times each step of handling a callback on realistic
+# bodies: the old split('&')/unquote_plus loop and parse_qsl against
+# parse_form, a fresh HMAC per request against the cached key schedule (and
+# the twilio SDK's validator when installed), building the typed event, and
+# the whole pipeline into a StatusBatcher. With --url it posts signed
+# callbacks to a running phone_caller and reports callbacks per second and
+# request latency.
+#
+#   python bench_status_callbacks.py --callbacks 50000
+#   python bench_status_callbacks.py --url http://localhost:8000/call-status --callbacks 5000 --concurrency 50
+
+# ANSI colors for terminal output
+class Colors:
+    GREEN = '\033[92m'
+    YELLOW = '\033[93m'
+    RED = '\033[91m'
+    BLUE = '\033[94m'
+    ENDC = '\033[0m'
+    BOLD = '\033[1m'
+
+AUTH_TOKEN = "bench-auth-token-0123456789abcdef"
+CALLBACK_URL = "https://voice.example.com/call-status"
+STATUSES = ["initiated", "ringing", "in-progress", "completed"]
+
+def callback_params(call_sid, status, sequence_number, rng):
+    """A status callback body with the parameters Twilio sends"""
+    return {
+        "AccountSid": "AC" + uuid.UUID(int=rng.getrandbits(128)).hex,
+        "ApiVersion": "2010-04-01",
+        "CallSid": call_sid,
+        "CallStatus": status,
+        "CallDuration": str(rng.randint(0, 600)) if status == "completed" else "",
+        "Called": "+15558675310",
+        "CalledCity": "SAN FRANCISCO",
+        "CalledCountry": "US",
+        "CalledState": "CA",
+        "CalledZip": "94105",
+        "Caller": "+15017122661",
+        "CallerCity": "NEW YORK",
+        "CallerCountry": "US",
+        "CallerState": "NY",
+        "CallerZip": "10001",
+        "Direction": "outbound-api",
+        "From": "+15017122661",
+        "SequenceNumber": str(sequence_number),
+        "Timestamp": "Mon, 19 Oct 2026 12:00:00 +0000",
+        "To": "+15558675310",
+        "CallbackSource": "call-progress-events",
+    }
+
+def sign(url, params, auth_token=AUTH_TOKEN):
+    payload = url + "".join(key + value for key, value in sorted(params.items()))
+    return base64.b64encode(hmac.new(auth_token.encode(), payload.encode(), hashlib.sha1).digest()).decode()
+
+def generate(count, seed):
+    """(body, signature) pairs: calls moving through their statuses"""
+    rng = random.Random(seed)
+    callbacks = []
+    while len(callbacks) < count:
+        call_sid = "CA" + uuid.UUID(int=rng.getrandbits(128)).hex
+        for sequence_number, status in enumerate(STATUSES):
+            params = callback_params(call_sid, status, sequence_number, rng)
+            callbacks.append((urlencode(params).encode(), sign(CALLBACK_URL, params)))
+    return callbacks[:count]
+
+# ==================== IN-PROCESS ====================
+
+def split_parse(body):
+    """The hand-written parser /call-status used before"""
+    form_data = {}
+    for pair in body.decode('utf-8').split('&'):
+        if '=' in pair:
+            key, value = pair.split('=', 1)
+            form_data[key] = unquote_plus(value)
+    return form_data
+
+def fresh_hmac_validate(url, pairs, signature):
+    payload = url + "".join(key + value for key, value in sorted(pairs))
+    computed = base64.b64encode(hmac.new(AUTH_TOKEN.encode(), payload.encode(), hashlib.sha1).digest())
+    return hmac.compare_digest(computed, signature.encode())
+
+def rate(function, items, repeat):
+    """Items per second (best of `repeat` runs)"""
+    best = None
+    for _ in range(repeat):
+        started_at = time.perf_counter()
+        for item in items:
+            function(item)
+        elapsed = time.perf_counter() - started_at
+        best = elapsed if best is None else min(best, elapsed)
+    return len(items) / best
+
+async def pipeline_rate(callbacks, validator):
+    """Callbacks per second through parse, validate, event and batcher (flushes included)"""
+    applied = []
+    batcher = StatusBatcher(applied.extend, flush_interval_ms=5)
+    started_at = time.perf_counter()
+    for index, (body, signature) in enumerate(callbacks):
+        pairs = parse_form(body)
+        if not validator.validate(CALLBACK_URL, pairs, signature):
+            raise RuntimeError("Signature mismatch")
+        batcher.submit(CallStatusEvent.from_form(dict(pairs)))
+        if index % 1000 == 999:
+            await asyncio.sleep(0)  # let the flusher run, as between requests
+    await batcher.close()
+    return len(callbacks) / (time.perf_counter() - started_at), len(applied)
+
+def run_in_process(args):
+    callbacks = generate(args.callbacks, args.seed)
+    bodies = [body for body, _ in callbacks]
+    parsed = [(parse_form(body), signature) for body, signature in callbacks]
+    validator = SignatureValidator(AUTH_TOKEN)
+
+    results = {
+        "parse": {
+            "split_unquote": rate(split_parse, bodies, args.repeat),
+            "parse_qsl": rate(lambda body: parse_qsl(body.decode(), keep_blank_values=True), bodies, args.repeat),
+            "parse_form": rate(parse_form, bodies, args.repeat),
+        },
+        "signature": {
+            "fresh_hmac": rate(lambda item: fresh_hmac_validate(CALLBACK_URL, *item), parsed, args.repeat),
+            "cached_hmac": rate(lambda item: validator.validate(CALLBACK_URL, *item), parsed, args.repeat),
+        },
+        "event": {
+            "from_form": rate(lambda item: CallStatusEvent.from_form(dict(item[0])), parsed, args.repeat),
+        },
+    }
+    try:
+        from twilio.request_validator import RequestValidator
+        sdk = RequestValidator(AUTH_TOKEN)
+        results["signature"]["twilio_sdk"] = rate(lambda item: sdk.validate(CALLBACK_URL, dict(item[0]), item[1]), parsed, args.repeat)
+    except ImportError:
+        pass
+
+    pipeline, applied = asyncio.run(pipeline_rate(callbacks, validator))
+    results["pipeline"] = {"callbacks_per_second": pipeline, "transitions_applied": applied}
+    return results
+
+# ==================== HTTP ====================
+
+async def run_http(args):
+    import aiohttp
+
+    callbacks = []
+    rng = random.Random(args.seed)
+    while len(callbacks) < args.callbacks:
+        call_sid = "CA" + uuid.UUID(int=rng.getrandbits(128)).hex
+        for sequence_number, status in enumerate(STATUSES):
+            params = callback_params(call_sid, status, sequence_number, rng)
+            callbacks.append((params, sign(args.url, params, args.auth_token)))
+    callbacks = callbacks[:args.callbacks]
+
+    latency = Histogram(window=len(callbacks))
+    statuses = {}
+    queue = asyncio.Queue()
+    for callback in callbacks:
+        queue.put_nowait(callback)
+
+    async def worker(session):
+        while not queue.empty():
+            params, signature = queue.get_nowait()
+            started_at = time.perf_counter()
+            async with session.post(args.url, data=params, headers={"X-Twilio-Signature": signature}) as response:
+                await response.read()
+                statuses[response.status] = statuses.get(response.status, 0) + 1
+            latency.observe(time.perf_counter() - started_at)
+
+    connector = aiohttp.TCPConnector(limit=args.concurrency)
+    async with aiohttp.ClientSession(connector=connector) as session:
+        started_at = time.perf_counter()
+        await asyncio.gather(*(worker(session) for _ in range(args.concurrency)))
+        elapsed = time.perf_counter() - started_at
+    summary = latency.snapshot()
+    return {
+        "callbacks": len(callbacks),
+        "callbacks_per_second": len(callbacks) / elapsed,
+        "statuses": statuses,
+        "latency_ms": {key: round(summary[key] * 1000, 2) for key in ("avg", "p50", "p95", "p99", "max")},
+    }
+
+def print_results(results):
+    print(f"\n{Colors.BOLD}===== Status callback ingestion (per second) ====={Colors.ENDC}")
+    for step, variants in results.items():
+        for name, value in variants.items():
+            formatted = f"{value:,.0f}" if isinstance(value, float) else str(value)
+            print(f"  {step:<10} {name:<22} {Colors.GREEN}{formatted:>12}{Colors.ENDC}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark Twilio status callback ingestion")
+    parser.add_argument("--callbacks", type=int, default=20000)
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per in-process step (best is reported)")
+    parser.add_argument("--url", help="POST signed callbacks to this /call-status URL instead")
+    parser.add_argument("--auth-token", default=os.getenv("TWILIO_AUTH_TOKEN", AUTH_TOKEN), help="Token to sign with (--url)")
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--json", action="store_true", help="Print results as JSON")
+    args = parser.parse_args()
+
+    results = asyncio.run(run_http(args)) if args.url else run_in_process(args)
+    if args.json:
+        print(json.dumps(results, indent=2))
+    elif args.url:
+        print(json.dumps(results, indent=2))
+    else:
+        print_results(results)
+
+if __name__ == "__main__":
+    sys.exit(main())
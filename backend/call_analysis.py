@@ -11,6 +11,9 @@ from sqlalchemy.orm import sessionmaker
 from dotenv import load_dotenv
 import concurrent.futures
 
+from live_updates import hub as live_hub
+from db_operations import score_bucket
+
 # Load environment variables
 load_dotenv()
 
@@ -20,12 +23,84 @@ engine = create_engine(DATABASE_URL)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 Base = declarative_base()
 
-# OpenAI API key
+# OpenAI API key and endpoint (overridable for local fakes / load tests)
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
+OPENAI_BASE_URL = os.getenv("OPENAI_BASE_URL", "https://api.openai.com/v1")
 
 # Thread pool for CPU-bound tasks
 thread_pool = concurrent.futures.ThreadPoolExecutor(max_workers=5)
 
+# Per-call aggregates are updated in the same transaction as each event/score
+# insert. Postgres keeps event counts and score buckets in jsonb; SQLite
+# stand-ins use its JSON1 functions and scalar MIN/MAX.
+if engine.dialect.name == "postgresql":
+    _EVENT_AGGREGATE_SQL = """
+    INSERT INTO call_aggregates (call_id, event_count, event_counts, updated_epoch)
+    VALUES (:call_id, 1, jsonb_build_object(CAST(:type AS text), 1), :epoch)
+    ON CONFLICT (call_id) DO UPDATE SET
+        event_count = call_aggregates.event_count + 1,
+        event_counts = call_aggregates.event_counts || jsonb_build_object(
+            CAST(:type AS text),
+            COALESCE(CAST(call_aggregates.event_counts ->> CAST(:type AS text) AS integer), 0) + 1
+        ),
+        updated_epoch = GREATEST(call_aggregates.updated_epoch, EXCLUDED.updated_epoch)
+    """
+    _SCORE_BUCKETS_INSERT = "jsonb_build_object(CAST(:bucket AS text), jsonb_build_object('n', 1, 'sum', CAST(:score AS numeric)))"
+    _SCORE_BUCKETS_UPDATE = """call_aggregates.score_buckets || jsonb_build_object(
+        CAST(:bucket AS text),
+        jsonb_build_object(
+            'n', COALESCE(CAST(call_aggregates.score_buckets -> CAST(:bucket AS text) ->> 'n' AS integer), 0) + 1,
+            'sum', COALESCE(CAST(call_aggregates.score_buckets -> CAST(:bucket AS text) ->> 'sum' AS numeric), 0) + CAST(:score AS numeric)
+        )
+    )"""
+    _LEAST, _GREATEST = "LEAST", "GREATEST"
+else:
+    _EVENT_AGGREGATE_SQL = """
+    INSERT INTO call_aggregates (call_id, event_count, event_counts, updated_epoch)
+    VALUES (:call_id, 1, json_object(:type, 1), :epoch)
+    ON CONFLICT (call_id) DO UPDATE SET
+        event_count = call_aggregates.event_count + 1,
+        event_counts = json_set(
+            call_aggregates.event_counts, '$."' || :type || '"',
+            COALESCE(json_extract(call_aggregates.event_counts, '$."' || :type || '"'), 0) + 1
+        ),
+        updated_epoch = MAX(call_aggregates.updated_epoch, excluded.updated_epoch)
+    """
+    _SCORE_BUCKETS_INSERT = "json_object(:bucket, json_object('n', 1, 'sum', :score))"
+    _SCORE_BUCKETS_UPDATE = """json_set(
+        call_aggregates.score_buckets, '$."' || :bucket || '"',
+        json_object(
+            'n', COALESCE(json_extract(call_aggregates.score_buckets, '$."' || :bucket || '".n'), 0) + 1,
+            'sum', COALESCE(json_extract(call_aggregates.score_buckets, '$."' || :bucket || '".sum'), 0) + :score
+        )
+    )"""
+    _LEAST, _GREATEST = "MIN", "MAX"
+
+_SCORE_AGGREGATE_SQL = f"""
+INSERT INTO call_aggregates (call_id, score_count, score_sum, min_score, max_score, avg_score, latest_score, score_buckets, updated_epoch)
+VALUES (:call_id, 1, :score, :score, :score, :score, :score, {_SCORE_BUCKETS_INSERT}, :epoch)
+ON CONFLICT (call_id) DO UPDATE SET
+    score_count = call_aggregates.score_count + 1,
+    score_sum = call_aggregates.score_sum + EXCLUDED.score_sum,
+    min_score = {_LEAST}(COALESCE(call_aggregates.min_score, EXCLUDED.min_score), EXCLUDED.min_score),
+    max_score = {_GREATEST}(COALESCE(call_aggregates.max_score, EXCLUDED.max_score), EXCLUDED.max_score),
+    avg_score = (call_aggregates.score_sum + EXCLUDED.score_sum) * 1.0 / (call_aggregates.score_count + 1),
+    latest_score = EXCLUDED.latest_score,
+    score_buckets = {_SCORE_BUCKETS_UPDATE},
+    updated_epoch = {_GREATEST}(call_aggregates.updated_epoch, EXCLUDED.updated_epoch)
+"""
+
+def _increment_event_aggregates(db, call_id, event_type, epoch):
+    """Count an event by type in the call's aggregates row"""
+    db.execute(text(_EVENT_AGGREGATE_SQL), {"call_id": call_id, "type": event_type, "epoch": epoch})
+
+def _increment_score_aggregates(db, call_id, score, epoch, seconds_into_call):
+    """Fold a score into the call's min/max/avg/latest aggregates and its time-into-call bucket"""
+    db.execute(
+        text(_SCORE_AGGREGATE_SQL),
+        {"call_id": call_id, "score": score, "epoch": epoch, "bucket": score_bucket(seconds_into_call)}
+    )
+
 async def analyze_user_behavior(call_id, transcript, call_start_time):
     """
     Analyze user behavior in the transcript and log events for rude or inappropriate behavior
@@ -109,10 +184,22 @@ def _analyze_user_behavior_sync(call_id, transcript, call_start_time):
                     "description": analysis.get("description", "Inappropriate user behavior detected")
                 }
             )
+            _increment_event_aggregates(db, call_id, analysis.get("issue_type", "inappropriate_behavior"), epoch)
             
             db.commit()
             db.close()
             
+            # Same shape as the dashboard's CallEventEntity
+            live_hub.publish(call_id, "event", {
+                "id": event_id,
+                "call_id": call_id,
+                "timestamp": msg_timestamp,
+                "epoch": epoch,
+                "timeIntoCall": time_into_call,
+                "type": analysis.get("issue_type", "inappropriate_behavior"),
+                "description": analysis.get("description", "Inappropriate user behavior detected")
+            })
+            
             print(f"✅ Logged user behavior event for call {call_id}: {analysis.get('description')}")
         else:
             print(f"✅ No issues detected in user message")
@@ -130,13 +217,16 @@ async def score_conversation_quality(call_id, transcript, call_start_time):
         call_id: The ID of the call
         transcript: The full transcript array
         call_start_time: The timestamp when the call started
+    
+    Returns:
+        The politeness score that was logged, or None if scoring failed
     """
     print(f"🔍 Starting conversation quality scoring for call {call_id}")
     print(f"📝 Transcript length: {len(transcript)}")
     
     # Run the scoring in a thread pool to avoid blocking the event loop
     loop = asyncio.get_event_loop()
-    await loop.run_in_executor(
+    politeness_score = await loop.run_in_executor(
         thread_pool,
         _score_conversation_quality_sync,
         call_id,
@@ -144,6 +234,7 @@ async def score_conversation_quality(call_id, transcript, call_start_time):
         call_start_time
     )
     print(f"✅ Completed conversation quality scoring for call {call_id}")
+    return politeness_score
 
 def _score_conversation_quality_sync(call_id, transcript, call_start_time):
     """Synchronous function to score conversation quality (runs in thread pool)"""
@@ -197,11 +288,22 @@ def _score_conversation_quality_sync(call_id, transcript, call_start_time):
                 "politeness_score": politeness_score
             }
         )
+        _increment_score_aggregates(db, call_id, politeness_score, epoch, call_duration)
         
         db.commit()
         db.close()
         
+        # Same shape as the dashboard's CallScoreEntity
+        live_hub.publish(call_id, "score", {
+            "id": score_id,
+            "call_id": call_id,
+            "timestamp": now,
+            "epoch": epoch,
+            "politenessScore": politeness_score
+        })
+        
         print(f"✅ Logged conversation quality score for call {call_id}: {politeness_score}/10")
+        return politeness_score
     
     except Exception as e:
         print(f"❌ Error scoring conversation quality: {str(e)}")
@@ -266,7 +368,7 @@ def analyze_message_with_llm(message, analysis_type):
         
         print(f"🌐 Calling OpenAI API with model: {payload['model']}")
         response = requests.post(
-            "https://api.openai.com/v1/chat/completions",
+            f"{OPENAI_BASE_URL}/chat/completions",
             headers=headers,
             json=payload
         )
@@ -354,7 +456,7 @@ def analyze_transcript_with_llm(transcript, analysis_type):
         
         print(f"🌐 Calling OpenAI API with model: {payload['model']}")
         response = requests.post(
-            "https://api.openai.com/v1/chat/completions",
+            f"{OPENAI_BASE_URL}/chat/completions",
             headers=headers,
             json=payload
         )
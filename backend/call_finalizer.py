@@ -0,0 +1,104 @@
+import os
+import time
+from datetime import datetime, timezone
+
+from dotenv import load_dotenv
+
+from db_operations import get_call_details_full, finalize_call_record, write_call_aggregates
+from call_analysis import score_conversation_quality
+from metrics import Counter, HistogramFamily
+from live_updates import hub as live_hub
+from log_config import get_logger
+
+# Load environment variables
+load_dotenv()
+
+logger = get_logger("call_finalizer")
+
+VAPI_API_KEY = os.getenv("VAPI_API_KEY")
+VAPI_BASE_URL = os.getenv("VAPI_BASE_URL", "https://api.vapi.ai")
+
+# Run an end-of-call quality score over the full transcript
+FINALIZE_SCORING = os.getenv("FINALIZE_SCORING", "1") == "1"
+
+FINALIZATION_STAGES = ("fetch_details", "flush", "scoring", "aggregates")
+
+call_finalizations_total = Counter("call_finalizations_total", "Finalized calls by outcome", ("outcome",))
+call_finalization_seconds = HistogramFamily(
+    "call_finalization_seconds", "Run time of the finalization pipeline per call",
+    buckets=(0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+)
+call_finalization_stage_seconds = HistogramFamily("call_finalization_stage_seconds", "Run time of each finalization stage", ("stage",))
+call_finalization_lag_seconds = HistogramFamily(
+    "call_finalization_lag_seconds", "Time from the end of a call until it is finalized",
+    buckets=(0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 300.0, 900.0)
+)
+
+def transcript_aggregates(transcript):
+    """Message counts by speaker for a transcript"""
+    counts = {"message_count": 0, "user_messages": 0, "assistant_messages": 0, "injected_messages": 0}
+    for message in transcript or []:
+        counts["message_count"] += 1
+        role = message.get("role")
+        if role == "user":
+            counts["user_messages"] += 1
+        elif role == "assistant":
+            counts["assistant_messages"] += 1
+        elif role == "system_injection":
+            counts["injected_messages"] += 1
+    return counts
+
+async def finalize_call(call_id, transcript, ended_at):
+    """
+    Finalize a call once it has ended
+
+    Stages: fetch the recording URL and start time from VAPI, flush the final
+    transcript with ended status and duration, score the full conversation,
+    then write the per-call aggregates. Each stage is idempotent apart from
+    scoring, which logs one more score row if a failed run is retried.
+
+    Args:
+        call_id: The ID of the call
+        transcript: Transcript snapshot taken when the call ended, or None if
+            the webhook had no in-memory state for the call
+        ended_at: ISO timestamp of the end event
+    """
+    log_extra = {"call_id": call_id}
+    started_at = time.perf_counter()
+    ended_at = datetime.fromisoformat(ended_at)
+
+    try:
+        # Runs on a job worker thread, so the blocking VAPI/DB calls below
+        # only hold up this worker, never the webhook's event loop
+        with call_finalization_stage_seconds.time(stage="fetch_details"):
+            details = get_call_details_full(call_id, VAPI_API_KEY, VAPI_BASE_URL) if VAPI_API_KEY else None
+        recording_url = (details or {}).get("recordingUrl") or ""
+        vapi_started_at = None
+        if details and details.get("startTime"):
+            vapi_started_at = datetime.fromisoformat(details["startTime"].replace('Z', '+00:00'))
+
+        with call_finalization_stage_seconds.time(stage="flush"):
+            call_started_at, duration = finalize_call_record(call_id, transcript, ended_at, recording_url, vapi_started_at)
+
+        final_score = None
+        if FINALIZE_SCORING and transcript:
+            with call_finalization_stage_seconds.time(stage="scoring"):
+                final_score = await score_conversation_quality(call_id, transcript, call_started_at)
+
+        with call_finalization_stage_seconds.time(stage="aggregates"):
+            aggregates = transcript_aggregates(transcript)
+            aggregates.update({
+                "duration": duration,
+                "final_score": final_score,
+                "finalized_at": datetime.now(timezone.utc),
+            })
+            write_call_aggregates(call_id, aggregates)
+    except Exception:
+        call_finalizations_total.inc(outcome="error")
+        raise
+
+    call_finalizations_total.inc(outcome="success")
+    call_finalization_seconds.observe(time.perf_counter() - started_at)
+    call_finalization_lag_seconds.observe(max(0.0, (datetime.now(timezone.utc) - ended_at).total_seconds()))
+    live_hub.publish(call_id, "finalized", dict(aggregates, call_id=call_id))
+    logger.info("Finalized call %s (%ss, %s messages, score %s)", call_id, duration, aggregates["message_count"], final_score, extra=log_extra)
@@ -0,0 +1,131 @@
+import os
+import time
+import asyncio
+from bisect import bisect_right
+
+import requests
+
+# Longest a /calls/{call_sid}/updates long-poll is held open
+CALL_UPDATES_MAX_WAIT = float(os.getenv("CALL_UPDATES_MAX_WAIT", "30"))
+# Long-poll wait the CLI tools ask for
+CALL_UPDATES_WAIT_SECONDS = float(os.getenv("CALL_UPDATES_WAIT_SECONDS", "25"))
+# How long a finished call's change feed is kept, so last polls still resolve
+CALL_UPDATES_RETAIN_SECONDS = float(os.getenv("CALL_UPDATES_RETAIN_SECONDS", "60"))
+
+# Twilio statuses (plus our own "ended") after which a call no longer changes
+FINAL_CALL_STATUSES = ("completed", "failed", "busy", "no-answer", "canceled", "ended")
+
+class _Feed:
+    __slots__ = ("version", "history_versions", "changed")
+
+    def __init__(self):
+        self.version = 0
+        # Version at which each history entry was appended (append-only, sorted)
+        self.history_versions = []
+        self.changed = asyncio.Event()
+
+class CallChangeFeed:
+    """
+    Change versions for in-memory call state, for long-polling clients.
+
+    Every status change or history append bumps the call's version and wakes
+    its waiters. A client passes the last version it saw and gets back only
+    what changed since: the current status and the history entries appended
+    after that version. Must be used from the server's event loop.
+    """
+
+    def __init__(self, retain_seconds=CALL_UPDATES_RETAIN_SECONDS):
+        self.retain_seconds = retain_seconds
+        self._feeds = {}
+        self._expiries = {}
+
+    def _feed(self, call_sid):
+        feed = self._feeds.get(call_sid)
+        if feed is None:
+            feed = self._feeds[call_sid] = _Feed()
+        return feed
+
+    def version(self, call_sid):
+        feed = self._feeds.get(call_sid)
+        return feed.version if feed else 0
+
+    def changed(self, call_sid, history_appended=False):
+        """Record a change to a call and wake its waiters"""
+        feed = self._feed(call_sid)
+        feed.version += 1
+        if history_appended:
+            feed.history_versions.append(feed.version)
+        feed.changed.set()
+        feed.changed = asyncio.Event()
+        return feed.version
+
+    def history_index(self, call_sid, since):
+        """Index of the first history entry appended after version `since`"""
+        feed = self._feeds.get(call_sid)
+        return bisect_right(feed.history_versions, since) if feed else 0
+
+    async def wait(self, call_sid, since, timeout):
+        """
+        Wait until the call's version is past `since` or `timeout` elapses.
+        A `since` ahead of the current version (the server restarted) returns
+        immediately so the client resyncs from scratch.
+
+        Returns:
+            The version to report and the version to diff history against
+        """
+        feed = self._feed(call_sid)
+        if since > feed.version:
+            return feed.version, 0
+        if feed.version == since and timeout > 0:
+            try:
+                await asyncio.wait_for(feed.changed.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+        return feed.version, since
+
+    def finished(self, call_sid):
+        """Forget a call that reached a final status once retain_seconds pass"""
+        expiry = self._expiries.pop(call_sid, None)
+        if expiry is not None:
+            expiry.cancel()
+        self._expiries[call_sid] = asyncio.get_running_loop().call_later(self.retain_seconds, self.forget, call_sid)
+
+    def forget(self, call_sid):
+        expiry = self._expiries.pop(call_sid, None)
+        if expiry is not None:
+            expiry.cancel()
+        self._feeds.pop(call_sid, None)
+
+def follow_call(api_url, call_sid, duration=300, wait=CALL_UPDATES_WAIT_SECONDS, session=None):
+    """
+    Follow a call on phone_caller's long-poll endpoint
+
+    Yields one update per change (status plus only the new history entries)
+    until the call reaches a final status or `duration` seconds pass.
+
+    Raises:
+        requests.RequestException: If the server is unreachable or the call
+            is unknown
+    """
+    session = session or requests.Session()
+    deadline = time.monotonic() + duration
+    since = 0
+    while True:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            return
+        poll_wait = min(wait, remaining)
+        response = session.get(
+            f"{api_url}/calls/{call_sid}/updates",
+            params={"since": since, "timeout": poll_wait},
+            timeout=poll_wait + 10
+        )
+        response.raise_for_status()
+        update = response.json()
+        if update["version"] == since:
+            # Long-poll timed out without changes
+            continue
+        since = update["version"]
+        yield update
+        if update["final"]:
+            return
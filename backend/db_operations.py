@@ -1,4 +1,5 @@
-from sqlalchemy import create_engine, Column, String, Integer, DateTime, JSON, MetaData, Table, text
+from sqlalchemy import create_engine, Column, String, Integer, Numeric, DateTime, JSON, MetaData, Table, Index, text, bindparam
+from sqlalchemy.dialects.postgresql import JSONB
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker, relationship
 from datetime import datetime, timezone, timedelta
@@ -7,11 +8,17 @@ import os
 import requests
 import uuid
 import time
+import concurrent.futures
 from dotenv import load_dotenv
+from metrics import Counter, HistogramFamily
+from log_config import get_logger
+from call_updates import FINAL_CALL_STATUSES
 
 # Load environment variables
 load_dotenv()
 
+logger = get_logger("db_operations")
+
 # Database connection
 DATABASE_URL = os.getenv("DATABASE_URL")
 engine = create_engine(DATABASE_URL)
@@ -24,7 +31,7 @@ calls = Table(
     'calls', 
     metadata,
     Column('id', String, primary_key=True),
-    Column('created_at', DateTime, nullable=False, default=datetime.now(timezone.utc)),
+    Column('created_at', DateTime, nullable=False, server_default=text("CURRENT_TIMESTAMP")),
     Column('status', String, nullable=False),
     Column('started_at', DateTime, nullable=False),
     Column('ended_at', DateTime, nullable=True),
@@ -32,9 +39,106 @@ calls = Table(
     Column('recording_url', String, nullable=False, default=""),
     Column('persona', String, nullable=False, default="default"),
     Column('target', String, nullable=False, default="unknown"),
-    Column('transcript', JSON, nullable=False, default=[])
+    Column('transcript', JSON, nullable=False, default=[]),
+    # Set by the web app when it creates a call (see web/src/lib/db/call.db.ts)
+    Column('website', String, nullable=False, server_default=""),
+    Column('phone_number', String, nullable=False, server_default="")
+)
+
+# Define the analysis time-series tables written by call_analysis. The web
+# routes read them by call_id ordered by timestamp, hence the composite indexes.
+# (migrations.py can create them range-partitioned by month on Postgres.)
+call_events = Table(
+    'call_events',
+    metadata,
+    Column('id', String, primary_key=True),
+    Column('call_id', String, nullable=False),
+    Column('timestamp', DateTime, nullable=False),
+    Column('epoch', Integer, nullable=False),
+    Column('time_into_call', Integer, nullable=False),
+    Column('type', String, nullable=False),
+    Column('description', String, nullable=False),
+    Index('call_events_call_id_timestamp_idx', 'call_id', 'timestamp')
+)
+
+call_scores = Table(
+    'call_scores',
+    metadata,
+    Column('id', String, primary_key=True),
+    Column('call_id', String, nullable=False),
+    Column('timestamp', DateTime, nullable=False),
+    Column('epoch', Integer, nullable=False),
+    Column('politeness_score', Numeric(10, 2), nullable=False),
+    Index('call_scores_call_id_timestamp_idx', 'call_id', 'timestamp')
+)
+
+# Width of the time-into-call buckets in call_aggregates.score_buckets
+AGGREGATE_BUCKET_SECONDS = int(os.getenv("AGGREGATE_BUCKET_SECONDS", "30"))
+
+# Define the call_aggregates table: one row per call, kept up to date as
+# call_analysis writes events and scores, and completed when the call is
+# finalized. Server defaults let each writer upsert only its own columns.
+# score_buckets maps each bucket's start (seconds into the call) to
+# {"n": scores, "sum": score total}, the dashboard's score-over-time chart.
+call_aggregates = Table(
+    'call_aggregates',
+    metadata,
+    Column('call_id', String, primary_key=True),
+    Column('event_count', Integer, nullable=False, server_default=text("0")),
+    Column('event_counts', JSON().with_variant(JSONB(), "postgresql"), nullable=False, server_default=text("'{}'")),
+    Column('score_count', Integer, nullable=False, server_default=text("0")),
+    Column('score_sum', Numeric(12, 2), nullable=False, server_default=text("0")),
+    Column('min_score', Numeric(10, 2), nullable=True),
+    Column('max_score', Numeric(10, 2), nullable=True),
+    Column('avg_score', Numeric(10, 2), nullable=True),
+    Column('latest_score', Numeric(10, 2), nullable=True),
+    Column('score_buckets', JSON().with_variant(JSONB(), "postgresql"), nullable=False, server_default=text("'{}'")),
+    Column('updated_epoch', Integer, nullable=False, server_default=text("0")),
+    Column('message_count', Integer, nullable=False, server_default=text("0")),
+    Column('user_messages', Integer, nullable=False, server_default=text("0")),
+    Column('assistant_messages', Integer, nullable=False, server_default=text("0")),
+    Column('injected_messages', Integer, nullable=False, server_default=text("0")),
+    Column('duration', Integer, nullable=False, server_default=text("0")),
+    Column('final_score', Numeric(10, 2), nullable=True),
+    Column('finalized_at', DateTime, nullable=True)
+)
+
+def score_bucket(seconds_into_call):
+    """Key of the call_aggregates.score_buckets entry for a time into the call"""
+    return str(max(0, int(seconds_into_call)) // AGGREGATE_BUCKET_SECONDS * AGGREGATE_BUCKET_SECONDS)
+
+# Define the phone_calls table: last known Twilio status per CallSid, written
+# by phone_caller's status callbacks. Twilio calls have no row in calls, which
+# is keyed by VAPI call IDs.
+phone_calls = Table(
+    'phone_calls',
+    metadata,
+    Column('call_sid', String, primary_key=True),
+    Column('status', String, nullable=False),
+    Column('updated_at', DateTime, nullable=False)
 )
 
+# Define the injection_messages table: content for message injection, by
+# persona (the assistant name) and scenario ('*' matches any). Loaded once at
+# startup by injection_content.
+injection_messages = Table(
+    'injection_messages',
+    metadata,
+    Column('id', String, primary_key=True),
+    Column('persona', String, nullable=False, server_default="*"),
+    Column('scenario', String, nullable=False, server_default="*"),
+    Column('message', String, nullable=False),
+    Column('created_at', DateTime, nullable=False, server_default=text("CURRENT_TIMESTAMP"))
+)
+
+# Write instrumentation, exposed on the server's /metrics endpoint
+db_write_seconds = HistogramFamily("db_write_seconds", "Latency of call record writes", ("operation",))
+db_writes_total = Counter("db_writes_total", "Call record writes by outcome", ("operation", "outcome"))
+
+def _record_db_write(operation, started_at, outcome):
+    db_write_seconds.observe(time.perf_counter() - started_at, operation=operation)
+    db_writes_total.inc(operation=operation, outcome=outcome)
+
 def get_call_details_full(call_id, api_key, base_url):
     """Get complete call details from VAPI API"""
     try:
@@ -51,88 +155,124 @@ def get_call_details_full(call_id, api_key, base_url):
         if response.status_code == 200:
             return response.json()
         else:
-            print(f"Failed to get call details: {response.status_code} - {response.text}")
+            logger.warning("Failed to get call details: %s - %s", response.status_code, response.text, extra={"call_id": call_id})
             return None
     except Exception as e:
-        print(f"Error getting call details: {str(e)}")
+        logger.error("Error getting call details: %s", e, extra={"call_id": call_id})
         return None
 
-def update_call_transcript(call_id, transcript, api_key=None, base_url=None):
-    """Update the transcript for a call in the database using SQLAlchemy"""
+# Background pool for call metadata enrichment (VAPI fetches happen off the write path)
+enrichment_pool = concurrent.futures.ThreadPoolExecutor(max_workers=4, thread_name_prefix="call-enrichment")
+
+# Postgres reports whether the upsert inserted via the system column xmax (0 for
+# a fresh row). Other dialects compare the started_at placeholder we just bound,
+# which an existing row never carries.
+_INSERTED_EXPRESSION = "(xmax = 0)" if engine.dialect.name == "postgresql" else "(started_at = :started_at)"
+
+# Statuses after which a call record's status and transcript are no longer
+# overwritten by in-progress updates
+_FINAL_STATUSES_SQL = ", ".join(f"'{status}'" for status in FINAL_CALL_STATUSES)
+
+def enrich_call_metadata(call_id, api_key, base_url):
+    """Fill in start time, recording URL, persona and target from VAPI call details"""
+    call_details = get_call_details_full(call_id, api_key, base_url)
+    if not call_details:
+        return False
+
+    write_started_at = time.perf_counter()
     try:
-        # Create a new session
-        db = SessionLocal()
-        
-        # Check if call exists - using text() for SQL statements
-        result = db.execute(
-            text("SELECT id FROM calls WHERE id = :call_id"),
-            {"call_id": call_id}
-        ).fetchone()
-        
-        if result:
-            # Update existing call transcript
-            db.execute(
-                text("UPDATE calls SET transcript = :transcript WHERE id = :call_id"),
-                {"transcript": json.dumps(transcript), "call_id": call_id}
+        values = {
+            "call_id": call_id,
+            "recording_url": call_details.get("recordingUrl") or "",
+            "persona": call_details.get("assistant", {}).get("name", "default"),
+            "target": call_details.get("to", "unknown"),
+        }
+        started_at_clause = ""
+        if call_details.get("startTime"):
+            values["started_at"] = datetime.fromisoformat(call_details["startTime"].replace('Z', '+00:00'))
+            started_at_clause = "started_at = :started_at,"
+
+        with engine.begin() as conn:
+            conn.execute(
+                text(f"""
+                UPDATE calls
+                SET {started_at_clause}
+                    recording_url = :recording_url,
+                    persona = :persona,
+                    target = :target
+                WHERE id = :call_id
+                """),
+                values
             )
-            db.commit()
-            #print(f"Updated transcript for call {call_id}")
-        else:
-            # Get call details for a new record if API credentials provided
-            call_details = None
-            if api_key and base_url:
-                call_details = get_call_details_full(call_id, api_key, base_url)
-            
-            # Set default values
-            started_at = datetime.now(timezone.utc)
-            # Set ended_at to a future date for active calls
-            ended_at = datetime.now(timezone.utc) + timedelta(hours=1)
-            recording_url = ""
-            persona = "default"
-            target = "unknown"
-            
-            # Extract data from call details if available
-            if call_details:
-                if call_details.get("startTime"):
-                    started_at_str = call_details.get("startTime")
-                    started_at = datetime.fromisoformat(started_at_str.replace('Z', '+00:00'))
-                recording_url = call_details.get("recordingUrl", "")
-                persona = call_details.get("assistant", {}).get("name", "default")
-                target = call_details.get("to", "unknown")
-            
-            # Insert new call
-            db.execute(
-                text("""
-                INSERT INTO calls 
+        _record_db_write("enrich_call_metadata", write_started_at, "success")
+        return True
+    except Exception as e:
+        _record_db_write("enrich_call_metadata", write_started_at, "error")
+        logger.exception("Error enriching call metadata: %s", e, extra={"call_id": call_id})
+        return False
+
+def update_call_transcript(call_id, transcript, api_key=None, base_url=None):
+    """
+    Create or update the call record with the latest transcript in a single
+    upsert. When the call is new and API credentials are given, its metadata
+    is fetched from VAPI in the background. A call already in a final status
+    is left alone, so a late in-progress write cannot replace the transcript
+    the finalizer wrote.
+    """
+    write_started_at = time.perf_counter()
+    try:
+        with engine.begin() as conn:
+            row = conn.execute(
+                text(f"""
+                INSERT INTO calls
                 (id, status, started_at, ended_at, duration, recording_url, persona, target, transcript)
                 VALUES (:id, :status, :started_at, :ended_at, :duration, :recording_url, :persona, :target, :transcript)
+                ON CONFLICT (id) DO UPDATE SET transcript = EXCLUDED.transcript
+                WHERE calls.status NOT IN ({_FINAL_STATUSES_SQL})
+                RETURNING {_INSERTED_EXPRESSION}
                 """),
                 {
                     "id": call_id,
                     "status": "in-progress",
-                    "started_at": started_at,
-                    "ended_at": ended_at,
+                    "started_at": datetime.now(timezone.utc),
+                    # Set ended_at to a future date for active calls
+                    "ended_at": datetime.now(timezone.utc) + timedelta(hours=1),
                     "duration": 0,
-                    "recording_url": recording_url,
-                    "persona": persona,
-                    "target": target,
+                    "recording_url": "",
+                    "persona": "default",
+                    "target": "unknown",
                     "transcript": json.dumps(transcript)
                 }
-            )
-            db.commit()
-            print(f"Created new call record for {call_id}")
-        
-        db.close()
+            ).fetchone()
+
+        if row is None:
+            _record_db_write("update_call_transcript", write_started_at, "final")
+            return True
+        inserted = row[0]
+        if inserted:
+            logger.info("Created new call record for %s", call_id, extra={"call_id": call_id})
+            if api_key and base_url:
+                enrichment_pool.submit(enrich_call_metadata, call_id, api_key, base_url)
+
+        _record_db_write("update_call_transcript", write_started_at, "inserted" if inserted else "updated")
         return True
-        
+
     except Exception as e:
-        print(f"Error updating call transcript: {str(e)}")
-        import traceback
-        traceback.print_exc()
+        _record_db_write("update_call_transcript", write_started_at, "error")
+        logger.exception("Error updating call transcript: %s", e, extra={"call_id": call_id})
         return False
 
+def _as_utc(value):
+    """Parse a stored timestamp (naive timestamps are UTC; SQLite returns strings)"""
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value)
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return value
+
 def update_call_ended(call_id):
     """Update call status to ended and calculate duration"""
+    write_started_at = time.perf_counter()
     try:
         db = SessionLocal()
         
@@ -143,38 +283,173 @@ def update_call_ended(call_id):
         ).fetchone()
         
         if not result:
-            print(f"Call {call_id} not found in database")
+            logger.warning("Call %s not found in database", call_id, extra={"call_id": call_id})
             db.close()
+            _record_db_write("update_call_ended", write_started_at, "not_found")
             return False
         
         # Get the current time for ended_at
         ended_at = datetime.now(timezone.utc)
         
+        # Compute the duration here rather than in SQL so the statement also
+        # runs on SQLite stand-ins (started_at is stored without a timezone)
+        started_at = _as_utc(result[1])
+        duration = max(0, int((ended_at - started_at).total_seconds()))
+        
         # Update the call record
         db.execute(
             text("""
             UPDATE calls 
             SET status = :status, 
                 ended_at = :ended_at,
-                duration = EXTRACT(EPOCH FROM (:ended_at - started_at))::integer
+                duration = :duration
             WHERE id = :call_id
             """),
             {
                 "status": "ended",
                 "ended_at": ended_at,
+                "duration": duration,
                 "call_id": call_id
             }
         )
         db.commit()
         db.close()
-        print(f"Updated call {call_id} status to ended")
+        logger.info("Updated call %s status to ended", call_id, extra={"call_id": call_id})
+        _record_db_write("update_call_ended", write_started_at, "success")
         return True
     except Exception as e:
-        print(f"Error updating call status: {str(e)}")
-        import traceback
-        traceback.print_exc()
+        _record_db_write("update_call_ended", write_started_at, "error")
+        logger.exception("Error updating call status: %s", e, extra={"call_id": call_id})
         return False
 
+def finalize_call_record(call_id, transcript, ended_at, recording_url="", started_at=None):
+    """
+    Write the final state of a call in one transaction: status, end time,
+    transcript and recording URL (upserted, so a call missing from the table
+    is still recorded), then the duration from the stored start time.
+    
+    Args:
+        call_id: The ID of the call
+        transcript: Final transcript, or None to keep the stored one
+        ended_at: When the call ended (timezone-aware)
+        recording_url: Recording URL, kept as stored when empty
+        started_at: Start time reported by VAPI, kept as stored when None
+    
+    Returns:
+        tuple: (started_at, duration in seconds)
+    """
+    write_started_at = time.perf_counter()
+    updates = ["status = EXCLUDED.status", "ended_at = EXCLUDED.ended_at"]
+    if transcript is not None:
+        updates.append("transcript = EXCLUDED.transcript")
+    if recording_url:
+        updates.append("recording_url = EXCLUDED.recording_url")
+    if started_at is not None:
+        updates.append("started_at = EXCLUDED.started_at")
+
+    try:
+        with engine.begin() as conn:
+            stored_started_at = conn.execute(
+                text(f"""
+                INSERT INTO calls
+                (id, status, started_at, ended_at, duration, recording_url, persona, target, transcript)
+                VALUES (:id, 'ended', :started_at, :ended_at, 0, :recording_url, 'default', 'unknown', :transcript)
+                ON CONFLICT (id) DO UPDATE SET {", ".join(updates)}
+                RETURNING started_at
+                """),
+                {
+                    "id": call_id,
+                    "started_at": started_at or ended_at,
+                    "ended_at": ended_at,
+                    "recording_url": recording_url or "",
+                    "transcript": json.dumps(transcript if transcript is not None else [])
+                }
+            ).scalar()
+
+            stored_started_at = _as_utc(stored_started_at)
+            duration = max(0, int((ended_at - stored_started_at).total_seconds()))
+            conn.execute(
+                text("UPDATE calls SET duration = :duration WHERE id = :call_id"),
+                {"duration": duration, "call_id": call_id}
+            )
+        _record_db_write("finalize_call_record", write_started_at, "success")
+        return stored_started_at, duration
+    except Exception:
+        _record_db_write("finalize_call_record", write_started_at, "error")
+        raise
+
+def upsert_call_aggregates(conn, call_id, aggregates):
+    """Set the given call_aggregates columns for a call on an open connection"""
+    columns = ["call_id"] + list(aggregates)
+    conn.execute(
+        text(f"""
+        INSERT INTO call_aggregates ({", ".join(columns)})
+        VALUES ({", ".join(":" + column for column in columns)})
+        ON CONFLICT (call_id) DO UPDATE SET
+        {", ".join(f"{column} = EXCLUDED.{column}" for column in aggregates)}
+        """).bindparams(*(bindparam(column, type_=call_aggregates.c[column].type) for column in aggregates)),
+        {"call_id": call_id, **aggregates}
+    )
+
+def write_call_aggregates(call_id, aggregates):
+    """Insert or replace the aggregates row for a call"""
+    write_started_at = time.perf_counter()
+    try:
+        with engine.begin() as conn:
+            upsert_call_aggregates(conn, call_id, aggregates)
+        _record_db_write("write_call_aggregates", write_started_at, "success")
+    except Exception:
+        _record_db_write("write_call_aggregates", write_started_at, "error")
+        raise
+
+def update_call_statuses(statuses):
+    """
+    Record the status of many Twilio calls in phone_calls in one transaction
+    (status callbacks are batched by twilio_callbacks.StatusBatcher). Calls
+    already in a final status keep it, so a late "ringing" cannot reopen a
+    finished call.
+
+    Args:
+        statuses: dict of Twilio CallSid -> status
+
+    Returns:
+        int: Number of phone_calls rows written
+    """
+    if not statuses:
+        return 0
+    write_started_at = time.perf_counter()
+    updated_at = datetime.now(timezone.utc)
+    try:
+        with engine.begin() as conn:
+            result = conn.execute(
+                text(f"""
+                INSERT INTO phone_calls (call_sid, status, updated_at)
+                VALUES (:call_sid, :status, :updated_at)
+                ON CONFLICT (call_sid) DO UPDATE SET
+                    status = EXCLUDED.status,
+                    updated_at = EXCLUDED.updated_at
+                WHERE phone_calls.status NOT IN ({_FINAL_STATUSES_SQL})
+                """),
+                [{"call_sid": call_sid, "status": status, "updated_at": updated_at} for call_sid, status in statuses.items()]
+            )
+        _record_db_write("update_call_statuses", write_started_at, "success")
+        return result.rowcount
+    except Exception:
+        _record_db_write("update_call_statuses", write_started_at, "error")
+        raise
+
+def load_injection_messages():
+    """
+    All injection content rows (read once at startup by injection_content)
+
+    Returns:
+        list: (persona, scenario, message) tuples
+    """
+    with engine.connect() as conn:
+        return [tuple(row) for row in conn.execute(
+            text("SELECT persona, scenario, message FROM injection_messages ORDER BY persona, scenario, created_at, id")
+        )]
+
 def test_db_operations():
     """
     Test function to verify database operations are working correctly.
@@ -0,0 +1,347 @@
+import os
+import sys
+import json
+import time
+import random
+import asyncio
+import argparse
+
+import aiohttp
+from dotenv import load_dotenv
+
+from metrics import Counter, HistogramFamily
+from log_config import get_logger
+
+# Load environment variables
+load_dotenv()
+
+logger = get_logger("dialer")
+
+VAPI_API_KEY = os.getenv("VAPI_API_KEY")
+VAPI_BASE_URL = os.getenv("VAPI_BASE_URL", "https://api.vapi.ai")
+TWILIO_ACCOUNT_SID = os.getenv("TWILIO_ACCOUNT_SID")
+TWILIO_AUTH_TOKEN = os.getenv("TWILIO_AUTH_TOKEN")
+TWILIO_PHONE_NUMBER = os.getenv("TWILIO_PHONE_NUMBER")
+TWILIO_API_BASE_URL = os.getenv("TWILIO_API_BASE_URL", "https://api.twilio.com")
+
+# Per-provider limits: concurrent placements in flight and calls per second
+DIALER_LIMITS = {
+    "vapi": {
+        "concurrency": int(os.getenv("DIALER_VAPI_CONCURRENCY", "10")),
+        "cps": float(os.getenv("DIALER_VAPI_CPS", "2")),
+    },
+    "twilio": {
+        "concurrency": int(os.getenv("DIALER_TWILIO_CONCURRENCY", "10")),
+        "cps": float(os.getenv("DIALER_TWILIO_CPS", "1")),
+    },
+}
+DIALER_MAX_ATTEMPTS = int(os.getenv("DIALER_MAX_ATTEMPTS", "3"))
+DIALER_REQUEST_TIMEOUT = float(os.getenv("DIALER_REQUEST_TIMEOUT", "15"))
+
+# HTTP statuses worth retrying for idempotent requests
+TRANSIENT_STATUSES = {408, 409, 425, 429, 500, 502, 503, 504}
+# Statuses at which the provider certainly did not act on the request, so
+# even call creation can be retried without dialing the number twice
+NOT_PROCESSED_STATUSES = {429, 503}
+
+dial_attempts_total = Counter("dialer_attempts_total", "Call placement attempts by provider and outcome", ("provider", "outcome"))
+dial_placement_seconds = HistogramFamily("dialer_placement_seconds", "Latency of a single placement request", ("provider",))
+
+class DialError(Exception):
+    """A placement failed; `transient` failures are retried"""
+
+    def __init__(self, message, transient=False, retry_after=None):
+        super().__init__(message)
+        self.transient = transient
+        self.retry_after = retry_after
+
+class RateLimiter:
+    """Evenly spaced slots at `rate` per second (no bursts), shared by all tasks of a provider"""
+
+    def __init__(self, rate):
+        self.interval = 1.0 / rate if rate > 0 else 0.0
+        self._next_slot = 0.0
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        if not self.interval:
+            return
+        async with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next_slot)
+            self._next_slot = slot + self.interval
+        if slot > now:
+            await asyncio.sleep(slot - now)
+
+def build_vapi_call_payload(phone_number, instructions, first_message="Hello", voice_id="alloy", webhook_url=None, scenario=None):
+    """
+    Build the VAPI outbound call payload used by /make-call and the bulk dialer
+
+    Args:
+        phone_number: Number to call (E.164; a leading + is added if missing)
+        instructions: System prompt for the assistant
+        first_message: First message the assistant will say
+        voice_id: OpenAI voice ID
+        webhook_url: Server URL VAPI should send call events to
+        scenario: Injection scenario, stored in the call's metadata
+
+    Returns:
+        dict: The request body for POST /call
+    """
+    if not phone_number.startswith('+'):
+        phone_number = '+' + phone_number
+
+    assistant_config = {
+        "firstMessage": first_message,
+        "voice": {
+            "provider": "openai",
+            "voiceId": voice_id
+        },
+        "model": {
+            "provider": "openai",
+            "model": "gpt-4o",
+            "systemPrompt": instructions
+        }
+    }
+    if webhook_url:
+        assistant_config["server"] = {"url": webhook_url}
+
+    payload = {
+        "type": "outboundPhoneCall",
+        "customer": {
+            "number": phone_number
+        },
+        "phoneNumber": {
+            "twilioPhoneNumber": TWILIO_PHONE_NUMBER,
+            "twilioAccountSid": TWILIO_ACCOUNT_SID,
+            "twilioAuthToken": TWILIO_AUTH_TOKEN
+        },
+        "assistant": assistant_config
+    }
+    if scenario:
+        payload["metadata"] = {"scenario": scenario}
+    return payload
+
+def _retry_after(response):
+    value = response.headers.get("Retry-After")
+    try:
+        return float(value) if value else None
+    except ValueError:
+        return None
+
+def _created_call(body, id_field):
+    # The provider accepted the request, so an unreadable body still means
+    # the call may exist; never retried
+    try:
+        result = json.loads(body)
+        return {"call_id": result[id_field], "details": result}
+    except (ValueError, KeyError, TypeError) as e:
+        raise DialError(f"Unreadable response (the call may have been placed): {type(e).__name__}: {e}; body: {body[:200]}")
+
+class VapiPlacer:
+    """Places calls through VAPI's POST /call"""
+
+    provider = "vapi"
+
+    def __init__(self, api_key=VAPI_API_KEY, base_url=VAPI_BASE_URL):
+        self.api_key = api_key
+        self.base_url = base_url
+
+    async def place(self, session, target):
+        payload = build_vapi_call_payload(
+            target["phone_number"],
+            target["instructions"],
+            target.get("first_message") or "Hello",
+            target.get("voice_id") or "alloy",
+            target.get("webhook_url"),
+            target.get("scenario"),
+        )
+        headers = {"Authorization": f"Bearer {self.api_key}", "Content-Type": "application/json"}
+        async with session.post(f"{self.base_url}/call", json=payload, headers=headers) as response:
+            body = await response.text()
+            if response.status in (200, 201):
+                return _created_call(body, "id")
+            raise DialError(f"{response.status} - {body[:200]}", response.status in NOT_PROCESSED_STATUSES, _retry_after(response))
+
+class TwilioPlacer:
+    """Places calls through Twilio's Calls REST resource"""
+
+    provider = "twilio"
+
+    def __init__(self, account_sid=TWILIO_ACCOUNT_SID, auth_token=TWILIO_AUTH_TOKEN, from_number=TWILIO_PHONE_NUMBER, base_url=TWILIO_API_BASE_URL):
+        self.account_sid = account_sid
+        self.auth = aiohttp.BasicAuth(account_sid or "", auth_token or "")
+        self.from_number = from_number
+        self.base_url = base_url
+
+    async def place(self, session, target):
+        form = {
+            "To": target["phone_number"],
+            "From": self.from_number,
+            "Url": target["answer_url"],
+        }
+        if target.get("status_callback"):
+            form["StatusCallback"] = target["status_callback"]
+        url = f"{self.base_url}/2010-04-01/Accounts/{self.account_sid}/Calls.json"
+        async with session.post(url, data=form, auth=self.auth) as response:
+            body = await response.text()
+            if response.status in (200, 201):
+                return _created_call(body, "sid")
+            raise DialError(f"{response.status} - {body[:200]}", response.status in NOT_PROCESSED_STATUSES, _retry_after(response))
+
+class BulkDialer:
+    """
+    Places batches of calls through an async pool.
+
+    Each provider gets its own concurrency semaphore and CPS limiter, shared
+    by every batch running in the process. Creating a call is not
+    idempotent, so a placement is only retried when the provider certainly
+    did not create the call (429/503 or a failed connection), with jittered
+    exponential backoff honouring Retry-After. After a timeout or another
+    5xx the call may have been placed, so it is reported as failed rather
+    than dialed again.
+    """
+
+    def __init__(self, placers, limits=None, max_attempts=DIALER_MAX_ATTEMPTS, request_timeout=DIALER_REQUEST_TIMEOUT):
+        self.placers = {placer.provider: placer for placer in placers}
+        self.limits = limits or DIALER_LIMITS
+        self.max_attempts = max_attempts
+        self.request_timeout = request_timeout
+        self._semaphores = {}
+        self._rate_limiters = {}
+        self._session = None
+
+    def _session_for_loop(self):
+        # One pooled session per dialer, created lazily inside the running loop
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(limit=sum(l["concurrency"] for l in self.limits.values()))
+            self._session = aiohttp.ClientSession(connector=connector, timeout=aiohttp.ClientTimeout(total=self.request_timeout))
+        return self._session
+
+    def _limits_for(self, provider):
+        if provider not in self._semaphores:
+            limit = self.limits.get(provider, {"concurrency": 5, "cps": 1})
+            self._semaphores[provider] = asyncio.Semaphore(limit["concurrency"])
+            self._rate_limiters[provider] = RateLimiter(limit["cps"])
+        return self._semaphores[provider], self._rate_limiters[provider]
+
+    async def close(self):
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+
+    async def place_one(self, provider, index, target):
+        """Place a single call with retries; never raises"""
+        placer = self.placers[provider]
+        semaphore, rate_limiter = self._limits_for(provider)
+        session = self._session_for_loop()
+        started_at = time.perf_counter()
+        last_error = None
+
+        for attempt in range(1, self.max_attempts + 1):
+            async with semaphore:
+                await rate_limiter.acquire()
+                attempt_started_at = time.perf_counter()
+                try:
+                    placed = await placer.place(session, target)
+                    dial_placement_seconds.observe(time.perf_counter() - attempt_started_at, provider=provider)
+                    dial_attempts_total.inc(provider=provider, outcome="placed")
+                    return {
+                        "index": index,
+                        "phone_number": target["phone_number"],
+                        "status": "placed",
+                        "call_id": placed["call_id"],
+                        "attempts": attempt,
+                        "latency_ms": round((time.perf_counter() - started_at) * 1000, 1),
+                        "details": placed["details"],
+                    }
+                except DialError as e:
+                    last_error = e
+                except aiohttp.ClientConnectorError as e:
+                    last_error = DialError(f"{type(e).__name__}: {e}", transient=True)
+                except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                    # The request may have reached the provider and placed the call
+                    last_error = DialError(f"{type(e).__name__} (the call may have been placed): {e}")
+                except Exception as e:
+                    # Keeps the "never raises" contract, so one bad placement
+                    # cannot abort the rest of a dial() batch
+                    logger.exception("Unexpected error placing %s call for target %s", provider, index)
+                    last_error = DialError(f"{type(e).__name__} (the call may have been placed): {e}")
+                dial_placement_seconds.observe(time.perf_counter() - attempt_started_at, provider=provider)
+
+            if not last_error.transient or attempt == self.max_attempts:
+                dial_attempts_total.inc(provider=provider, outcome="failed")
+                break
+            dial_attempts_total.inc(provider=provider, outcome="retried")
+            backoff = last_error.retry_after or (0.5 * 2 ** (attempt - 1)) * (0.5 + random.random())
+            logger.debug("Retrying %s placement for target %s in %.2fs: %s", provider, index, backoff, last_error)
+            await asyncio.sleep(backoff)
+
+        return {
+            "index": index,
+            "phone_number": target.get("phone_number"),
+            "status": "failed",
+            "call_id": None,
+            "attempts": attempt,
+            "latency_ms": round((time.perf_counter() - started_at) * 1000, 1),
+            "error": str(last_error),
+        }
+
+    async def dial(self, provider, targets):
+        """
+        Place every target and yield per-target results as they complete
+
+        Args:
+            provider: "vapi" or "twilio"
+            targets: list of dicts with phone_number plus provider fields
+                (instructions/first_message for VAPI, answer_url for Twilio)
+
+        Yields:
+            dict: one result per target, in completion order
+        """
+        if provider not in self.placers:
+            raise ValueError(f"No placer configured for provider {provider}")
+        tasks = [asyncio.create_task(self.place_one(provider, index, target)) for index, target in enumerate(targets)]
+        try:
+            for finished in asyncio.as_completed(tasks):
+                yield await finished
+        finally:
+            for task in tasks:
+                task.cancel()
+
+async def _run_cli(args):
+    with open(args.numbers_file) as f:
+        numbers = [line.strip() for line in f if line.strip()]
+
+    if args.provider == "vapi":
+        placers = [VapiPlacer(base_url=args.base_url or VAPI_BASE_URL)]
+        targets = [{"phone_number": number, "instructions": args.instructions} for number in numbers]
+    else:
+        placers = [TwilioPlacer(base_url=args.base_url or TWILIO_API_BASE_URL)]
+        targets = [{"phone_number": number, "answer_url": args.answer_url} for number in numbers]
+
+    limits = dict(DIALER_LIMITS)
+    limits[args.provider] = {"concurrency": args.concurrency, "cps": args.cps}
+    dialer = BulkDialer(placers, limits=limits)
+
+    started_at = time.perf_counter()
+    placed = failed = 0
+    try:
+        async for result in dialer.dial(args.provider, targets):
+            placed += result["status"] == "placed"
+            failed += result["status"] == "failed"
+            print(json.dumps({k: v for k, v in result.items() if k != "details"}))
+    finally:
+        await dialer.close()
+    elapsed = time.perf_counter() - started_at
+    print(f"Placed {placed}, failed {failed} in {elapsed:.2f}s ({len(targets) / elapsed:.2f} calls/s)", file=sys.stderr)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Dial a list of numbers through the bulk dialer")
+    parser.add_argument("numbers_file", help="File with one phone number per line")
+    parser.add_argument("--provider", choices=["vapi", "twilio"], default="vapi")
+    parser.add_argument("--instructions", default="You are a friendly caller.", help="Assistant instructions (VAPI)")
+    parser.add_argument("--answer-url", default="http://localhost:8000/outbound-call-handler", help="TwiML URL (Twilio)")
+    parser.add_argument("--base-url", help="Provider API base URL, e.g. a fake_providers instance")
+    parser.add_argument("--concurrency", type=int, default=10)
+    parser.add_argument("--cps", type=float, default=2.0)
+    asyncio.run(_run_cli(parser.parse_args()))
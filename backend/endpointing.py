@@ -0,0 +1,150 @@
+import os
+import re
+
+from audio_utils import ulaw_frame_energy, frame_duration_ms
+
+# Decoded µ-law amplitude (0-32124) above which a frame counts as voiced
+ENDPOINT_ENERGY_THRESHOLD = float(os.getenv("ENDPOINT_ENERGY_THRESHOLD", "500"))
+# Continuous voiced audio before an utterance is considered started
+ENDPOINT_SPEECH_START_MS = float(os.getenv("ENDPOINT_SPEECH_START_MS", "100"))
+# Trailing silence that ends an utterance: short answers get the minimum,
+# growing linearly to the maximum for utterances of LONG_UTTERANCE_MS or more
+ENDPOINT_MIN_SILENCE_MS = float(os.getenv("ENDPOINT_MIN_SILENCE_MS", "250"))
+ENDPOINT_MAX_SILENCE_MS = float(os.getenv("ENDPOINT_MAX_SILENCE_MS", "900"))
+ENDPOINT_SHORT_UTTERANCE_MS = float(os.getenv("ENDPOINT_SHORT_UTTERANCE_MS", "600"))
+ENDPOINT_LONG_UTTERANCE_MS = float(os.getenv("ENDPOINT_LONG_UTTERANCE_MS", "3000"))
+# The timeout stays this many times above the speaker's typical mid-sentence pause
+ENDPOINT_PAUSE_MARGIN = float(os.getenv("ENDPOINT_PAUSE_MARGIN", "1.3"))
+
+SPEECH_START = "speech_start"
+SPEECH_END = "speech_end"
+
+# Gaps shorter than this are part of articulation, not pauses
+MIN_PAUSE_MS = 80
+# Weight of the newest pause in the speaker's running pause length
+PAUSE_ALPHA = 0.3
+
+# Timeout multipliers for a partial transcript's ending: a finished sentence
+# ends sooner, a trailing conjunction or filler waits longer
+COMPLETE_HINT_FACTOR = 0.6
+CONTINUING_HINT_FACTOR = 1.5
+_TERMINAL_PUNCTUATION = re.compile(r"[.?!]['\")\]]*\s*$")
+_CONTINUING_WORDS = {"and", "but", "or", "so", "because", "um", "uh", "er", "like", "the", "a", "to", "if", "then", "with"}
+
+def hint_factor(transcript):
+    """Silence timeout multiplier suggested by how a partial transcript ends"""
+    if not transcript or not transcript.strip():
+        return 1.0
+    words = re.findall(r"[\w']+", transcript.lower())
+    if words and words[-1] in _CONTINUING_WORDS:
+        return CONTINUING_HINT_FACTOR
+    if _TERMINAL_PUNCTUATION.search(transcript):
+        return COMPLETE_HINT_FACTOR
+    return 1.0
+
+class Endpointer:
+    """
+    End-of-speech detection in audio time (milliseconds of µ-law audio, so
+    independent of how many bytes each media frame carries).
+
+    The trailing-silence timeout adapts per utterance: it starts short so
+    "yes" gets a fast turnaround, grows with the length of what has been said
+    so long sentences are not cut at a breath, and never drops below the
+    speaker's own typical mid-sentence pause (a running average learned over
+    the call). An optional partial transcript hint shortens it after a
+    finished sentence or extends it after a trailing "and"/"um".
+    """
+
+    def __init__(self, energy_threshold=ENDPOINT_ENERGY_THRESHOLD, speech_start_ms=ENDPOINT_SPEECH_START_MS,
+                 min_silence_ms=ENDPOINT_MIN_SILENCE_MS, max_silence_ms=ENDPOINT_MAX_SILENCE_MS,
+                 short_utterance_ms=ENDPOINT_SHORT_UTTERANCE_MS, long_utterance_ms=ENDPOINT_LONG_UTTERANCE_MS,
+                 pause_margin=ENDPOINT_PAUSE_MARGIN):
+        self.energy_threshold = energy_threshold
+        self.speech_start_ms = speech_start_ms
+        self.min_silence_ms = min_silence_ms
+        self.max_silence_ms = max_silence_ms
+        self.short_utterance_ms = short_utterance_ms
+        self.long_utterance_ms = long_utterance_ms
+        self.pause_margin = pause_margin
+
+        self.speaking = False
+        self.voiced_ms = 0.0
+        self.utterance_ms = 0.0
+        self.silence_ms = 0.0
+        self.pause_ms = None
+        self.hint = 1.0
+        self.position_ms = 0.0
+
+        # Details of the last completed utterance
+        self.last_utterance_ms = None
+        self.last_silence_ms = None
+        self.last_timeout_ms = None
+
+    def silence_timeout_ms(self):
+        """Trailing silence that currently ends the utterance"""
+        span = max(1.0, self.long_utterance_ms - self.short_utterance_ms)
+        progress = min(1.0, max(0.0, (self.utterance_ms - self.short_utterance_ms) / span))
+        timeout = self.min_silence_ms + progress * (self.max_silence_ms - self.min_silence_ms)
+        if self.pause_ms is not None:
+            timeout = max(timeout, min(self.max_silence_ms, self.pause_ms * self.pause_margin))
+        if self.hint < 1.0:
+            return max(self.min_silence_ms, timeout * self.hint)
+        return min(self.max_silence_ms * CONTINUING_HINT_FACTOR, timeout * self.hint)
+
+    def apply_hint(self, transcript):
+        """Use a partial transcript of the current utterance to adjust the timeout"""
+        if self.speaking:
+            self.hint = hint_factor(transcript)
+
+    def process(self, frame):
+        """
+        Feed one media frame
+
+        Returns:
+            SPEECH_START, SPEECH_END or None
+        """
+        duration = frame_duration_ms(frame)
+        self.position_ms += duration
+        voiced = ulaw_frame_energy(frame) >= self.energy_threshold
+
+        if not self.speaking:
+            if not voiced:
+                self.voiced_ms = 0.0
+                return None
+            self.voiced_ms += duration
+            if self.voiced_ms < self.speech_start_ms:
+                return None
+            self.speaking = True
+            self.utterance_ms = self.voiced_ms
+            self.silence_ms = 0.0
+            self.hint = 1.0
+            return SPEECH_START
+
+        if voiced:
+            if self.silence_ms > 0:
+                # The speaker resumed: learn the pause and drop the stale hint
+                if self.silence_ms >= MIN_PAUSE_MS:
+                    if self.pause_ms is None:
+                        self.pause_ms = self.silence_ms
+                    else:
+                        self.pause_ms += PAUSE_ALPHA * (self.silence_ms - self.pause_ms)
+                self.utterance_ms += self.silence_ms
+                self.silence_ms = 0.0
+                self.hint = 1.0
+            self.utterance_ms += duration
+            return None
+
+        self.silence_ms += duration
+        timeout = self.silence_timeout_ms()
+        if self.silence_ms < timeout:
+            return None
+
+        self.last_utterance_ms = self.utterance_ms
+        self.last_silence_ms = self.silence_ms
+        self.last_timeout_ms = timeout
+        self.speaking = False
+        self.voiced_ms = 0.0
+        self.utterance_ms = 0.0
+        self.silence_ms = 0.0
+        self.hint = 1.0
+        return SPEECH_END
@@ -0,0 +1,221 @@
+import os
+import sys
+import json
+import wave
+import random
+import struct
+import argparse
+
+from metrics import Histogram
+from audio_utils import synthetic_speech, silence, linear_to_ulaw, ulaw_frame_energy, frame_duration_ms, BYTES_PER_MS
+from endpointing import Endpointer, SPEECH_END, ENDPOINT_ENERGY_THRESHOLD
+
+# Offline evaluation of end-of-speech detection over labelled recordings.
+#
+# Replays audio frame by frame through the adaptive Endpointer and through
+# the fixed chunk-count detector receive_audio used before (5 voiced chunks
+# to start, 15 silent chunks to end), and scores each against the labelled
+# utterance boundaries: premature cuts (an end declared while the speaker was
+# mid-utterance), missed ends, and latency from the true end of speech to the
+# declared end. Frame size is varied to show the chunk-count dependence.
+#
+#   python eval_endpointing.py --synthetic 40
+#   python eval_endpointing.py --manifest recordings.json --frame-ms 20 40
+#
+# Manifest format: [{"audio": "call1.ulaw", "utterances": [[start_ms, end_ms], ...]}, ...]
+# Audio is raw 8 kHz µ-law (.ulaw/.raw) or 8 kHz 16-bit mono PCM WAV.
+
+# ANSI colors for terminal output
+class Colors:
+    GREEN = '\033[92m'
+    YELLOW = '\033[93m'
+    RED = '\033[91m'
+    BLUE = '\033[94m'
+    ENDC = '\033[0m'
+    BOLD = '\033[1m'
+
+class FixedChunkEndpointer:
+    """The previous receive_audio detector: thresholds counted in chunks, whatever their size"""
+
+    def __init__(self, energy_threshold=ENDPOINT_ENERGY_THRESHOLD, min_speech_chunks=5, end_of_speech_chunks=15):
+        self.energy_threshold = energy_threshold
+        self.min_speech_chunks = min_speech_chunks
+        self.end_of_speech_chunks = end_of_speech_chunks
+        self.speaking = False
+        self.speech_chunks = 0
+        self.silence_chunks = 0
+        self.position_ms = 0.0
+
+    def process(self, frame):
+        self.position_ms += frame_duration_ms(frame)
+        if ulaw_frame_energy(frame) >= self.energy_threshold:
+            self.silence_chunks = 0
+            if not self.speaking:
+                self.speech_chunks += 1
+                if self.speech_chunks >= self.min_speech_chunks:
+                    self.speaking = True
+                    return SPEECH_START
+            return None
+        if not self.speaking:
+            self.speech_chunks = 0
+            return None
+        self.silence_chunks += 1
+        if self.silence_chunks >= self.end_of_speech_chunks:
+            self.speaking = False
+            self.speech_chunks = 0
+            self.silence_chunks = 0
+            return SPEECH_END
+        return None
+
+# ==================== RECORDINGS ====================
+
+def load_audio(path):
+    """8 kHz µ-law bytes from a raw µ-law file or a 16-bit PCM WAV"""
+    if path.lower().endswith(".wav"):
+        with wave.open(path, "rb") as f:
+            if f.getsampwidth() != 2 or f.getnchannels() != 1 or f.getframerate() != 8000:
+                raise ValueError(f"{path}: expected 8 kHz mono 16-bit PCM")
+            pcm = f.readframes(f.getnframes())
+        samples = struct.unpack(f"<{len(pcm) // 2}h", pcm)
+        return bytes(linear_to_ulaw(sample) for sample in samples)
+    with open(path, "rb") as f:
+        return f.read()
+
+def load_manifest(path):
+    base = os.path.dirname(os.path.abspath(path))
+    with open(path) as f:
+        entries = json.load(f)
+    return [
+        {
+            "name": entry["audio"],
+            "audio": load_audio(os.path.join(base, entry["audio"])),
+            "utterances": [tuple(u) for u in entry["utterances"]],
+        }
+        for entry in entries
+    ]
+
+def synthetic_recordings(count, seed):
+    """
+    Caller turns with known boundaries: a mix of one-word answers and longer
+    sentences with mid-sentence pauses, separated by silence
+    """
+    rng = random.Random(seed)
+    # Sliced rather than synthesized per segment (synthetic_speech is per-sample Python)
+    voices = [synthetic_speech(3000, frequency=frequency, seed=i) for i, frequency in enumerate((150.0, 210.0, 260.0))]
+    recordings = []
+    for index in range(count):
+        voice = voices[index % len(voices)]
+        # Each speaker has their own typical pause length
+        speaker_pause = rng.uniform(150, 420)
+        audio = bytearray(silence(rng.randint(300, 800)))
+        utterances = []
+        for _ in range(rng.randint(4, 8)):
+            start_ms = len(audio) / BYTES_PER_MS
+            if rng.random() < 0.35:
+                segments = [rng.randint(180, 450)]  # "yes", "no", "okay"
+            else:
+                segments = [rng.randint(300, 1400) for _ in range(rng.randint(2, 5))]
+            for i, segment_ms in enumerate(segments):
+                if i:
+                    audio += silence(int(max(90, rng.gauss(speaker_pause, 60))))
+                offset = rng.randint(0, len(voice) - segment_ms * BYTES_PER_MS)
+                audio += voice[offset:offset + segment_ms * BYTES_PER_MS]
+            utterances.append((start_ms, len(audio) / BYTES_PER_MS))
+            audio += silence(rng.randint(1500, 2500))
+        recordings.append({"name": f"synthetic-{index:03d}", "audio": bytes(audio), "utterances": utterances})
+    return recordings
+
+# ==================== SCORING ====================
+
+def run_detector(detector, audio, frame_ms):
+    """Times (ms into the audio) at which the detector declared end of speech"""
+    frame_bytes = int(frame_ms * BYTES_PER_MS)
+    ends = []
+    for offset in range(0, len(audio), frame_bytes):
+        if detector.process(audio[offset:offset + frame_bytes]) == SPEECH_END:
+            ends.append(detector.position_ms)
+    return ends
+
+def score(ends, utterances, latency, totals):
+    """Match declared ends against labelled utterances"""
+    claimed = set()
+    for end in ends:
+        inside = next((i for i, (start, stop) in enumerate(utterances) if start <= end < stop), None)
+        if inside is not None:
+            totals["premature_cuts"] += 1
+            continue
+        finished = [i for i, (_, stop) in enumerate(utterances) if stop <= end and i not in claimed]
+        if not finished:
+            totals["spurious"] += 1
+            continue
+        # The most recent finished utterance; earlier unclaimed ones were merged into it
+        latest = finished[-1]
+        claimed.update(finished)
+        latency.observe((end - utterances[latest][1]) / 1000.0)
+        totals["detected"] += 1
+    totals["utterances"] += len(utterances)
+    totals["missed"] += len(utterances) - len(claimed)
+
+def evaluate(recordings, configs, frame_sizes):
+    results = []
+    for frame_ms in frame_sizes:
+        for name, factory in configs.items():
+            latency = Histogram(buckets=(0.1, 0.25, 0.5, 0.75, 1.0, 1.5, 2.0, 3.0), window=100000)
+            totals = {"utterances": 0, "detected": 0, "premature_cuts": 0, "missed": 0, "spurious": 0}
+            for recording in recordings:
+                score(run_detector(factory(), recording["audio"], frame_ms), recording["utterances"], latency, totals)
+            summary = latency.snapshot()
+            results.append(dict(
+                totals,
+                detector=name,
+                frame_ms=frame_ms,
+                latency_ms={key: round(summary[key] * 1000) if summary[key] is not None else None for key in ("avg", "p50", "p95", "max")},
+            ))
+    return results
+
+def print_results(results):
+    print(f"\n{Colors.BOLD}===== Endpointing evaluation ====={Colors.ENDC}")
+    print(f"{'detector':<10}{'frame':>7}{'utts':>7}{'found':>7}{'cuts':>7}{'missed':>8}{'extra':>7}{'avg ms':>9}{'p50 ms':>9}{'p95 ms':>9}")
+    for r in results:
+        color = Colors.RED if r["premature_cuts"] else Colors.GREEN
+        latency = r["latency_ms"]
+        print(
+            f"{r['detector']:<10}{r['frame_ms']:>6}ms{r['utterances']:>7}{r['detected']:>7}"
+            f"{color}{r['premature_cuts']:>7}{Colors.ENDC}{r['missed']:>8}{r['spurious']:>7}"
+            f"{latency['avg'] or '-':>9}{latency['p50'] or '-':>9}{latency['p95'] or '-':>9}"
+        )
+
+def main():
+    parser = argparse.ArgumentParser(description="Evaluate end-of-speech detection on labelled audio")
+    parser.add_argument("--manifest", help="JSON list of recordings with labelled utterances")
+    parser.add_argument("--synthetic", type=int, default=0, help="Also evaluate this many generated recordings")
+    parser.add_argument("--frame-ms", type=float, nargs="+", default=[20.0], help="Media frame sizes to replay with")
+    parser.add_argument("--min-silence-ms", type=float, help="Override ENDPOINT_MIN_SILENCE_MS")
+    parser.add_argument("--max-silence-ms", type=float, help="Override ENDPOINT_MAX_SILENCE_MS")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--json", action="store_true", help="Print results as JSON")
+    args = parser.parse_args()
+
+    recordings = load_manifest(args.manifest) if args.manifest else []
+    if args.synthetic or not recordings:
+        recordings += synthetic_recordings(args.synthetic or 20, args.seed)
+
+    overrides = {}
+    if args.min_silence_ms is not None:
+        overrides["min_silence_ms"] = args.min_silence_ms
+    if args.max_silence_ms is not None:
+        overrides["max_silence_ms"] = args.max_silence_ms
+    configs = {
+        "fixed": FixedChunkEndpointer,
+        "adaptive": lambda: Endpointer(**overrides),
+    }
+
+    results = evaluate(recordings, configs, args.frame_ms)
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        print(f"Recordings: {len(recordings)}")
+        print_results(results)
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,259 @@
+import os
+import re
+import json
+import uuid
+import random
+import asyncio
+import argparse
+from collections import Counter
+from datetime import datetime, timezone
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+import uvicorn
+from audio_utils import synthetic_speech, BYTES_PER_MS
+
+# Local stand-ins for the external APIs the backend talks to, so load tests and
+# benchmarks run offline. Point the services at it with e.g.
+#   VAPI_BASE_URL=http://127.0.0.1:8100  OPENAI_BASE_URL=http://127.0.0.1:8100/v1
+#   OPENAI_API_BASE=http://127.0.0.1:8100/v1  ELEVENLABS_BASE_URL=http://127.0.0.1:8100
+#   TWILIO_API_BASE_URL=http://127.0.0.1:8100
+# and, for the Google Speech health probe, a service account key file whose
+# token_uri is http://127.0.0.1:8100/token
+
+# Simulated provider latency (milliseconds) applied to every request
+FAKE_PROVIDER_LATENCY_MS = float(os.getenv("FAKE_PROVIDER_LATENCY_MS", "20"))
+# Fraction of call-creation requests that fail with a transient 429/503
+FAKE_PROVIDER_ERROR_RATE = float(os.getenv("FAKE_PROVIDER_ERROR_RATE", "0"))
+
+app = FastAPI(title="Fake provider APIs")
+
+# Request counts per route, exposed on /_stats
+request_counts = Counter()
+
+# Synthesized speech length per character of TTS input, and one second of
+# deterministic audio that responses are cut from
+TTS_MS_PER_CHARACTER = 60
+TTS_AUDIO_LOOP = synthetic_speech(1000, frequency=180.0)
+
+async def simulate_latency(route):
+    request_counts[route] += 1
+    if FAKE_PROVIDER_LATENCY_MS > 0:
+        await asyncio.sleep(FAKE_PROVIDER_LATENCY_MS / 1000.0)
+
+def unauthorized(request, header):
+    """401 for requests without credentials, so health probes see an auth failure"""
+    if not request.headers.get(header):
+        return JSONResponse({"message": "Missing credentials"}, status_code=401)
+    return None
+
+def transient_failure(route):
+    """Randomly fail call creation so retry paths get exercised"""
+    if FAKE_PROVIDER_ERROR_RATE and random.random() < FAKE_PROVIDER_ERROR_RATE:
+        request_counts[f"{route}.failed"] += 1
+        if random.random() < 0.5:
+            return JSONResponse({"message": "Too many requests"}, status_code=429, headers={"Retry-After": "0.2"})
+        return JSONResponse({"message": "Service unavailable"}, status_code=503)
+    return None
+
+# ==================== VAPI ====================
+
+@app.post("/call")
+async def vapi_create_call(request: Request):
+    """Create an outbound call (VAPI POST /call)"""
+    await simulate_latency("vapi.create_call")
+    failure = transient_failure("vapi.create_call")
+    if failure is not None:
+        return failure
+    payload = await request.json()
+    call_id = str(uuid.uuid4())
+    return JSONResponse(
+        {
+            "id": call_id,
+            "type": payload.get("type", "outboundPhoneCall"),
+            "status": "queued",
+            "customer": payload.get("customer", {}),
+            "createdAt": datetime.now(timezone.utc).isoformat(),
+        },
+        status_code=201
+    )
+
+@app.get("/call/{call_id}")
+async def vapi_get_call(call_id: str, request: Request):
+    """Call details, including the monitor control URL (VAPI GET /call/{id})"""
+    await simulate_latency("vapi.get_call")
+    base_url = str(request.base_url).rstrip("/")
+    return {
+        "id": call_id,
+        "status": "in-progress",
+        "startTime": datetime.now(timezone.utc).isoformat().replace("+00:00", "Z"),
+        "recordingUrl": f"{base_url}/recordings/{call_id}.wav",
+        "assistant": {"name": "load-test"},
+        "to": "+15550000000",
+        "monitor": {"controlUrl": f"{base_url}/control/{call_id}"},
+    }
+
+@app.post("/control/{call_id}")
+async def vapi_control(call_id: str, request: Request):
+    """Live call control URL (accepts `say` commands)"""
+    await simulate_latency("vapi.control")
+    await request.body()
+    return {"status": "ok"}
+
+@app.get("/assistant")
+async def vapi_list_assistants(request: Request):
+    """List assistants (used by health probes to check the API key)"""
+    await simulate_latency("vapi.list_assistants")
+    return unauthorized(request, "authorization") or [{"id": str(uuid.uuid4()), "name": "load-test"}]
+
+# ==================== TWILIO ====================
+
+@app.get("/2010-04-01/Accounts/{account_sid}.json")
+async def twilio_fetch_account(account_sid: str, request: Request):
+    """Account details (Twilio Account resource)"""
+    await simulate_latency("twilio.fetch_account")
+    return unauthorized(request, "authorization") or {"sid": account_sid, "friendly_name": "Fake account", "status": "active"}
+
+@app.get("/2010-04-01/Accounts/{account_sid}/IncomingPhoneNumbers.json")
+async def twilio_list_numbers(account_sid: str, request: Request, PhoneNumber: str = ""):
+    """The account's numbers; every number is owned by the fake account"""
+    await simulate_latency("twilio.list_numbers")
+    numbers = [{"sid": "PN" + uuid.uuid4().hex, "phone_number": PhoneNumber}] if PhoneNumber else []
+    return unauthorized(request, "authorization") or {"incoming_phone_numbers": numbers}
+
+@app.post("/2010-04-01/Accounts/{account_sid}/Calls.json")
+async def twilio_create_call(account_sid: str, request: Request):
+    """Create an outbound call (Twilio Calls resource, form-encoded)"""
+    await simulate_latency("twilio.create_call")
+    failure = transient_failure("twilio.create_call")
+    if failure is not None:
+        return failure
+    form = await request.form()
+    call_sid = "CA" + uuid.uuid4().hex
+    return JSONResponse(
+        {
+            "sid": call_sid,
+            "account_sid": account_sid,
+            "to": form.get("To"),
+            "from": form.get("From"),
+            "status": "queued",
+        },
+        status_code=201
+    )
+
+@app.post("/2010-04-01/Accounts/{account_sid}/Calls/{call_sid}.json")
+async def twilio_update_call(account_sid: str, call_sid: str, request: Request):
+    """Update a call, e.g. Status=completed to hang up (Twilio Call resource)"""
+    await simulate_latency("twilio.update_call")
+    form = await request.form()
+    if not call_sid.startswith("CA"):
+        return JSONResponse(
+            {"code": 20404, "message": f"The requested resource {request.url.path} was not found", "status": 404},
+            status_code=404
+        )
+    return {
+        "sid": call_sid,
+        "account_sid": account_sid,
+        "status": form.get("Status", "in-progress"),
+    }
+
+# ==================== OPENAI ====================
+
+@app.get("/v1/models")
+async def openai_list_models(request: Request):
+    """Available models (used by health probes to check the API key)"""
+    await simulate_latency("openai.list_models")
+    models = [{"id": model, "object": "model", "owned_by": "openai"} for model in ("gpt-3.5-turbo", "gpt-4o")]
+    return unauthorized(request, "authorization") or {"object": "list", "data": models}
+
+@app.post("/v1/chat/completions")
+async def openai_chat_completions(request: Request):
+    """Deterministic chat completion matching the JSON shapes call_analysis expects"""
+    await simulate_latency("openai.chat_completions")
+    payload = await request.json()
+    prompt = " ".join(m.get("content", "") for m in payload.get("messages", []))
+
+    if "politeness_score" in prompt:
+        content = {
+            "politeness_score": 7,
+            "helpfulness_score": 7,
+            "communication_score": 7,
+            "overall_score": 7,
+            "strengths": ["clear"],
+            "areas_for_improvement": ["pace"],
+            "summary": "Synthetic evaluation",
+        }
+    elif "issue_detected" in prompt:
+        # Flag roughly one in four messages so event inserts are exercised too
+        flagged = sum(map(ord, prompt)) % 4 == 0
+        content = {
+            "issue_detected": flagged,
+            "issue_type": "rudeness" if flagged else "",
+            "description": "Synthetic issue" if flagged else "",
+            "severity": 3 if flagged else 0,
+        }
+    elif '"injections"' in prompt:
+        count = re.search(r"Write (\d+)", prompt)
+        content = {"injections": [f"Synthetic injection {uuid.uuid4().hex[:8]}." for _ in range(int(count.group(1)) if count else 5)]}
+    else:
+        content = None
+
+    message = json.dumps(content) if content is not None else "Sure, I can help with that."
+    return {
+        "id": f"chatcmpl-{uuid.uuid4().hex[:12]}",
+        "object": "chat.completion",
+        "model": payload.get("model", "gpt-4o"),
+        "choices": [{"index": 0, "message": {"role": "assistant", "content": message}, "finish_reason": "stop"}],
+    }
+
+# ==================== ELEVENLABS ====================
+
+@app.get("/v1/voices")
+async def elevenlabs_list_voices(request: Request):
+    """Available voices, including the default voice ID"""
+    await simulate_latency("elevenlabs.list_voices")
+    return unauthorized(request, "xi-api-key") or {"voices": [{"voice_id": "21m00Tcm4TlvDq8ikWAM", "name": "Rachel"}]}
+
+@app.post("/v1/text-to-speech/{voice_id}/stream")
+async def elevenlabs_stream(voice_id: str, request: Request):
+    """Stream deterministic µ-law audio whose length scales with the input text"""
+    await simulate_latency("elevenlabs.stream")
+    payload = await request.json()
+    total_bytes = max(1, len(payload.get("text", ""))) * TTS_MS_PER_CHARACTER * BYTES_PER_MS
+
+    async def audio_chunks():
+        sent = 0
+        while sent < total_bytes:
+            size = min(1024, total_bytes - sent)
+            offset = sent % len(TTS_AUDIO_LOOP)
+            chunk = (TTS_AUDIO_LOOP[offset:] + TTS_AUDIO_LOOP)[:size]
+            sent += size
+            yield chunk
+            # Yield control so many concurrent streams interleave like a real API
+            await asyncio.sleep(0)
+
+    return StreamingResponse(audio_chunks(), media_type="audio/basic")
+
+# ==================== GOOGLE ====================
+
+@app.post("/token")
+async def google_token(request: Request):
+    """OAuth token exchange (service account JWT grant), as used by credential refreshes"""
+    await simulate_latency("google.token")
+    form = (await request.body()).decode()
+    if "assertion=" not in form:
+        return JSONResponse({"error": "invalid_grant", "error_description": "Missing assertion"}, status_code=400)
+    return {"access_token": f"fake-{uuid.uuid4().hex}", "expires_in": 3600, "token_type": "Bearer"}
+
+# ==================== STATS ====================
+
+@app.get("/_stats")
+async def stats():
+    """Requests served per fake route"""
+    return dict(request_counts)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run fake VAPI/Twilio/OpenAI/ElevenLabs endpoints for offline testing")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8100)
+    args = parser.parse_args()
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
@@ -0,0 +1,235 @@
+import os
+import json
+import time
+import asyncio
+
+import aiohttp
+from dotenv import load_dotenv
+from fastapi.responses import JSONResponse
+
+from metrics import Counter, HistogramFamily
+from log_config import get_logger
+
+# Load environment variables
+load_dotenv()
+
+logger = get_logger("health_probes")
+
+# Per-dependency timeout; a probe that takes longer reports "timeout"
+HEALTH_PROBE_TIMEOUT = float(os.getenv("HEALTH_PROBE_TIMEOUT", "5"))
+# How long a completed round of probes is served from cache
+HEALTH_PROBE_TTL = float(os.getenv("HEALTH_PROBE_TTL", "10"))
+
+OK = "ok"
+WARNING = "warning"
+ERROR = "error"
+TIMEOUT = "timeout"
+
+health_probe_seconds = HistogramFamily("health_probe_seconds", "Latency of dependency health probes", ("dependency",))
+health_probe_results_total = Counter("health_probe_results_total", "Dependency health probe results", ("dependency", "status"))
+
+class ProbeFailed(Exception):
+    """A dependency check failed with a message for the report"""
+
+def _openai_base_url():
+    # OPENAI_BASE_URL (openai>=1) or OPENAI_API_BASE (openai 0.28)
+    return os.getenv("OPENAI_BASE_URL") or os.getenv("OPENAI_API_BASE") or "https://api.openai.com/v1"
+
+async def _get_json(session, url, **kwargs):
+    async with session.get(url, **kwargs) as response:
+        body = await response.text()
+        if response.status == 401 or response.status == 403:
+            raise ProbeFailed(f"Authentication failed ({response.status})")
+        if response.status != 200:
+            raise ProbeFailed(f"HTTP {response.status}: {body[:200]}")
+        return json.loads(body)
+
+# ==================== PROBES ====================
+# Each probe is async (session) -> (status, detail) and raises ProbeFailed
+# for an error; they call cheap read-only endpoints with the configured
+# credentials, so they work against fake_providers offline.
+
+async def probe_twilio(session):
+    account_sid = os.getenv("TWILIO_ACCOUNT_SID")
+    auth_token = os.getenv("TWILIO_AUTH_TOKEN")
+    phone_number = os.getenv("TWILIO_PHONE_NUMBER")
+    if not account_sid or not auth_token:
+        raise ProbeFailed("Missing TWILIO_ACCOUNT_SID or TWILIO_AUTH_TOKEN")
+
+    base_url = f"{os.getenv('TWILIO_API_BASE_URL', 'https://api.twilio.com')}/2010-04-01/Accounts/{account_sid}"
+    auth = aiohttp.BasicAuth(account_sid, auth_token)
+    account = await _get_json(session, f"{base_url}.json", auth=auth)
+    detail = f"Connected to account: {account.get('friendly_name')}"
+    if not phone_number:
+        return WARNING, f"{detail}; TWILIO_PHONE_NUMBER not set"
+    numbers = await _get_json(session, f"{base_url}/IncomingPhoneNumbers.json", params={"PhoneNumber": phone_number}, auth=auth)
+    if not numbers.get("incoming_phone_numbers"):
+        return WARNING, f"{detail}; phone number {phone_number} not found in the account"
+    return OK, f"{detail}; phone number {phone_number} is valid"
+
+# OAuth scope requested by the Google Speech probe's token refresh
+GOOGLE_CLOUD_SCOPE = "https://www.googleapis.com/auth/cloud-platform"
+
+async def probe_google_speech(session):
+    credentials_path = os.getenv("GOOGLE_APPLICATION_CREDENTIALS")
+    if not credentials_path:
+        raise ProbeFailed("GOOGLE_APPLICATION_CREDENTIALS not set")
+    if not os.path.exists(credentials_path):
+        raise ProbeFailed(f"Credentials file not found at: {credentials_path}")
+
+    def check():
+        import google.auth
+        from google.auth.exceptions import GoogleAuthError
+        from google.auth.transport.requests import Request as AuthRequest
+        # Fresh credentials on every run (not the cached Speech client's) and
+        # a token refresh, so a revoked or deleted key fails the probe
+        try:
+            credentials, project_id = google.auth.load_credentials_from_file(credentials_path, scopes=[GOOGLE_CLOUD_SCOPE])
+            credentials.refresh(AuthRequest())
+        except GoogleAuthError as e:
+            raise ProbeFailed(f"Authentication failed: {e}")
+        return project_id
+
+    try:
+        project_id = await asyncio.to_thread(check)
+    except (OSError, ValueError, ImportError) as e:
+        raise ProbeFailed(str(e))
+    if not project_id:
+        return WARNING, "Authenticated; credentials file has no project_id"
+    return OK, f"Authenticated for project: {project_id}"
+
+async def probe_openai(session):
+    api_key = os.getenv("OPENAI_API_KEY")
+    if not api_key:
+        raise ProbeFailed("OPENAI_API_KEY not set")
+    # Listing models checks the key without spending tokens
+    models = await _get_json(session, f"{_openai_base_url()}/models", headers={"Authorization": f"Bearer {api_key}"})
+    return OK, f"{len(models.get('data', []))} models available"
+
+async def probe_elevenlabs(session):
+    api_key = os.getenv("ELEVENLABS_API_KEY")
+    voice_id = os.getenv("ELEVENLABS_VOICE_ID", "21m00Tcm4TlvDq8ikWAM")
+    if not api_key:
+        raise ProbeFailed("ELEVENLABS_API_KEY not set")
+    base_url = os.getenv("ELEVENLABS_BASE_URL", "https://api.elevenlabs.io")
+    voices = (await _get_json(session, f"{base_url}/v1/voices", headers={"xi-api-key": api_key})).get("voices", [])
+    if not any(voice.get("voice_id") == voice_id for voice in voices):
+        return WARNING, f"Found {len(voices)} voices; voice ID {voice_id} not among them"
+    return OK, f"Found {len(voices)} voices including {voice_id}"
+
+async def probe_vapi(session):
+    api_key = os.getenv("VAPI_API_KEY")
+    if not api_key:
+        raise ProbeFailed("VAPI_API_KEY not set")
+    base_url = os.getenv("VAPI_BASE_URL", "https://api.vapi.ai")
+    assistants = await _get_json(session, f"{base_url}/assistant", params={"limit": "1"}, headers={"Authorization": f"Bearer {api_key}"})
+    return OK, f"Authenticated ({len(assistants)} assistant(s) returned)"
+
+async def probe_database(session):
+    if not os.getenv("DATABASE_URL"):
+        raise ProbeFailed("DATABASE_URL not set")
+
+    def check():
+        from sqlalchemy import text
+        import db_operations
+        with db_operations.engine.connect() as conn:
+            conn.execute(text("SELECT 1"))
+        return db_operations.engine.dialect.name
+
+    try:
+        dialect = await asyncio.to_thread(check)
+    except Exception as e:
+        raise ProbeFailed(f"{type(e).__name__}: {e}")
+    return OK, f"Connected ({dialect})"
+
+PROBES = {
+    "twilio": probe_twilio,
+    "google_speech": probe_google_speech,
+    "openai": probe_openai,
+    "elevenlabs": probe_elevenlabs,
+    "vapi": probe_vapi,
+    "database": probe_database,
+}
+
+# Dependencies of each service
+PHONE_CALLER_PROBES = ("twilio", "google_speech", "openai", "elevenlabs")
+VAPI_SERVER_PROBES = ("vapi", "openai", "database")
+
+class HealthProber:
+    """
+    Runs dependency probes concurrently, each with its own timeout, so a
+    full check takes as long as the slowest dependency rather than the sum.
+
+    A completed round is cached for `ttl` seconds, and concurrent callers
+    share the round in flight, so a busy /health/deep endpoint or load
+    balancer does not multiply requests to the providers.
+    """
+
+    def __init__(self, names, timeout=HEALTH_PROBE_TIMEOUT, ttl=HEALTH_PROBE_TTL, probes=None):
+        self.probes = {name: (probes or PROBES)[name] for name in names}
+        self.timeout = timeout
+        self.ttl = ttl
+        self._cached = None
+        self._cached_at = 0.0
+        self._in_flight = None
+
+    async def _run_probe(self, session, name, probe):
+        started_at = time.perf_counter()
+        try:
+            status, detail = await asyncio.wait_for(probe(session), self.timeout)
+        except asyncio.TimeoutError:
+            status, detail = TIMEOUT, f"No answer within {self.timeout:g}s"
+        except ProbeFailed as e:
+            status, detail = ERROR, str(e)
+        except (aiohttp.ClientError, ValueError) as e:
+            status, detail = ERROR, f"{type(e).__name__}: {e}"
+        except Exception as e:
+            logger.exception("Health probe %s crashed", name)
+            status, detail = ERROR, f"{type(e).__name__}: {e}"
+        elapsed = time.perf_counter() - started_at
+        health_probe_seconds.observe(elapsed, dependency=name)
+        health_probe_results_total.inc(dependency=name, status=status)
+        return name, {"status": status, "latency_ms": round(elapsed * 1000, 1), "detail": detail}
+
+    async def _run(self):
+        started_at = time.perf_counter()
+        async with aiohttp.ClientSession() as session:
+            results = await asyncio.gather(*(self._run_probe(session, name, probe) for name, probe in self.probes.items()))
+        dependencies = dict(results)
+        healthy = all(result["status"] in (OK, WARNING) for result in dependencies.values())
+        report = {
+            "status": "healthy" if healthy else "unhealthy",
+            "checked_at": time.time(),
+            "latency_ms": round((time.perf_counter() - started_at) * 1000, 1),
+            "dependencies": dependencies,
+        }
+        self._cached, self._cached_at = report, time.monotonic()
+        return report
+
+    async def check(self, refresh=False):
+        """
+        Probe every dependency (or return the cached report)
+
+        Returns:
+            dict: overall status, total latency and per-dependency status,
+                latency and detail, plus `cached` and its age
+        """
+        if not refresh and self._cached is not None and time.monotonic() - self._cached_at < self.ttl:
+            return dict(self._cached, cached=True, age_seconds=round(time.monotonic() - self._cached_at, 1))
+        if self._in_flight is None or self._in_flight.done():
+            self._in_flight = asyncio.ensure_future(self._run())
+        # Shielded: a client disconnecting does not cancel the round for the others
+        report = await asyncio.shield(self._in_flight)
+        return dict(report, cached=False, age_seconds=0.0)
+
+def install(app, names):
+    """Add GET /health/deep (503 when a dependency is failing) to a FastAPI app"""
+    prober = HealthProber(names)
+
+    async def deep_health(refresh: bool = False):
+        """Concurrent dependency probes with per-dependency latency (cached for HEALTH_PROBE_TTL)"""
+        report = await prober.check(refresh=refresh)
+        return JSONResponse(report, status_code=200 if report["status"] == "healthy" else 503)
+
+    app.add_api_route("/health/deep", deep_health, methods=["GET"])
+    return prober
@@ -0,0 +1,271 @@
+import os
+import json
+import math
+import time
+import random
+import asyncio
+
+import aiohttp
+from dotenv import load_dotenv
+
+from metrics import Counter, Gauge, HistogramFamily
+from log_config import get_logger
+
+# Load environment variables
+load_dotenv()
+
+logger = get_logger("injection_content")
+
+# JSON file with extra message pools:
+#   [{"persona": "support-bot", "scenario": "billing", "messages": ["...", ...]}, ...]
+# persona/scenario default to "*" (any)
+INJECTION_CONTENT_PATH = os.getenv("INJECTION_CONTENT_PATH")
+# Load message pools from the injection_messages table at startup
+INJECTION_CONTENT_FROM_DB = os.getenv("INJECTION_CONTENT_FROM_DB", "1") == "1"
+# LLM-written messages to pre-generate per pool in the background after
+# startup (0 disables)
+INJECTION_LLM_MESSAGES = int(os.getenv("INJECTION_LLM_MESSAGES", "0"))
+INJECTION_LLM_MODEL = os.getenv("INJECTION_LLM_MODEL", "gpt-4o")
+INJECTION_LLM_TIMEOUT = float(os.getenv("INJECTION_LLM_TIMEOUT", "60"))
+OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
+OPENAI_BASE_URL = os.getenv("OPENAI_BASE_URL", "https://api.openai.com/v1")
+
+# Wildcard persona/scenario
+ANY = "*"
+
+# Default pool, used for calls no configured pool matches
+STRANGE_MESSAGES = [
+    "My skin feels like it's made of tiny ants today.",
+    "Sometimes I can taste the color blue.",
+    "The government is tracking me through my fillings.",
+    "I just remembered I left my other personality in the washing machine.",
+    "The moon landing was filmed in my basement.",
+    "My teeth are sending radio signals to Mars.",
+    "Yesterday, I saw a squirrel reading a newspaper.",
+    "The number 7 has been following me all week.",
+    "I'm actually three raccoons in a human costume."
+]
+
+injection_content_picks_total = Counter("injection_content_picks_total", "Injected messages chosen by pool", ("pool",))
+injection_pool_messages = Gauge("injection_pool_messages", "Messages in each injection content pool", ("pool",))
+injection_generation_seconds = HistogramFamily(
+    "injection_generation_seconds", "Time to pre-generate LLM injections for a pool", ("outcome",)
+)
+
+def pool_name(key):
+    return f"{key[0]}/{key[1]}"
+
+def _coprime_stride(n, rng):
+    # Rejection sampling; a random stride is coprime with n often enough
+    # (probability phi(n)/n) that this takes a couple of tries at most
+    if n <= 2:
+        return 1
+    while True:
+        stride = rng.randrange(1, n)
+        if math.gcd(stride, n) == 1:
+            return stride
+
+class ShuffleCursor:
+    """
+    A call's walk through a message pool in pseudo-random order.
+
+    Message i of the walk is (start + i * stride) mod n. With the stride
+    coprime to n that visits every message exactly once per n picks, so a
+    call hears no repeat until it has heard the whole pool, with O(1) time
+    and memory per pick instead of a shuffled copy of the pool per call.
+    """
+
+    __slots__ = ("messages", "start", "stride", "position")
+
+    def __init__(self, messages, rng):
+        self.messages = messages
+        self.start = rng.randrange(len(messages))
+        self.stride = _coprime_stride(len(messages), rng)
+        self.position = 0
+
+    def next(self):
+        index = (self.start + self.position * self.stride) % len(self.messages)
+        self.position += 1
+        return self.messages[index]
+
+def _dedupe(messages):
+    return tuple(dict.fromkeys(message.strip() for message in messages if message and message.strip()))
+
+class ContentEngine:
+    """
+    Chooses what to inject into a call.
+
+    Message pools are indexed by (persona, scenario), where persona is the
+    assistant's name and scenario comes from the call's metadata. They are
+    loaded once at startup (injection_messages table, INJECTION_CONTENT_PATH)
+    and optionally extended with LLM-written messages generated in the
+    background, so `choose()` is a dict lookup plus a cursor step and never
+    waits on I/O. A call's pool is picked when its details are known:
+    (persona, scenario), then (*, scenario), then (persona, *), then the
+    default STRANGE_MESSAGES pool.
+    """
+
+    def __init__(self, default_messages=STRANGE_MESSAGES, seed=None):
+        self._pools = {}
+        self._cursors = {}
+        self._rng = random.Random(seed)
+        self._tasks = set()
+        self.set_pool(ANY, ANY, default_messages)
+
+    def set_pool(self, persona, scenario, messages):
+        """Replace a pool; calls already walking the old pool keep it"""
+        key = (persona or ANY, scenario or ANY)
+        messages = _dedupe(messages)
+        if not messages:
+            return
+        # Pools are immutable tuples swapped in whole, so readers never see a partial update
+        self._pools[key] = messages
+        injection_pool_messages.set(len(messages), pool=pool_name(key))
+
+    def add_messages(self, persona, scenario, messages):
+        key = (persona or ANY, scenario or ANY)
+        self.set_pool(key[0], key[1], self._pools.get(key, ()) + tuple(messages))
+
+    def load_rows(self, rows):
+        """Add (persona, scenario, message) rows, grouped into pools"""
+        grouped = {}
+        for persona, scenario, message in rows:
+            grouped.setdefault((persona or ANY, scenario or ANY), []).append(message)
+        for (persona, scenario), messages in grouped.items():
+            self.add_messages(persona, scenario, messages)
+        return len(grouped)
+
+    def load_file(self, path):
+        with open(path) as f:
+            entries = json.load(f)
+        return self.load_rows(
+            (entry.get("persona"), entry.get("scenario"), message)
+            for entry in entries
+            for message in entry.get("messages", [])
+        )
+
+    def pools(self):
+        """Pool sizes by 'persona/scenario'"""
+        return {pool_name(key): len(messages) for key, messages in self._pools.items()}
+
+    def pool_for(self, persona=None, scenario=None):
+        persona, scenario = persona or ANY, scenario or ANY
+        for key in ((persona, scenario), (ANY, scenario), (persona, ANY), (ANY, ANY)):
+            if key in self._pools:
+                return key
+        return (ANY, ANY)
+
+    def assign(self, call_id, persona=None, scenario=None):
+        """Start a call's walk through the pool matching its persona and scenario"""
+        key = self.pool_for(persona, scenario)
+        self._cursors[call_id] = (key, ShuffleCursor(self._pools[key], self._rng))
+        return key
+
+    def assign_from_call(self, call_id, call_data):
+        """assign() from VAPI call details (assistant name and metadata.scenario)"""
+        persona = (call_data.get("assistant") or {}).get("name")
+        scenario = (call_data.get("metadata") or {}).get("scenario")
+        key = self.assign(call_id, persona, scenario)
+        logger.debug("Injection pool %s for persona=%s scenario=%s", pool_name(key), persona, scenario, extra={"call_id": call_id})
+
+    def choose(self, call_id):
+        """Next message for a call (calls never assigned use the default pool)"""
+        if call_id not in self._cursors:
+            self.assign(call_id)
+        key, cursor = self._cursors[call_id]
+        injection_content_picks_total.inc(pool=pool_name(key))
+        return cursor.next()
+
+    def release(self, call_id):
+        self._cursors.pop(call_id, None)
+
+    # ==================== LOADING AND PRE-GENERATION ====================
+
+    def _load_sources(self):
+        if INJECTION_CONTENT_FROM_DB and os.getenv("DATABASE_URL"):
+            try:
+                import db_operations
+                loaded = self.load_rows(db_operations.load_injection_messages())
+                logger.info("Loaded %s injection pools from the database", loaded)
+            except Exception as e:
+                logger.warning("Could not load injection content from the database: %s", e)
+        if INJECTION_CONTENT_PATH:
+            try:
+                loaded = self.load_file(INJECTION_CONTENT_PATH)
+                logger.info("Loaded %s injection pools from %s", loaded, INJECTION_CONTENT_PATH)
+            except (OSError, ValueError, AttributeError) as e:
+                logger.warning("Could not load injection content from %s: %s", INJECTION_CONTENT_PATH, e)
+
+    async def start(self):
+        """Load the configured pools, then pre-generate LLM messages in the background if enabled"""
+        await asyncio.to_thread(self._load_sources)
+        if INJECTION_LLM_MESSAGES > 0 and OPENAI_API_KEY:
+            task = asyncio.ensure_future(self.pregenerate(INJECTION_LLM_MESSAGES))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def close(self):
+        tasks = list(self._tasks)
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    async def pregenerate(self, count, keys=None):
+        """
+        Ask the LLM for `count` new messages per pool (one request per pool,
+        all in parallel) and add them to the pools
+
+        Returns:
+            int: Messages added
+        """
+        keys = list(keys or self._pools)
+        timeout = aiohttp.ClientTimeout(total=INJECTION_LLM_TIMEOUT)
+        async with aiohttp.ClientSession(timeout=timeout) as session:
+            results = await asyncio.gather(*(self._generate(session, key, count) for key in keys))
+        added = sum(results)
+        logger.info("Pre-generated %s injection messages for %s pools", added, len(keys))
+        return added
+
+    async def _generate(self, session, key, count):
+        persona, scenario = key
+        examples = "\n".join(f"- {message}" for message in self._pools[key][:5])
+        prompt = f"""
+        Write {count} short, strange, off-topic remarks that the person on a
+        phone call might suddenly blurt out, to test how an AI assistant
+        copes. Each should be one sentence of natural spoken English.
+
+        Assistant persona: {"any" if persona == ANY else persona}
+        Scenario: {"any" if scenario == ANY else scenario}
+
+        Examples of the tone:
+        {examples}
+
+        Respond in JSON format with the following structure:
+        {{"injections": ["...", "..."]}}
+        """
+        payload = {
+            "model": INJECTION_LLM_MODEL,
+            "messages": [{"role": "user", "content": prompt}],
+            "temperature": 1.0,
+            "response_format": {"type": "json_object"}
+        }
+        headers = {"Authorization": f"Bearer {OPENAI_API_KEY}"}
+        started_at = time.perf_counter()
+        outcome = "failure"
+        try:
+            async with session.post(f"{OPENAI_BASE_URL}/chat/completions", json=payload, headers=headers) as response:
+                if response.status != 200:
+                    logger.warning("Injection generation for %s failed: %s - %s", pool_name(key), response.status, (await response.text())[:200])
+                    return 0
+                result = await response.json(content_type=None)
+            messages = json.loads(result["choices"][0]["message"]["content"]).get("injections", [])
+            messages = [message for message in messages if isinstance(message, str)][:count]
+            before = len(self._pools[key])
+            self.add_messages(persona, scenario, messages)
+            outcome = "success"
+            return len(self._pools[key]) - before
+        except (aiohttp.ClientError, asyncio.TimeoutError, ValueError, KeyError, IndexError, AttributeError) as e:
+            logger.warning("Injection generation for %s failed: %s: %s", pool_name(key), type(e).__name__, e)
+            return 0
+        finally:
+            injection_generation_seconds.observe(time.perf_counter() - started_at, outcome=outcome)
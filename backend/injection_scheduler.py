@@ -0,0 +1,248 @@
+import os
+import time
+import random
+import asyncio
+
+import aiohttp
+from dotenv import load_dotenv
+
+from metrics import Counter, HistogramFamily
+from log_config import get_logger
+from dialer import TRANSIENT_STATUSES, NOT_PROCESSED_STATUSES
+
+# Load environment variables
+load_dotenv()
+
+logger = get_logger("injection_scheduler")
+
+VAPI_API_KEY = os.getenv("VAPI_API_KEY")
+VAPI_BASE_URL = os.getenv("VAPI_BASE_URL", "https://api.vapi.ai")
+# Inject a message after every Nth assistant message (0 disables injection)
+INTERVAL_OF_WEIRD_MESSAGES = int(os.getenv("INTERVAL_OF_WEIRD_MESSAGES") or "3")
+# Per-attempt timeout for VAPI call lookups and control URL commands
+INJECTION_REQUEST_TIMEOUT = float(os.getenv("INJECTION_REQUEST_TIMEOUT", "5"))
+INJECTION_MAX_ATTEMPTS = int(os.getenv("INJECTION_MAX_ATTEMPTS", "3"))
+INJECTION_MAX_CONNECTIONS = int(os.getenv("INJECTION_MAX_CONNECTIONS", "50"))
+
+vapi_api_request_seconds = HistogramFamily("vapi_api_request_seconds", "Latency of VAPI API requests", ("endpoint",))
+vapi_api_requests_total = Counter("vapi_api_requests_total", "VAPI API requests by outcome", ("endpoint", "outcome"))
+message_injections_total = Counter("vapi_message_injections_total", "Message injections by outcome", ("outcome",))
+message_injection_seconds = HistogramFamily(
+    "vapi_message_injection_seconds", "Time from scheduling an injection to its outcome", ("outcome",)
+)
+
+class InjectionError(Exception):
+    """A call lookup or control command failed (status is None for connection errors and timeouts)"""
+
+    def __init__(self, message, status=None, transient=False):
+        super().__init__(message)
+        self.status = status
+        self.transient = transient
+
+class InjectionScheduler:
+    """
+    Decides when to inject a message into a call and sends it in the
+    background.
+
+    The webhook used to re-read INTERVAL_OF_WEIRD_MESSAGES on every assistant
+    message and make blocking `requests` calls for the call lookup and the
+    control URL `say`, which held up every other webhook for those round
+    trips. Here the interval is read once, control URLs are looked up once
+    per call (concurrent lookups for a call share one request), and commands
+    go out as tasks over one pooled aiohttp session with a per-attempt
+    timeout and backoff. A `say` is only retried when the control URL
+    certainly did not act on it (429/503 or a failed connection). At most one
+    injection per call is in flight; an injection that comes due while the
+    previous one is still being sent is skipped.
+
+    Args:
+        choose_message: callable(call_id) -> str, the message to inject;
+            called once the call's details have been looked up
+        on_injected: callable(call_id, message), run on the event loop once
+            the control URL accepted the message
+        on_call_details: optional callable(call_id, call_data), run with
+            the VAPI call details when they are looked up
+    """
+
+    def __init__(self, choose_message, on_injected, api_key=VAPI_API_KEY, base_url=VAPI_BASE_URL,
+                 interval=INTERVAL_OF_WEIRD_MESSAGES, request_timeout=INJECTION_REQUEST_TIMEOUT,
+                 max_attempts=INJECTION_MAX_ATTEMPTS, max_connections=INJECTION_MAX_CONNECTIONS,
+                 on_call_details=None):
+        self.choose_message = choose_message
+        self.on_injected = on_injected
+        self.on_call_details = on_call_details
+        self.api_key = api_key
+        self.base_url = base_url
+        self.interval = interval
+        self.request_timeout = request_timeout
+        self.max_attempts = max_attempts
+        self.max_connections = max_connections
+        self._session = None
+        self._control_urls = {}
+        self._lookups = {}
+        self._sending = set()
+        self._tasks = set()
+
+    def _session_for_loop(self):
+        # One pooled session, created lazily inside the running loop
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(limit=self.max_connections, keepalive_timeout=60)
+            self._session = aiohttp.ClientSession(connector=connector, timeout=aiohttp.ClientTimeout(total=self.request_timeout))
+        return self._session
+
+    def _spawn(self, coro):
+        task = asyncio.ensure_future(coro)
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return task
+
+    def is_due(self, message_count):
+        return self.interval > 0 and message_count % self.interval == 0
+
+    def prefetch(self, call_id):
+        """Look up the call's control URL in the background so the first injection does not wait for it"""
+        if call_id not in self._control_urls and call_id not in self._lookups:
+            self._lookups[call_id] = self._spawn(self._lookup_control_url(call_id))
+
+    def on_assistant_message(self, call_id, message_count):
+        """
+        Schedule an injection if one is due after this assistant message
+
+        Returns:
+            bool: Whether an injection was scheduled
+        """
+        if not self.is_due(message_count):
+            return False
+        if call_id in self._sending:
+            message_injections_total.inc(outcome="skipped")
+            logger.info("Skipping injection after message #%s: previous one still in flight", message_count, extra={"call_id": call_id})
+            return False
+        logger.info("Scheduling message injection after message #%s", message_count, extra={"call_id": call_id})
+        self._sending.add(call_id)
+        self._spawn(self._inject(call_id))
+        return True
+
+    def forget(self, call_id):
+        """
+        Drop a call's cached control URL. A lookup still in flight is
+        cancelled, so it cannot cache a URL (or report call details) for the
+        ended call; injections waiting on it end as cancelled. Injections
+        already past the lookup still finish.
+        """
+        self._control_urls.pop(call_id, None)
+        lookup = self._lookups.pop(call_id, None)
+        if lookup is not None:
+            lookup.cancel()
+
+    async def close(self):
+        tasks = list(self._tasks)
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+
+    async def _with_retries(self, operation, attempt_fn):
+        for attempt in range(1, self.max_attempts + 1):
+            started_at = time.perf_counter()
+            try:
+                result = await attempt_fn()
+                vapi_api_requests_total.inc(endpoint=operation, outcome="ok")
+                return result
+            except aiohttp.ClientConnectorError as e:
+                error = InjectionError(f"{type(e).__name__}: {e}", transient=True)
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                # Only lookups are safe to repeat once the request may have arrived
+                error = InjectionError(f"{type(e).__name__}: {e}", transient=operation == "get_call")
+            except InjectionError as e:
+                error = e
+            finally:
+                vapi_api_request_seconds.observe(time.perf_counter() - started_at, endpoint=operation)
+
+            if not error.transient or attempt == self.max_attempts:
+                vapi_api_requests_total.inc(endpoint=operation, outcome="failed")
+                raise error
+            vapi_api_requests_total.inc(endpoint=operation, outcome="retried")
+            backoff = (0.25 * 2 ** (attempt - 1)) * (0.5 + random.random())
+            logger.warning("Retrying VAPI %s in %.2fs: %s", operation, backoff, error)
+            await asyncio.sleep(backoff)
+
+    async def _lookup_control_url(self, call_id):
+        session = self._session_for_loop()
+        headers = {"Authorization": f"Bearer {self.api_key}"}
+
+        async def attempt():
+            async with session.get(f"{self.base_url}/call/{call_id}", headers=headers) as response:
+                if response.status != 200:
+                    raise InjectionError(
+                        f"{response.status} - {(await response.text())[:200]}",
+                        status=response.status,
+                        transient=response.status in TRANSIENT_STATUSES
+                    )
+                return await response.json(content_type=None)
+
+        try:
+            call_data = await self._with_retries("get_call", attempt)
+            if self.on_call_details is not None:
+                self.on_call_details(call_id, call_data)
+            control_url = (call_data.get("monitor") or {}).get("controlUrl")
+            if control_url:
+                logger.info("Found control URL: %s", control_url, extra={"call_id": call_id})
+                self._control_urls[call_id] = control_url
+            else:
+                logger.warning("No control URL found in call details", extra={"call_id": call_id})
+            return control_url
+        except (InjectionError, ValueError, AttributeError) as e:
+            logger.warning("Failed to get call details: %s", e, extra={"call_id": call_id})
+            return None
+        finally:
+            # Only our own entry: after forget() a new lookup may own the slot
+            if self._lookups.get(call_id) is asyncio.current_task():
+                del self._lookups[call_id]
+
+    async def _control_url(self, call_id):
+        control_url = self._control_urls.get(call_id)
+        if control_url:
+            return control_url
+        self.prefetch(call_id)
+        # Shielded: a cancelled injection does not cancel a lookup others may share
+        return await asyncio.shield(self._lookups[call_id])
+
+    async def _say(self, control_url, message):
+        session = self._session_for_loop()
+
+        async def attempt():
+            async with session.post(control_url, json={"type": "say", "message": message}) as response:
+                if response.status != 200:
+                    raise InjectionError(
+                        f"{response.status} - {(await response.text())[:200]}",
+                        status=response.status,
+                        transient=response.status in NOT_PROCESSED_STATUSES
+                    )
+
+        await self._with_retries("control", attempt)
+
+    async def _inject(self, call_id):
+        started_at = time.perf_counter()
+        outcome = "failure"
+        try:
+            control_url = await self._control_url(call_id)
+            if not control_url:
+                logger.error("Could not get control URL for call %s", call_id, extra={"call_id": call_id})
+                return
+            message = self.choose_message(call_id)
+            await self._say(control_url, message)
+            outcome = "success"
+            logger.info("Injected message to call %s: '%s'", call_id, message, extra={"call_id": call_id})
+            self.on_injected(call_id, message)
+        except InjectionError as e:
+            logger.error("Error sending message to call: %s", e, extra={"call_id": call_id})
+        except asyncio.CancelledError:
+            outcome = "cancelled"
+            raise
+        except Exception:
+            logger.exception("Message injection crashed", extra={"call_id": call_id})
+        finally:
+            self._sending.discard(call_id)
+            message_injections_total.inc(outcome=outcome)
+            message_injection_seconds.observe(time.perf_counter() - started_at, outcome=outcome)
@@ -0,0 +1,489 @@
+import os
+import json
+import time
+import uuid
+import socket
+import asyncio
+import inspect
+import threading
+from datetime import datetime, timezone
+
+from sqlalchemy import Table, Column, String, Integer, Float, Text, DateTime, JSON, Index, text, bindparam
+from dotenv import load_dotenv
+
+from db_operations import engine, metadata
+from metrics import Counter, Gauge, HistogramFamily
+from log_config import get_logger
+
+# Load environment variables
+load_dotenv()
+
+logger = get_logger("job_queue")
+
+# Queues handled by the workers
+ANALYSIS_QUEUE = "analysis"
+FINALIZE_QUEUE = "finalize"
+DIAL_QUEUE = "dial"
+MAINTENANCE_QUEUE = "maintenance"
+ALL_QUEUES = (ANALYSIS_QUEUE, FINALIZE_QUEUE, DIAL_QUEUE, MAINTENANCE_QUEUE)
+
+# A claimed job becomes visible to other workers again if it is not finished
+# within the visibility timeout (e.g. its worker was killed during a deploy)
+JOB_VISIBILITY_TIMEOUT = float(os.getenv("JOB_VISIBILITY_TIMEOUT", "300"))
+# While a handler runs, its worker extends the job's lease this often, so a
+# long job (LLM scoring, a dial with backoff) is not reclaimed mid-run
+JOB_HEARTBEAT_INTERVAL = float(os.getenv("JOB_HEARTBEAT_INTERVAL", "30"))
+JOB_MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", "5"))
+JOB_RETRY_BASE_SECONDS = float(os.getenv("JOB_RETRY_BASE_SECONDS", "2"))
+JOB_RETRY_MAX_SECONDS = float(os.getenv("JOB_RETRY_MAX_SECONDS", "300"))
+JOB_POLL_INTERVAL = float(os.getenv("JOB_POLL_INTERVAL", "0.5"))
+JOB_WORKER_THREADS = int(os.getenv("JOB_WORKER_THREADS", "2"))
+# How often the jobs_in_queue gauge is refreshed from the jobs table
+JOB_STATS_REFRESH_SECONDS = float(os.getenv("JOB_STATS_REFRESH_SECONDS", "10"))
+
+# Define the jobs table. Times used for scheduling are epoch seconds so the
+# claim query compares plain numbers on Postgres and SQLite alike.
+jobs = Table(
+    'jobs',
+    metadata,
+    Column('id', String, primary_key=True),
+    Column('queue', String, nullable=False),
+    Column('payload', JSON, nullable=False),
+    Column('idempotency_key', String, nullable=True, unique=True),
+    Column('status', String, nullable=False, default="queued"),  # queued, running, done, failed
+    Column('attempts', Integer, nullable=False, default=0),
+    Column('max_attempts', Integer, nullable=False, default=JOB_MAX_ATTEMPTS),
+    Column('available_at', Float, nullable=False),
+    Column('locked_until', Float, nullable=False, default=0),
+    Column('locked_by', String, nullable=True),
+    Column('last_error', Text, nullable=True),
+    Column('created_at', DateTime, nullable=False),
+    Column('updated_at', DateTime, nullable=True),
+    Index('jobs_queue_status_available_idx', 'queue', 'status', 'available_at'),
+)
+
+jobs_enqueued_total = Counter("jobs_enqueued_total", "Jobs submitted by queue and outcome", ("queue", "outcome"))
+jobs_processed_total = Counter("jobs_processed_total", "Job runs by queue and outcome", ("queue", "outcome"))
+job_run_seconds = HistogramFamily("job_run_seconds", "Job handler run time", ("queue",))
+job_wait_seconds = HistogramFamily(
+    "job_wait_seconds", "Time from a job becoming available to being claimed", ("queue",),
+    buckets=(0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 300.0)
+)
+job_workers_busy = Gauge("job_workers_busy", "Worker threads currently running a job")
+jobs_in_queue = Gauge("jobs_in_queue", "Queued and running jobs by queue (refreshed every JOB_STATS_REFRESH_SECONDS)", ("queue", "status"))
+job_leases_lost_total = Counter(
+    "job_leases_lost_total", "Running jobs whose lease had passed to another worker, by queue and operation", ("queue", "operation")
+)
+
+class Job:
+    """A claimed job as handed to a handler"""
+
+    def __init__(self, id, queue, payload, attempts, max_attempts, idempotency_key, available_at):
+        self.id = id
+        self.queue = queue
+        # JSON columns come back parsed on Postgres and as text on SQLite
+        self.payload = json.loads(payload) if isinstance(payload, str) else payload
+        self.attempts = attempts
+        self.max_attempts = max_attempts
+        self.idempotency_key = idempotency_key
+        self.available_at = available_at
+
+def enqueue(queue, payload, idempotency_key=None, delay=0, max_attempts=JOB_MAX_ATTEMPTS):
+    """
+    Add a job to a queue
+
+    Args:
+        queue: Queue name (one of ALL_QUEUES)
+        payload: JSON-serializable job arguments
+        idempotency_key: Jobs sharing a key are only ever enqueued once
+        delay: Seconds before the job becomes available
+        max_attempts: Runs before the job is marked failed
+
+    Returns:
+        str: The job ID, or None if a job with this idempotency key already exists
+    """
+    return enqueue_many(queue, [(payload, idempotency_key)], delay, max_attempts)[0]
+
+def enqueue_many(queue, jobs, delay=0, max_attempts=JOB_MAX_ATTEMPTS):
+    """
+    Add several jobs to a queue in one transaction
+
+    Args:
+        queue: Queue name (one of ALL_QUEUES)
+        jobs: list of (payload, idempotency_key) pairs
+        delay: Seconds before the jobs become available
+        max_attempts: Runs before a job is marked failed
+
+    Returns:
+        list: The job ID for each entry, or None where a job with its
+            idempotency key already exists
+    """
+    now = time.time()
+    created_at = datetime.now(timezone.utc)
+    statement = text("""
+        INSERT INTO jobs
+        (id, queue, payload, idempotency_key, status, attempts, max_attempts, available_at, locked_until, created_at)
+        VALUES (:id, :queue, :payload, :idempotency_key, 'queued', 0, :max_attempts, :available_at, 0, :created_at)
+        ON CONFLICT (idempotency_key) DO NOTHING
+        RETURNING id
+    """)
+    job_ids = []
+    with engine.begin() as conn:
+        for payload, idempotency_key in jobs:
+            row = conn.execute(statement, {
+                "id": str(uuid.uuid4()),
+                "queue": queue,
+                "payload": json.dumps(payload),
+                "idempotency_key": idempotency_key,
+                "max_attempts": max_attempts,
+                "available_at": now + delay,
+                "created_at": created_at,
+            }).fetchone()
+            job_ids.append(row[0] if row is not None else None)
+
+    for job_id, (_, idempotency_key) in zip(job_ids, jobs):
+        if job_id is None:
+            jobs_enqueued_total.inc(queue=queue, outcome="duplicate")
+            logger.debug("Skipped duplicate %s job %s", queue, idempotency_key)
+        else:
+            jobs_enqueued_total.inc(queue=queue, outcome="enqueued")
+    return job_ids
+
+async def enqueue_async(queue, payload, idempotency_key=None, delay=0, max_attempts=JOB_MAX_ATTEMPTS):
+    """enqueue() from async code, with the INSERT run in a thread so it does not block the event loop"""
+    return await asyncio.to_thread(enqueue, queue, payload, idempotency_key, delay, max_attempts)
+
+def claim(queues, worker_id, limit=1, visibility_timeout=JOB_VISIBILITY_TIMEOUT):
+    """
+    Claim up to `limit` available jobs for a worker
+
+    Jobs are available when queued and due, or when running but past their
+    visibility timeout. On Postgres concurrent workers skip each other's
+    locked rows (FOR UPDATE SKIP LOCKED) instead of waiting on them.
+    """
+    lock_clause = "FOR UPDATE SKIP LOCKED" if engine.dialect.name == "postgresql" else ""
+    statement = text(f"""
+        UPDATE jobs
+        SET status = 'running',
+            attempts = attempts + 1,
+            locked_by = :worker_id,
+            locked_until = :locked_until,
+            updated_at = :updated_at
+        WHERE id IN (
+            SELECT id FROM jobs
+            WHERE queue IN :queues
+              AND ((status = 'queued' AND available_at <= :now)
+                   OR (status = 'running' AND locked_until < :now))
+            ORDER BY available_at
+            LIMIT :limit
+            {lock_clause}
+        )
+        RETURNING id, queue, payload, attempts, max_attempts, idempotency_key, available_at
+    """).bindparams(bindparam("queues", expanding=True))
+
+    now = time.time()
+    with engine.begin() as conn:
+        rows = conn.execute(statement, {
+            "worker_id": worker_id,
+            "locked_until": now + visibility_timeout,
+            "updated_at": datetime.now(timezone.utc),
+            "queues": list(queues),
+            "now": now,
+            "limit": limit,
+        }).fetchall()
+    return [Job(*row) for row in rows]
+
+def _lease_lost(job, operation):
+    job_leases_lost_total.inc(queue=job.queue, operation=operation)
+    logger.warning(
+        "Job %s is no longer held by this worker (%s matched no row); it was reclaimed and may run twice",
+        job.id, operation, extra={"job_id": job.id, "queue": job.queue}
+    )
+
+def heartbeat(job_ids, worker_id, visibility_timeout=JOB_VISIBILITY_TIMEOUT):
+    """
+    Extend the lease on running jobs still held by this worker
+
+    Returns:
+        set: IDs of the jobs whose lease was extended
+    """
+    if not job_ids:
+        return set()
+    statement = text("""
+        UPDATE jobs SET locked_until = :locked_until
+        WHERE id IN :ids AND locked_by = :worker_id AND status = 'running'
+        RETURNING id
+    """).bindparams(bindparam("ids", expanding=True))
+    with engine.begin() as conn:
+        rows = conn.execute(statement, {
+            "ids": list(job_ids),
+            "worker_id": worker_id,
+            "locked_until": time.time() + visibility_timeout,
+        }).fetchall()
+    return {row[0] for row in rows}
+
+def complete(job, worker_id):
+    """
+    Mark a job done (only if this worker still holds it)
+
+    Returns:
+        bool: False if the job had been reclaimed by another worker
+    """
+    with engine.begin() as conn:
+        result = conn.execute(
+            text("""
+            UPDATE jobs SET status = 'done', locked_until = 0, updated_at = :updated_at
+            WHERE id = :id AND locked_by = :worker_id
+            """),
+            {"id": job.id, "worker_id": worker_id, "updated_at": datetime.now(timezone.utc)}
+        )
+    if result.rowcount == 0:
+        _lease_lost(job, "complete")
+        return False
+    return True
+
+def fail(job, worker_id, error):
+    """
+    Record a failed run: reschedule with exponential backoff, or mark the job
+    failed once it has used all its attempts
+
+    Returns:
+        bool: True if the job will be retried
+    """
+    retry = job.attempts < job.max_attempts
+    backoff = min(JOB_RETRY_MAX_SECONDS, JOB_RETRY_BASE_SECONDS * 2 ** (job.attempts - 1))
+    with engine.begin() as conn:
+        result = conn.execute(
+            text("""
+            UPDATE jobs
+            SET status = :status, available_at = :available_at, locked_until = 0,
+                last_error = :error, updated_at = :updated_at
+            WHERE id = :id AND locked_by = :worker_id
+            """),
+            {
+                "id": job.id,
+                "worker_id": worker_id,
+                "status": "queued" if retry else "failed",
+                "available_at": time.time() + backoff,
+                "error": str(error)[:2000],
+                "updated_at": datetime.now(timezone.utc),
+            }
+        )
+    if result.rowcount == 0:
+        _lease_lost(job, "fail")
+    return retry
+
+def get_job(job_id):
+    """Current state of a job, or None if it does not exist"""
+    with engine.connect() as conn:
+        row = conn.execute(
+            text("""
+            SELECT id, queue, status, attempts, max_attempts, idempotency_key, last_error, created_at, updated_at
+            FROM jobs WHERE id = :id
+            """),
+            {"id": job_id}
+        ).mappings().fetchone()
+    if row is None:
+        return None
+    job = dict(row)
+    for field in ("created_at", "updated_at"):
+        if isinstance(job[field], datetime):
+            job[field] = job[field].isoformat()
+    return job
+
+def queue_stats():
+    """Job counts by queue and status"""
+    with engine.connect() as conn:
+        rows = conn.execute(text("SELECT queue, status, COUNT(*) FROM jobs GROUP BY queue, status")).fetchall()
+    stats = {}
+    for queue, status, count in rows:
+        stats.setdefault(queue, {})[status] = count
+    return stats
+
+def active_job_counts():
+    """Queued and running jobs by queue (uses the queue/status index)"""
+    with engine.connect() as conn:
+        rows = conn.execute(text(
+            "SELECT queue, status, COUNT(*) FROM jobs WHERE status IN ('queued', 'running') GROUP BY queue, status"
+        )).fetchall()
+    return {(queue, status): count for queue, status, count in rows}
+
+class QueueDepthMonitor:
+    """
+    Keeps the jobs_in_queue gauge up to date from a periodic COUNT query, so
+    scraping /metrics never touches the database
+    """
+
+    def __init__(self, interval=JOB_STATS_REFRESH_SECONDS, queues=ALL_QUEUES):
+        self.interval = interval
+        self.queues = queues
+        self._task = None
+
+    def refresh(self):
+        counts = active_job_counts()
+        for queue in set(self.queues) | {queue for queue, _ in counts}:
+            for status in ("queued", "running"):
+                jobs_in_queue.set(counts.get((queue, status), 0), queue=queue, status=status)
+
+    async def _run(self):
+        while True:
+            try:
+                await asyncio.to_thread(self.refresh)
+            except Exception as e:
+                logger.warning("Could not refresh queue depth: %s", e)
+            await asyncio.sleep(self.interval)
+
+    async def start(self):
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+class JobWorker:
+    """
+    Runs jobs from the queue on a pool of threads.
+
+    Each thread claims one job at a time and runs its handler; async handlers
+    run on an event loop owned by the thread. A handler that raises fails the
+    run and the job is retried with backoff. While jobs run, a heartbeat
+    thread extends their leases every `heartbeat_interval` seconds, so only
+    a job whose process died (e.g. killed during a deploy) is picked up
+    again once its visibility timeout expires. Stopping lets in-flight jobs
+    finish.
+    """
+
+    def __init__(self, handlers, queues=None, threads=JOB_WORKER_THREADS, poll_interval=JOB_POLL_INTERVAL,
+                 visibility_timeout=JOB_VISIBILITY_TIMEOUT, on_thread_exit=None, heartbeat_interval=JOB_HEARTBEAT_INTERVAL):
+        self.handlers = handlers
+        self.queues = tuple(queues or handlers.keys())
+        self.threads = threads
+        self.poll_interval = poll_interval
+        self.visibility_timeout = visibility_timeout
+        self.on_thread_exit = on_thread_exit
+        self.heartbeat_interval = min(heartbeat_interval, visibility_timeout / 3)
+        self._stopping = threading.Event()
+        self._threads = []
+        self._heartbeat_stopping = threading.Event()
+        self._heartbeat_thread = None
+        # job ID -> (job, worker ID) for every job a thread is running
+        self._running = {}
+        self._running_lock = threading.Lock()
+
+    def start(self):
+        self._stopping.clear()
+        for index in range(self.threads):
+            thread = threading.Thread(target=self._run, args=(index,), name=f"job-worker-{index}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        self._heartbeat_stopping.clear()
+        self._heartbeat_thread = threading.Thread(target=self._heartbeat, name="job-worker-heartbeat", daemon=True)
+        self._heartbeat_thread.start()
+        logger.info("Started %s job worker threads for queues %s", self.threads, ", ".join(self.queues))
+
+    def stop(self, timeout=30.0):
+        self._stopping.set()
+        deadline = time.monotonic() + timeout
+        for thread in self._threads:
+            thread.join(max(0.0, deadline - time.monotonic()))
+        self._threads = []
+        # Keep leases alive until the in-flight jobs above have finished
+        self._heartbeat_stopping.set()
+        if self._heartbeat_thread is not None:
+            self._heartbeat_thread.join(max(0.0, deadline - time.monotonic()))
+            self._heartbeat_thread = None
+
+    def join(self):
+        for thread in self._threads:
+            thread.join()
+
+    def _heartbeat(self):
+        while not self._heartbeat_stopping.wait(self.heartbeat_interval):
+            with self._running_lock:
+                running = dict(self._running)
+            by_worker = {}
+            for job_id, (job, worker_id) in running.items():
+                by_worker.setdefault(worker_id, []).append(job)
+            for worker_id, worker_jobs in by_worker.items():
+                try:
+                    extended = heartbeat([job.id for job in worker_jobs], worker_id, self.visibility_timeout)
+                except Exception as e:
+                    logger.error("Error extending job leases: %s", e)
+                    continue
+                for job in worker_jobs:
+                    if job.id not in extended and job.id in self._running:
+                        _lease_lost(job, "heartbeat")
+
+    def _run(self, index):
+        worker_id = f"{socket.gethostname()}:{os.getpid()}:{index}"
+        loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(loop)
+        try:
+            while not self._stopping.is_set():
+                try:
+                    claimed = claim(self.queues, worker_id, visibility_timeout=self.visibility_timeout)
+                except Exception as e:
+                    logger.error("Error claiming jobs: %s", e)
+                    self._stopping.wait(self.poll_interval * 4)
+                    continue
+                if not claimed:
+                    self._stopping.wait(self.poll_interval)
+                    continue
+                for job in claimed:
+                    self._execute(loop, worker_id, job)
+        finally:
+            if self.on_thread_exit is not None:
+                try:
+                    loop.run_until_complete(self.on_thread_exit())
+                except Exception as e:
+                    logger.error("Error releasing worker resources: %s", e)
+            loop.run_until_complete(loop.shutdown_asyncgens())
+            loop.close()
+
+    def _execute(self, loop, worker_id, job):
+        log_extra = {"job_id": job.id, "queue": job.queue, "call_id": job.payload.get("call_id")}
+        job_wait_seconds.observe(max(0.0, time.time() - job.available_at), queue=job.queue)
+
+        if job.attempts > job.max_attempts:
+            # Reclaimed after its visibility timeout more times than allowed
+            fail(job, worker_id, "Exceeded attempts (visibility timeout expired)")
+            jobs_processed_total.inc(queue=job.queue, outcome="failed")
+            logger.error("Job %s exceeded its attempts", job.id, extra=log_extra)
+            return
+
+        handler = self.handlers[job.queue]
+        started_at = time.perf_counter()
+        job_workers_busy.inc()
+        with self._running_lock:
+            self._running[job.id] = (job, worker_id)
+        error = None
+        try:
+            try:
+                result = handler(job)
+                if inspect.isawaitable(result):
+                    loop.run_until_complete(result)
+            except Exception as e:
+                error = e
+            finally:
+                # Stop the heartbeat before the job leaves 'running'
+                with self._running_lock:
+                    self._running.pop(job.id, None)
+
+            if error is not None:
+                retry = fail(job, worker_id, error)
+                jobs_processed_total.inc(queue=job.queue, outcome="retried" if retry else "failed")
+                logger.warning("Job %s attempt %s/%s failed: %s", job.id, job.attempts, job.max_attempts, error, extra=log_extra)
+            elif complete(job, worker_id):
+                jobs_processed_total.inc(queue=job.queue, outcome="done")
+                logger.debug("Job %s done", job.id, extra=log_extra)
+            else:
+                jobs_processed_total.inc(queue=job.queue, outcome="lease_lost")
+        finally:
+            job_workers_busy.dec()
+            job_run_seconds.observe(time.perf_counter() - started_at, queue=job.queue)
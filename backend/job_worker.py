@@ -0,0 +1,103 @@
+import os
+import signal
+import argparse
+import threading
+from datetime import datetime, timedelta
+
+from dotenv import load_dotenv
+
+from call_analysis import process_transcript
+from call_finalizer import finalize_call
+from dialer import BulkDialer, VapiPlacer, TwilioPlacer
+from log_config import setup_logging, get_logger
+import job_queue
+import migrations
+from job_queue import JobWorker, ANALYSIS_QUEUE, FINALIZE_QUEUE, DIAL_QUEUE, MAINTENANCE_QUEUE
+
+# Load environment variables
+load_dotenv()
+
+logger = get_logger("job_worker")
+
+VAPI_API_KEY = os.getenv("VAPI_API_KEY")
+VAPI_BASE_URL = os.getenv("VAPI_BASE_URL", "https://api.vapi.ai")
+
+# Each worker thread runs its own event loop, so each gets its own dialer
+# (aiohttp sessions cannot be shared across loops)
+_thread_state = threading.local()
+
+def _thread_dialer():
+    if getattr(_thread_state, "dialer", None) is None:
+        _thread_state.dialer = BulkDialer([VapiPlacer(VAPI_API_KEY, VAPI_BASE_URL), TwilioPlacer()])
+    return _thread_state.dialer
+
+async def close_thread_resources():
+    dialer = getattr(_thread_state, "dialer", None)
+    if dialer is not None:
+        await dialer.close()
+        _thread_state.dialer = None
+
+async def handle_analysis(job):
+    """Run transcript analysis and scoring for a transcript snapshot"""
+    payload = job.payload
+    await process_transcript(
+        payload["call_id"],
+        payload["transcript"],
+        payload["call_start_time"],
+        payload["message_count"]
+    )
+
+async def handle_finalize(job):
+    """Run the end-of-call finalization pipeline"""
+    payload = job.payload
+    await finalize_call(payload["call_id"], payload.get("transcript"), payload["ended_at"])
+
+async def handle_dial(job):
+    """
+    Place one outbound call. The dialer retries only failures where the call
+    certainly was not created; dial jobs have a single attempt, so a failure
+    here is final rather than re-run.
+    """
+    payload = job.payload
+    result = await _thread_dialer().place_one(payload["provider"], payload.get("index", 0), payload["target"])
+    if result["status"] != "placed":
+        raise RuntimeError(f"Placement failed after {result['attempts']} attempts: {result.get('error')}")
+    logger.info("Placed call %s to %s", result["call_id"], result["phone_number"], extra={"call_id": result["call_id"], "job_id": job.id})
+
+def handle_maintenance(job):
+    """Create upcoming partitions, apply retention and queue tomorrow's run"""
+    summary = migrations.run_maintenance()
+    logger.info("Maintenance for %s done: %s", job.payload["day"], summary, extra={"job_id": job.id})
+    migrations.schedule_maintenance(datetime.fromisoformat(job.payload["day"]).date() + timedelta(days=1))
+
+JOB_HANDLERS = {
+    ANALYSIS_QUEUE: handle_analysis,
+    FINALIZE_QUEUE: handle_finalize,
+    DIAL_QUEUE: handle_dial,
+    MAINTENANCE_QUEUE: handle_maintenance,
+}
+
+def create_worker(queues=None, threads=job_queue.JOB_WORKER_THREADS):
+    """A JobWorker running the standard handlers"""
+    return JobWorker(JOB_HANDLERS, queues=queues, threads=threads, on_thread_exit=close_thread_resources)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run job queue workers (analysis, finalization, dialing)")
+    parser.add_argument("--queues", nargs="+", choices=list(JOB_HANDLERS), help="Queues to work (default: all)")
+    parser.add_argument("--threads", type=int, default=job_queue.JOB_WORKER_THREADS)
+    args = parser.parse_args()
+
+    setup_logging("job_worker")
+    migrations.migrate()
+    migrations.schedule_maintenance()
+    worker = create_worker(args.queues, args.threads)
+
+    stop_requested = threading.Event()
+    signal.signal(signal.SIGTERM, lambda *_: stop_requested.set())
+    signal.signal(signal.SIGINT, lambda *_: stop_requested.set())
+
+    worker.start()
+    while not stop_requested.wait(1.0):
+        pass
+    logger.info("Stopping workers, letting in-flight jobs finish")
+    worker.stop()
@@ -0,0 +1,234 @@
+import os
+import json
+import asyncio
+import threading
+from collections import OrderedDict, deque
+
+from fastapi import Request
+from fastapi.responses import StreamingResponse
+
+from metrics import Counter, Gauge
+from log_config import get_logger
+
+# Per-viewer buffer; a viewer that falls this far behind is disconnected and
+# resumes from the replay buffer when its EventSource reconnects
+LIVE_UPDATE_QUEUE_SIZE = int(os.getenv("LIVE_UPDATE_QUEUE_SIZE", "256"))
+# Recent updates kept per call for Last-Event-ID resume
+LIVE_UPDATE_HISTORY = int(os.getenv("LIVE_UPDATE_HISTORY", "200"))
+# Calls with a replay buffer (least recently updated are forgotten first)
+LIVE_UPDATE_CALLS = int(os.getenv("LIVE_UPDATE_CALLS", "1000"))
+LIVE_UPDATE_HEARTBEAT_SECONDS = float(os.getenv("LIVE_UPDATE_HEARTBEAT_SECONDS", "15"))
+
+logger = get_logger("live_updates")
+
+live_updates_published_total = Counter("live_updates_published_total", "Live updates published by kind", ("kind",))
+live_updates_dropped_total = Counter("live_updates_dropped_total", "Viewers disconnected for falling behind")
+live_update_viewers = Gauge("live_update_viewers", "Connected live update viewers")
+
+def _encode(data):
+    return json.dumps(data, default=lambda value: value.isoformat() if hasattr(value, "isoformat") else str(value))
+
+# Sentinel telling a viewer's stream to close (it fell behind)
+_RESYNC = object()
+
+class LiveUpdateHub:
+    """
+    In-process fan-out of per-call updates to streaming viewers.
+
+    Each update is serialized to an SSE frame once and the same bytes are put
+    on every viewer's queue, so N viewers cost one encode and no DB reads.
+    `publish` may be called from any thread (job workers, analysis thread
+    pools); delivery always happens on the server's event loop. Without an
+    attached loop (CLI tools, separate worker processes) publishing is a no-op.
+    """
+
+    def __init__(self, queue_size=LIVE_UPDATE_QUEUE_SIZE, history=LIVE_UPDATE_HISTORY, max_calls=LIVE_UPDATE_CALLS):
+        self.queue_size = queue_size
+        self.history = history
+        self.max_calls = max_calls
+        self._viewers = {}
+        self._recent = OrderedDict()
+        self._sequence = 0
+        self._loop = None
+        self._loop_thread_id = None
+
+    def attach(self, loop=None):
+        """Bind the hub to the server's event loop (called on startup)"""
+        self._loop = loop or asyncio.get_running_loop()
+        self._loop_thread_id = threading.get_ident()
+
+    def detach(self):
+        self._loop = None
+        self._loop_thread_id = None
+
+    def viewer_count(self, call_id=None):
+        if call_id is not None:
+            return len(self._viewers.get(call_id, ()))
+        return sum(len(viewers) for viewers in list(self._viewers.values()))
+
+    def publish(self, call_id, kind, data):
+        """Send an update to the call's viewers (thread-safe, never blocks)"""
+        loop = self._loop
+        if loop is None or loop.is_closed():
+            return
+        if threading.get_ident() == self._loop_thread_id:
+            self._deliver(call_id, kind, data)
+        else:
+            loop.call_soon_threadsafe(self._deliver, call_id, kind, data)
+
+    def _deliver(self, call_id, kind, data):
+        self._sequence += 1
+        frame = f"id: {self._sequence}\nevent: {kind}\ndata: {_encode(data)}\n\n".encode()
+        live_updates_published_total.inc(kind=kind)
+
+        recent = self._recent.get(call_id)
+        if recent is None:
+            recent = self._recent[call_id] = deque(maxlen=self.history)
+            while len(self._recent) > self.max_calls:
+                self._recent.popitem(last=False)
+        else:
+            self._recent.move_to_end(call_id)
+        recent.append((self._sequence, frame))
+
+        for queue in list(self._viewers.get(call_id, ())):
+            try:
+                queue.put_nowait(frame)
+            except asyncio.QueueFull:
+                # Clear the backlog and tell the viewer to reconnect; it
+                # resumes from the replay buffer via Last-Event-ID
+                while not queue.empty():
+                    queue.get_nowait()
+                queue.put_nowait(_RESYNC)
+                live_updates_dropped_total.inc()
+
+    def replay(self, call_id, last_event_id):
+        """
+        Buffered frames after `last_event_id`, or None if the buffer no longer
+        reaches back that far (the viewer needs a fresh snapshot)
+        """
+        recent = self._recent.get(call_id)
+        if not recent or recent[0][0] > last_event_id + 1:
+            return None
+        return [frame for sequence, frame in recent if sequence > last_event_id]
+
+    def subscribe(self, call_id, initial=(), heartbeat=LIVE_UPDATE_HEARTBEAT_SECONDS):
+        """
+        Register a viewer and return a Subscription, an async iterator of its
+        SSE frames starting with `initial`. Registration happens immediately,
+        so nothing published after the caller took its snapshot is missed.
+        """
+        return Subscription(self, call_id, list(initial), heartbeat)
+
+    def _register(self, call_id, queue):
+        self._viewers.setdefault(call_id, set()).add(queue)
+        live_update_viewers.inc()
+
+    def _unregister(self, call_id, queue):
+        live_update_viewers.dec()
+        viewers = self._viewers.get(call_id)
+        if viewers is not None:
+            viewers.discard(queue)
+            if not viewers:
+                del self._viewers[call_id]
+
+class _Registration:
+    __slots__ = ("hub", "call_id", "queue", "active")
+
+    def __init__(self, hub, call_id):
+        self.hub = hub
+        self.call_id = call_id
+        self.queue = asyncio.Queue(maxsize=hub.queue_size)
+        self.active = True
+        hub._register(call_id, self.queue)
+
+    def release(self):
+        if self.active:
+            self.active = False
+            self.hub._unregister(self.call_id, self.queue)
+
+async def _frames(registration, initial, heartbeat):
+    try:
+        for frame in initial:
+            yield frame
+        while True:
+            try:
+                frame = await asyncio.wait_for(registration.queue.get(), timeout=heartbeat)
+            except asyncio.TimeoutError:
+                # SSE comment keeps proxies from closing an idle stream
+                yield b": keep-alive\n\n"
+                continue
+            if frame is _RESYNC:
+                return
+            yield frame
+    finally:
+        registration.release()
+
+class Subscription:
+    """
+    A viewer's registration plus the async iterator of its frames.
+
+    The viewer is unregistered when iteration ends, on `aclose()`, or when
+    the subscription is garbage collected, so one that is never iterated
+    (the response was never sent) does not leak its queue.
+    """
+
+    def __init__(self, hub, call_id, initial, heartbeat):
+        # The frame generator references only the registration, not this
+        # object, so dropping an unstarted subscription frees it right away
+        self._registration = _Registration(hub, call_id)
+        self._frames = _frames(self._registration, initial, heartbeat)
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        return await self._frames.__anext__()
+
+    async def aclose(self):
+        await self._frames.aclose()
+        self._registration.release()
+
+    def __del__(self):
+        self._registration.release()
+
+def snapshot_frame(data):
+    """SSE frame for a snapshot (no id, so a resume does not skip past it)"""
+    return f"event: snapshot\ndata: {_encode(data)}\n\n".encode()
+
+hub = LiveUpdateHub()
+
+def install(app, snapshot):
+    """
+    Add GET /calls/{call_id}/stream to a FastAPI app and bind the hub to its loop
+
+    Args:
+        app: The FastAPI app
+        snapshot: Callable returning the current in-memory state of a call
+            (dict) for viewers that connect mid-call, or None if unknown
+    """
+    async def attach():
+        hub.attach()
+
+    app.add_event_handler("startup", attach)
+    app.add_event_handler("shutdown", hub.detach)
+
+    async def stream_call(call_id: str, request: Request):
+        """
+        Server-sent events for a call: a snapshot, then transcript, status,
+        event and score updates as they happen. Reconnects resume from
+        Last-Event-ID when the replay buffer still covers it.
+        """
+        initial = None
+        last_event_id = request.headers.get("last-event-id")
+        if last_event_id and last_event_id.isdigit():
+            initial = hub.replay(call_id, int(last_event_id))
+        if initial is None:
+            initial = [snapshot_frame(snapshot(call_id) or {"call_id": call_id, "known": False})]
+
+        return StreamingResponse(
+            hub.subscribe(call_id, initial),
+            media_type="text/event-stream",
+            headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+        )
+
+    app.add_api_route("/calls/{call_id}/stream", stream_call, methods=["GET"])
@@ -0,0 +1,295 @@
+import os
+import re
+import sys
+import json
+import time
+import random
+import asyncio
+import argparse
+import subprocess
+from collections import defaultdict
+
+import aiohttp
+
+from metrics import Histogram
+
+# Load generator for vapi_server.vapi_webhook.
+#
+# Starts fake_providers (VAPI + OpenAI), a SQLite stand-in database (or uses
+# --database-url) and vapi_server in subprocesses, then replays realistic VAPI
+# event sequences for N concurrent synthetic calls and reports throughput,
+# latency percentiles per event type and DB write counts.
+#
+#   python loadtest_vapi_webhook.py --calls 50 --turns 6
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# ANSI colors for terminal output
+class Colors:
+    GREEN = '\033[92m'
+    YELLOW = '\033[93m'
+    RED = '\033[91m'
+    BLUE = '\033[94m'
+    ENDC = '\033[0m'
+    BOLD = '\033[1m'
+
+USER_LINES = [
+    "Hi, thanks for calling, how can I help you today?",
+    "Sure, let me pull up your account.",
+    "Can you give me the order number please?",
+    "I see, that sounds frustrating.",
+    "One moment while I check that for you.",
+    "Is there anything else I can help with?",
+]
+
+BOT_LINES = [
+    "Hello, I'd like to order a large pizza.",
+    "It's for delivery to 1551 Larkin Street.",
+    "Can I also get some garlic bread?",
+    "How long will that take?",
+    "Great, thank you so much.",
+]
+
+def prepare_database(database_url):
+    """Create the tables the webhook and analysis paths write to"""
+    os.environ["DATABASE_URL"] = database_url
+    from sqlalchemy import create_engine
+    import migrations
+
+    engine = create_engine(database_url)
+    migrations.migrate(engine)
+    return engine
+
+def count_rows(engine):
+    from sqlalchemy import text
+    counts = {}
+    with engine.connect() as conn:
+        for table in ("calls", "call_events", "call_scores", "call_aggregates"):
+            try:
+                counts[table] = conn.execute(text(f"SELECT COUNT(*) FROM {table}")).scalar()
+            except Exception:
+                counts[table] = None
+    return counts
+
+def start_process(args, env, name):
+    """Start a uvicorn subprocess from the backend directory"""
+    print(f"{Colors.BLUE}Starting {name}...{Colors.ENDC}")
+    return subprocess.Popen(
+        [sys.executable, "-m", "uvicorn"] + args,
+        cwd=BACKEND_DIR,
+        env=env,
+        stdout=subprocess.DEVNULL if name != "vapi_server" else None,
+    )
+
+async def wait_until_ready(session, url, timeout=30.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            async with session.get(url) as response:
+                if response.status < 500:
+                    return True
+        except aiohttp.ClientError:
+            pass
+        await asyncio.sleep(0.2)
+    return False
+
+def build_call_events(call_id, turns, speech_updates_per_turn, interrupt_probability, rng):
+    """
+    Build the VAPI event sequence for one synthetic call
+
+    Returns:
+        list: (event_label, payload) tuples in delivery order
+    """
+    call = {"id": call_id}
+    events = [("call-status-update:started", {"message": {"type": "call-status-update", "status": "started", "call": call}})]
+    messages = []
+
+    for turn in range(turns):
+        bot_line = BOT_LINES[turn % len(BOT_LINES)]
+        messages.append({"role": "bot", "message": bot_line})
+        events.append(("conversation-update", {"message": {"type": "conversation-update", "call": call, "messages": list(messages)}}))
+
+        # VAPI sends a burst of speech-updates while the user talks; the last
+        # few repeat the same user message and exercise duplicate detection
+        user_line = USER_LINES[turn % len(USER_LINES)] + f" ({call_id[:6]}-{turn})"
+        for i in range(speech_updates_per_turn):
+            partial = user_line if i >= speech_updates_per_turn // 2 else user_line[: max(1, len(user_line) * (i + 1) // speech_updates_per_turn)]
+            artifact_messages = messages + [{"role": "user", "message": partial}]
+            events.append(("speech-update", {"message": {
+                "type": "speech-update", "status": "stopped", "role": "user", "call": call,
+                "artifact": {"messages": artifact_messages},
+            }}))
+        messages.append({"role": "user", "message": user_line})
+
+        if rng.random() < interrupt_probability:
+            events.append(("user-interrupted", {"message": {"type": "user-interrupted", "call": call, "text": f"Sorry, one more thing ({turn})"}}))
+
+    events.append(("call-status-update:ended", {"message": {"type": "call-status-update", "status": "ended", "call": call}}))
+    return events
+
+async def run_call(session, webhook_url, events, think_time, latencies, errors):
+    for label, payload in events:
+        started_at = time.perf_counter()
+        try:
+            async with session.post(webhook_url, json=payload) as response:
+                await response.read()
+                if response.status != 200:
+                    errors[label] += 1
+        except aiohttp.ClientError:
+            errors[label] += 1
+        latencies[label].observe(time.perf_counter() - started_at)
+        if think_time:
+            await asyncio.sleep(think_time)
+
+def parse_prometheus_counters(text_body, metric):
+    """Return {label string: value} for every sample of `metric` in a /metrics body"""
+    samples = {}
+    for line in text_body.splitlines():
+        match = re.match(rf"^{metric}(\{{[^}}]*\}})?\s+(\S+)$", line)
+        if match:
+            samples[match.group(1) or ""] = float(match.group(2))
+    return samples
+
+async def run_load_test(args):
+    rng = random.Random(args.seed)
+    base_env = dict(os.environ)
+    fake_url = f"http://127.0.0.1:{args.fake_port}"
+    server_url = f"http://127.0.0.1:{args.server_port}"
+
+    database_url = args.database_url or f"sqlite:///{os.path.abspath(args.sqlite_path)}"
+    if not args.database_url and os.path.exists(args.sqlite_path):
+        os.remove(args.sqlite_path)
+    engine = prepare_database(database_url)
+
+    fake_env = dict(base_env, FAKE_PROVIDER_LATENCY_MS=str(args.provider_latency_ms))
+    server_env = dict(
+        base_env,
+        DATABASE_URL=database_url,
+        VAPI_BASE_URL=fake_url,
+        VAPI_API_KEY="load-test",
+        OPENAI_BASE_URL=f"{fake_url}/v1",
+        OPENAI_API_KEY="load-test",
+        API_BASE_URL=server_url,
+        INTERVAL_OF_WEIRD_MESSAGES=str(args.injection_interval),
+        LOG_LEVEL=args.server_log_level,
+    )
+
+    processes = [
+        start_process(["fake_providers:app", "--port", str(args.fake_port), "--log-level", "warning"], fake_env, "fake providers"),
+        start_process(["vapi_server:app", "--port", str(args.server_port), "--log-level", "warning"], server_env, "vapi_server"),
+    ]
+
+    # Large windows so percentiles cover the whole run, not just recent samples
+    latencies = defaultdict(lambda: Histogram(window=1_000_000))
+    errors = defaultdict(int)
+    try:
+        connector = aiohttp.TCPConnector(limit=args.concurrency)
+        async with aiohttp.ClientSession(connector=connector) as session:
+            if not await wait_until_ready(session, f"{fake_url}/_stats") or not await wait_until_ready(session, f"{server_url}/metrics"):
+                print(f"{Colors.RED}Services did not start in time{Colors.ENDC}")
+                return None
+
+            call_ids = [f"load-{i:05d}-{rng.getrandbits(32):08x}" for i in range(args.calls)]
+            sequences = [build_call_events(call_id, args.turns, args.speech_updates, args.interrupt_probability, rng) for call_id in call_ids]
+            total_events = sum(len(sequence) for sequence in sequences)
+            semaphore = asyncio.Semaphore(args.concurrency)
+
+            async def limited(sequence):
+                async with semaphore:
+                    await run_call(session, f"{server_url}/vapi-webhook", sequence, args.think_ms / 1000.0, latencies, errors)
+
+            print(f"{Colors.BLUE}Replaying {total_events} events for {args.calls} calls (concurrency {args.concurrency})...{Colors.ENDC}")
+            started_at = time.perf_counter()
+            await asyncio.gather(*(limited(sequence) for sequence in sequences))
+            elapsed = time.perf_counter() - started_at
+
+            # Let queued analysis and finalization jobs drain before reading DB counts
+            await asyncio.sleep(args.drain_seconds)
+
+            async with session.get(f"{server_url}/metrics") as response:
+                metrics_body = await response.text()
+            async with session.get(f"{fake_url}/_stats") as response:
+                provider_requests = await response.json()
+    finally:
+        for process in processes:
+            process.terminate()
+        for process in processes:
+            try:
+                process.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                process.kill()
+
+    overall = Histogram(window=1_000_000)
+    for histogram in latencies.values():
+        for sample in histogram.samples:
+            overall.observe(sample)
+
+    return {
+        "calls": args.calls,
+        "concurrency": args.concurrency,
+        "events": total_events,
+        "elapsed_seconds": round(elapsed, 3),
+        "events_per_second": round(total_events / elapsed, 1) if elapsed else None,
+        "errors": dict(errors),
+        "latency": {"all": overall.snapshot(), **{label: h.snapshot() for label, h in sorted(latencies.items())}},
+        "db_writes": parse_prometheus_counters(metrics_body, "db_writes_total"),
+        "finalizations": parse_prometheus_counters(metrics_body, "call_finalizations_total"),
+        "finalization_seconds": parse_prometheus_counters(metrics_body, "call_finalization_seconds_sum"),
+        "db_rows": count_rows(engine),
+        "provider_requests": provider_requests,
+    }
+
+def print_report(report):
+    print(f"\n{Colors.BOLD}===== vapi_webhook load test ====={Colors.ENDC}")
+    print(f"Calls: {report['calls']}  Concurrency: {report['concurrency']}  Events: {report['events']}")
+    print(f"Elapsed: {report['elapsed_seconds']}s  Throughput: {Colors.GREEN}{report['events_per_second']} events/s{Colors.ENDC}")
+    error_total = sum(report["errors"].values())
+    color = Colors.RED if error_total else Colors.GREEN
+    print(f"Errors: {color}{error_total}{Colors.ENDC} {report['errors'] if error_total else ''}")
+
+    print(f"\n{'event':<30}{'count':>8}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'max ms':>10}")
+    for label, summary in report["latency"].items():
+        def ms(value):
+            return f"{value * 1000:.1f}" if value is not None else "-"
+        print(f"{label:<30}{summary['count']:>8}{ms(summary['p50']):>10}{ms(summary['p95']):>10}{ms(summary['p99']):>10}{ms(summary['max']):>10}")
+
+    print(f"\nDB writes (server counters):")
+    for labels, value in sorted(report["db_writes"].items()):
+        print(f"  {labels} {int(value)}")
+    finalized = sum(report["finalizations"].values())
+    finalization_seconds = sum(report["finalization_seconds"].values())
+    average = f"{finalization_seconds / finalized * 1000:.1f} ms avg" if finalized else "-"
+    print(f"Finalizations: {report['finalizations']} ({average})")
+    print(f"DB rows: {report['db_rows']}")
+    print(f"Provider requests: {report['provider_requests']}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test vapi_server's webhook with synthetic VAPI traffic")
+    parser.add_argument("--calls", type=int, default=20, help="Number of synthetic calls")
+    parser.add_argument("--concurrency", type=int, default=20, help="Calls replayed concurrently")
+    parser.add_argument("--turns", type=int, default=6, help="Assistant/user turns per call")
+    parser.add_argument("--speech-updates", type=int, default=4, help="speech-update events per user turn")
+    parser.add_argument("--interrupt-probability", type=float, default=0.2, help="Chance of a user-interrupted event per turn")
+    parser.add_argument("--think-ms", type=float, default=0, help="Delay between events of a call (0 = as fast as possible)")
+    parser.add_argument("--injection-interval", type=int, default=3, help="INTERVAL_OF_WEIRD_MESSAGES for the server")
+    parser.add_argument("--provider-latency-ms", type=float, default=20, help="Simulated VAPI/OpenAI latency")
+    parser.add_argument("--drain-seconds", type=float, default=2.0, help="Wait for queued analysis and finalization before collecting counts")
+    parser.add_argument("--database-url", help="Use this database instead of a fresh SQLite file (tables must be creatable)")
+    parser.add_argument("--sqlite-path", default="loadtest.sqlite3", help="SQLite stand-in path when --database-url is not set")
+    parser.add_argument("--server-port", type=int, default=8200)
+    parser.add_argument("--fake-port", type=int, default=8100)
+    parser.add_argument("--server-log-level", default="WARNING")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--json", action="store_true", help="Print the report as JSON")
+    args = parser.parse_args()
+
+    report = asyncio.run(run_load_test(args))
+    if report is None:
+        sys.exit(1)
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        print_report(report)
+
+if __name__ == "__main__":
+    main()
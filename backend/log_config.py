@@ -0,0 +1,196 @@
+import os
+import json
+import time
+import queue
+import atexit
+import logging
+import logging.handlers
+import threading
+from collections import OrderedDict
+from datetime import date, datetime, time as dt_time, timedelta, timezone
+
+# Logging configuration (environment driven so both services share it)
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+LOG_FORMAT = os.getenv("LOG_FORMAT", "json")  # "json" or "text"
+# Per-call budget for DEBUG records (e.g. heartbeats, per-chunk audio logs)
+CALL_DEBUG_LOGS_PER_SECOND = float(os.getenv("CALL_DEBUG_LOGS_PER_SECOND", "1"))
+CALL_DEBUG_LOGS_BURST = int(os.getenv("CALL_DEBUG_LOGS_BURST", "5"))
+
+# Attributes every LogRecord has; anything else was passed via `extra=`
+_STANDARD_RECORD_ATTRS = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime"}
+
+_listener = None
+_setup_lock = threading.Lock()
+
+class LazyJSON:
+    """
+    Defer JSON serialization of a payload until a handler actually formats it.
+
+    Use as a %-style logging argument:
+        logger.debug("Call details: %s", LazyJSON(call_data))
+    If DEBUG is disabled nothing is serialized; if it is enabled the payload
+    is dumped when the record is emitted, so the line shows the payload as it
+    was at the call, not after later mutation.
+    """
+
+    __slots__ = ("payload", "indent")
+
+    def __init__(self, payload, indent=None):
+        self.payload = payload
+        self.indent = indent
+
+    def __str__(self):
+        try:
+            return json.dumps(self.payload, indent=self.indent, default=str)
+        except Exception:
+            return repr(self.payload)
+
+class JsonFormatter(logging.Formatter):
+    """Format records as one JSON object per line, including `extra=` fields"""
+
+    def format(self, record):
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        for key, value in record.__dict__.items():
+            if key not in _STANDARD_RECORD_ATTRS and not key.startswith("_"):
+                entry[key] = value
+        if record.exc_info:
+            entry["exc_info"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+class CallRateLimitFilter(logging.Filter):
+    """
+    Token-bucket rate limit for DEBUG records tagged with a call_id.
+
+    Records above DEBUG, or without a call_id, always pass. Suppressed records
+    are counted and reported on the next record that gets through.
+    """
+
+    def __init__(self, rate=CALL_DEBUG_LOGS_PER_SECOND, burst=CALL_DEBUG_LOGS_BURST, max_calls=10000):
+        super().__init__()
+        self.rate = rate
+        self.burst = burst
+        self.max_calls = max_calls
+        self._buckets = OrderedDict()
+        self._lock = threading.Lock()
+
+    def filter(self, record):
+        if record.levelno > logging.DEBUG:
+            return True
+        call_id = getattr(record, "call_id", None)
+        if not call_id:
+            return True
+
+        now = time.monotonic()
+        with self._lock:
+            bucket = self._buckets.get(call_id)
+            if bucket is None:
+                # [tokens, last refill time, suppressed count]
+                bucket = [float(self.burst), now, 0]
+                self._buckets[call_id] = bucket
+                while len(self._buckets) > self.max_calls:
+                    self._buckets.popitem(last=False)
+            else:
+                self._buckets.move_to_end(call_id)
+
+            bucket[0] = min(float(self.burst), bucket[0] + (now - bucket[1]) * self.rate)
+            bucket[1] = now
+            if bucket[0] < 1.0:
+                bucket[2] += 1
+                return False
+
+            bucket[0] -= 1.0
+            if bucket[2]:
+                record.suppressed = bucket[2]
+                bucket[2] = 0
+        return True
+
+# Argument types that cannot change between the logging call and formatting
+_IMMUTABLE_ARG_TYPES = (str, bytes, int, float, complex, bool, type(None), date, datetime, dt_time, timedelta)
+
+def _is_immutable(value):
+    if isinstance(value, tuple):
+        return all(_is_immutable(item) for item in value)
+    return isinstance(value, _IMMUTABLE_ARG_TYPES)
+
+class _InProcessQueueHandler(logging.handlers.QueueHandler):
+    """
+    QueueHandler that defers message formatting only when that is safe.
+
+    The stock prepare() formats every message in the calling thread (so the
+    record can be pickled). We never leave the process, so records whose
+    arguments are all immutable keep msg/args and are formatted, with the
+    JSON encoding, on the listener thread. LazyJSON payloads are dumped here
+    (the record already passed the level check), and any other mutable
+    argument gets the message formatted here, so the listener never reads
+    state the caller has changed since.
+    """
+
+    def prepare(self, record):
+        args = record.args
+        if not args:
+            return record
+        if isinstance(args, dict):
+            args = {key: str(value) if isinstance(value, LazyJSON) else value for key, value in args.items()}
+            values = args.values()
+        else:
+            args = tuple(str(arg) if isinstance(arg, LazyJSON) else arg for arg in args)
+            values = args
+        record.args = args
+        if not all(_is_immutable(value) for value in values):
+            record.msg = record.getMessage()
+            record.args = None
+        return record
+
+def setup_logging(service_name=None, level=LOG_LEVEL, log_format=LOG_FORMAT):
+    """
+    Configure root logging once per process
+
+    Records are filtered (level + per-call DEBUG rate limit) in the caller,
+    then queued and formatted/written by a background listener thread.
+
+    Args:
+        service_name: Optional name added to every JSON record as `service`
+        level: Root log level name
+        log_format: "json" for one JSON object per line, "text" for plain lines
+    """
+    global _listener
+    with _setup_lock:
+        if _listener is not None:
+            return
+
+        stream_handler = logging.StreamHandler()
+        if log_format == "json":
+            stream_handler.setFormatter(JsonFormatter())
+        else:
+            stream_handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(name)s: %(message)s"))
+
+        log_queue = queue.SimpleQueue()
+        queue_handler = _InProcessQueueHandler(log_queue)
+        queue_handler.addFilter(CallRateLimitFilter())
+        if service_name:
+            def add_service(record):
+                record.service = service_name
+                return True
+            queue_handler.addFilter(add_service)
+
+        root = logging.getLogger()
+        root.handlers = [queue_handler]
+        root.setLevel(level)
+
+        # Keep uvicorn's access/error logs on the same async pipeline
+        for name in ("uvicorn", "uvicorn.error", "uvicorn.access"):
+            logging.getLogger(name).handlers = []
+            logging.getLogger(name).propagate = True
+
+        _listener = logging.handlers.QueueListener(log_queue, stream_handler, respect_handler_level=True)
+        _listener.start()
+        atexit.register(_listener.stop)
+
+def get_logger(name):
+    """Return a module logger (call setup_logging() once at service start)"""
+    return logging.getLogger(name)
@@ -0,0 +1,170 @@
+import os
+import sys
+import time
+import asyncio
+import inspect
+import threading
+import traceback
+from collections import deque
+from datetime import datetime, timezone
+
+from metrics import Counter, HistogramFamily
+from log_config import get_logger
+
+# Diagnostics mode: continuous event-loop lag sampling plus a watchdog thread
+# that captures the loop thread's stack when a callback blocks too long
+LOOP_DIAGNOSTICS = os.getenv("LOOP_DIAGNOSTICS", "0") == "1"
+LOOP_LAG_INTERVAL_MS = float(os.getenv("LOOP_LAG_INTERVAL_MS", "50"))
+LOOP_BLOCK_THRESHOLD_MS = float(os.getenv("LOOP_BLOCK_THRESHOLD_MS", "100"))
+
+# Source files under this directory count as "our" handlers when attributing a stall
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Local variable names that identify the call a frame is working on
+CALL_ID_NAMES = ("call_sid", "call_id")
+
+LAG_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+logger = get_logger("loop_monitor")
+
+event_loop_lag_seconds = HistogramFamily("event_loop_lag_seconds", "Event loop scheduling lag", buckets=LAG_BUCKETS)
+event_loop_blocked_seconds = HistogramFamily("event_loop_blocked_seconds", "Duration of callbacks that blocked the loop past the threshold", ("handler",), buckets=LAG_BUCKETS)
+event_loop_blocked_total = Counter("event_loop_blocked_total", "Callbacks that blocked the loop past the threshold", ("handler",))
+
+def _attribute(frame):
+    """
+    Find the outermost coroutine in our own code (the handler) and the first
+    call ID visible in any of our frames, walking from the innermost frame outwards
+    """
+    handler = None
+    call_id = None
+    while frame is not None:
+        filename = frame.f_code.co_filename
+        if filename.startswith(BACKEND_DIR) and not filename.endswith("loop_monitor.py"):
+            if frame.f_code.co_flags & inspect.CO_COROUTINE:
+                handler = frame.f_code.co_name
+            if call_id is None:
+                try:
+                    local_vars = frame.f_locals
+                except Exception:
+                    local_vars = {}
+                for name in CALL_ID_NAMES:
+                    value = local_vars.get(name)
+                    if isinstance(value, str) and value:
+                        call_id = value
+                        break
+        frame = frame.f_back
+    return handler, call_id
+
+class LoopMonitor:
+    """
+    Measures event loop lag and reports callbacks that block it.
+
+    An asyncio task ticks every `interval_ms` and records how late it woke up.
+    A watchdog thread notices when the tick is overdue by more than
+    `threshold_ms`, snapshots the loop thread's stack and attributes the stall
+    to the handler function and call ID found on it. When the loop recovers
+    the tick records the total blocked time against that handler.
+    """
+
+    def __init__(self, interval_ms=LOOP_LAG_INTERVAL_MS, threshold_ms=LOOP_BLOCK_THRESHOLD_MS, max_reports=50):
+        self.interval = interval_ms / 1000.0
+        self.threshold = threshold_ms / 1000.0
+        self.reports = deque(maxlen=max_reports)
+        self.running = False
+        self._loop = None
+        self._loop_thread_id = None
+        self._last_tick = None
+        self._pending = None
+        self._lock = threading.Lock()
+        self._task = None
+        self._watchdog = None
+
+    async def start(self):
+        if self.running:
+            return
+        self.running = True
+        self._loop = asyncio.get_running_loop()
+        self._loop_thread_id = threading.get_ident()
+        self._last_tick = time.perf_counter()
+        self._task = self._loop.create_task(self._tick())
+        self._watchdog = threading.Thread(target=self._watch, name="loop-watchdog", daemon=True)
+        self._watchdog.start()
+        logger.info("Event loop diagnostics enabled (interval %.0f ms, threshold %.0f ms)", self.interval * 1000, self.threshold * 1000)
+
+    async def stop(self):
+        self.running = False
+        if self._task:
+            self._task.cancel()
+
+    async def _tick(self):
+        while self.running:
+            scheduled_at = time.perf_counter()
+            await asyncio.sleep(self.interval)
+            now = time.perf_counter()
+            lag = max(0.0, now - scheduled_at - self.interval)
+            event_loop_lag_seconds.observe(lag)
+            with self._lock:
+                self._last_tick = now
+                pending, self._pending = self._pending, None
+            if pending is not None:
+                pending["blocked_ms"] = round(lag * 1000, 1)
+                event_loop_blocked_seconds.observe(lag, handler=pending["handler"] or "unknown")
+                event_loop_blocked_total.inc(handler=pending["handler"] or "unknown")
+                logger.warning(
+                    "Event loop blocked for %.0f ms in %s (call %s)",
+                    lag * 1000, pending["handler"], pending["call_id"],
+                    extra={"call_id": pending["call_id"], "handler": pending["handler"]}
+                )
+
+    def _watch(self):
+        poll = max(0.005, self.threshold / 4)
+        while self.running:
+            time.sleep(poll)
+            with self._lock:
+                overdue = time.perf_counter() - self._last_tick - self.interval
+                if overdue < self.threshold or self._pending is not None:
+                    continue
+                frame = sys._current_frames().get(self._loop_thread_id)
+                if frame is None:
+                    continue
+                handler, call_id = _attribute(frame)
+                task = asyncio.current_task(self._loop)
+                report = {
+                    "detected_at": datetime.now(timezone.utc).isoformat(),
+                    "handler": handler,
+                    "call_id": call_id,
+                    "task": task.get_name() if task is not None else None,
+                    "blocked_ms": None,  # filled in once the loop recovers
+                    "stack": traceback.format_stack(frame)[-15:],
+                }
+                self._pending = report
+                self.reports.append(report)
+
+    def snapshot(self):
+        """Current diagnostics state for the debug endpoint"""
+        return {
+            "enabled": self.running,
+            "interval_ms": self.interval * 1000,
+            "threshold_ms": self.threshold * 1000,
+            "lag": event_loop_lag_seconds.labels().snapshot(),
+            "recent_blocks": list(self.reports),
+        }
+
+# One monitor per process (each service runs a single event loop)
+monitor = LoopMonitor()
+
+def install(app):
+    """
+    Add /debug/loop to a FastAPI app and, when LOOP_DIAGNOSTICS=1, start the
+    monitor with the app
+    """
+    if LOOP_DIAGNOSTICS:
+        app.add_event_handler("startup", monitor.start)
+        app.add_event_handler("shutdown", monitor.stop)
+
+    async def debug_loop():
+        """Event loop lag percentiles and recent blocking callbacks with stacks"""
+        return monitor.snapshot()
+
+    app.add_api_route("/debug/loop", debug_loop, methods=["GET"])
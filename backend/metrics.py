@@ -0,0 +1,334 @@
+import math
+import threading
+import time
+from collections import OrderedDict, deque
+from contextlib import contextmanager
+
+# Default latency buckets (seconds), tuned for voice turns: tens of ms up to several seconds
+DEFAULT_LATENCY_BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 0.75, 1.0, 1.5, 2.0, 3.0, 5.0, 10.0)
+
+# Percentiles reported in snapshots
+REPORTED_PERCENTILES = (50, 95, 99)
+
+def _percentile(sorted_samples, q):
+    """Nearest-rank percentile of an already-sorted list: the ceil(q/100 * n)-th smallest sample"""
+    if not sorted_samples:
+        return None
+    n = len(sorted_samples)
+    # q * n first: q / 100.0 * n can land just above an integer (7 / 100.0 * 100 == 7.000000000000001)
+    index = min(n - 1, max(0, math.ceil(q * n / 100.0) - 1))
+    return sorted_samples[index]
+
+class Histogram:
+    """
+    Thread-safe latency histogram.
+
+    Keeps cumulative bucket counts (cheap, unbounded history) plus a bounded
+    window of recent samples that percentiles are computed from.
+    """
+
+    def __init__(self, buckets=DEFAULT_LATENCY_BUCKETS, window=1024):
+        self.buckets = tuple(sorted(buckets))
+        self.bucket_counts = [0] * len(self.buckets)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+        self.samples = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def observe(self, value):
+        """Record a single observation (in seconds)"""
+        with self._lock:
+            self.count += 1
+            self.sum += value
+            if value > self.max:
+                self.max = value
+            self.samples.append(value)
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    self.bucket_counts[i] += 1
+                    break
+
+    def percentile(self, q):
+        """Return the q-th percentile (0-100) of the recent sample window"""
+        with self._lock:
+            samples = sorted(self.samples)
+        return _percentile(samples, q)
+
+    def snapshot(self):
+        """Return a JSON-serializable summary of the histogram"""
+        with self._lock:
+            samples = sorted(self.samples)
+            count = self.count
+            total = self.sum
+            maximum = self.max
+
+        summary = {
+            "count": count,
+            "sum": round(total, 6),
+            "avg": round(total / count, 6) if count else None,
+            "max": round(maximum, 6) if count else None,
+        }
+        for q in REPORTED_PERCENTILES:
+            value = _percentile(samples, q)
+            summary[f"p{q}"] = round(value, 6) if value is not None else None
+        return summary
+
+class LatencyTracker:
+    """
+    Per-stage latency histograms, aggregated globally and per call.
+
+    Per-call histograms are kept for the most recent `max_calls` calls so that
+    long-running workers don't grow without bound.
+    """
+
+    def __init__(self, stages, max_calls=500, buckets=DEFAULT_LATENCY_BUCKETS):
+        self.stages = tuple(stages)
+        self.max_calls = max_calls
+        self.buckets = buckets
+        self.global_histograms = {stage: Histogram(buckets) for stage in self.stages}
+        self.call_histograms = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _histograms_for_call(self, call_id):
+        with self._lock:
+            histograms = self.call_histograms.get(call_id)
+            if histograms is None:
+                histograms = {stage: Histogram(self.buckets, window=256) for stage in self.stages}
+                self.call_histograms[call_id] = histograms
+                # Evict the oldest calls once we are over budget
+                while len(self.call_histograms) > self.max_calls:
+                    self.call_histograms.popitem(last=False)
+            else:
+                self.call_histograms.move_to_end(call_id)
+            return histograms
+
+    def record(self, stage, seconds, call_id=None):
+        """Record a stage duration globally and, if given, for a specific call"""
+        if stage not in self.global_histograms:
+            raise ValueError(f"Unknown latency stage: {stage}")
+        self.global_histograms[stage].observe(seconds)
+        if call_id:
+            self._histograms_for_call(call_id)[stage].observe(seconds)
+
+    @contextmanager
+    def span(self, stage, call_id=None):
+        """Context manager that records the wall time of the wrapped block"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(stage, time.perf_counter() - start, call_id)
+
+    def snapshot(self, call_id=None):
+        """
+        Summarize recorded latencies
+
+        Args:
+            call_id: Optional call ID to restrict the summary to a single call
+
+        Returns:
+            dict: stage -> histogram summary (or None if the call is unknown)
+        """
+        if call_id is not None:
+            with self._lock:
+                histograms = self.call_histograms.get(call_id)
+            if histograms is None:
+                return None
+            return {stage: h.snapshot() for stage, h in histograms.items()}
+        return {stage: h.snapshot() for stage, h in self.global_histograms.items()}
+
+    def call_ids(self):
+        """Return the IDs of calls that currently have per-call histograms"""
+        with self._lock:
+            return list(self.call_histograms.keys())
+
+# ==================== PROMETHEUS-STYLE METRICS ====================
+
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+def _format_labels(labelnames, labelvalues, extra=None):
+    pairs = list(zip(labelnames, labelvalues))
+    if extra:
+        pairs.extend(extra)
+    if not pairs:
+        return ""
+    rendered = ",".join(
+        '{}="{}"'.format(name, str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n"))
+        for name, value in pairs
+    )
+    return "{" + rendered + "}"
+
+def _format_value(value):
+    if value == float("inf"):
+        return "+Inf"
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(value) if isinstance(value, float) else str(value)
+
+class _MetricFamily:
+    """Base class for a named metric with an optional set of labels"""
+
+    metric_type = "untyped"
+
+    def __init__(self, name, documentation, labelnames=(), registry=None):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children = {}
+        self._lock = threading.Lock()
+        (registry if registry is not None else REGISTRY).register(self)
+
+    def _key(self, labels):
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}, got {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def _child(self, labels, factory):
+        key = self._key(labels)
+        with self._lock:
+            child = self._children.get(key)
+            if child is None:
+                child = factory()
+                self._children[key] = child
+            return child
+
+    def _items(self):
+        with self._lock:
+            return list(self._children.items())
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.metric_type}"]
+        lines.extend(self._render_samples())
+        return "\n".join(lines)
+
+class _Value:
+    def __init__(self):
+        self.value = 0.0
+        self._lock = threading.Lock()
+
+    def add(self, amount):
+        with self._lock:
+            self.value += amount
+
+    def set(self, value):
+        with self._lock:
+            self.value = value
+
+class Counter(_MetricFamily):
+    """Monotonically increasing counter (by convention named with a `_total` suffix)"""
+
+    metric_type = "counter"
+
+    def inc(self, amount=1, **labels):
+        if amount < 0:
+            raise ValueError("Counters can only be incremented")
+        self._child(labels, _Value).add(amount)
+
+    def value(self, **labels):
+        return self._child(labels, _Value).value
+
+    def _render_samples(self):
+        for key, child in self._items():
+            yield f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(child.value)}"
+
+class Gauge(_MetricFamily):
+    """Value that can go up and down, or be computed on scrape via set_function()"""
+
+    metric_type = "gauge"
+
+    def __init__(self, name, documentation, labelnames=(), registry=None):
+        self._function = None
+        super().__init__(name, documentation, labelnames, registry)
+
+    def set(self, value, **labels):
+        self._child(labels, _Value).set(value)
+
+    def inc(self, amount=1, **labels):
+        self._child(labels, _Value).add(amount)
+
+    def dec(self, amount=1, **labels):
+        self._child(labels, _Value).add(-amount)
+
+    def set_function(self, function):
+        """Compute the (unlabelled) gauge value on every scrape"""
+        self._function = function
+
+    def value(self, **labels):
+        if self._function is not None:
+            return self._function()
+        return self._child(labels, _Value).value
+
+    def _render_samples(self):
+        if self._function is not None:
+            yield f"{self.name} {_format_value(float(self._function()))}"
+            return
+        for key, child in self._items():
+            yield f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(child.value)}"
+
+class HistogramFamily(_MetricFamily):
+    """Labelled latency histogram rendered with cumulative `le` buckets"""
+
+    metric_type = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_LATENCY_BUCKETS, registry=None):
+        self.buckets = tuple(sorted(buckets))
+        super().__init__(name, documentation, labelnames, registry)
+
+    def labels(self, **labels):
+        """Return the underlying Histogram for a label set"""
+        return self._child(labels, lambda: Histogram(self.buckets))
+
+    def observe(self, value, **labels):
+        self.labels(**labels).observe(value)
+
+    @contextmanager
+    def time(self, **labels):
+        """Context manager that observes the wall time of the wrapped block"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def _render_samples(self):
+        for key, histogram in self._items():
+            with histogram._lock:
+                bucket_counts = list(histogram.bucket_counts)
+                count = histogram.count
+                total = histogram.sum
+            cumulative = 0
+            for bound, bucket_count in zip(histogram.buckets, bucket_counts):
+                cumulative += bucket_count
+                labels = _format_labels(self.labelnames, key, [("le", _format_value(float(bound)))])
+                yield f"{self.name}_bucket{labels} {cumulative}"
+            labels = _format_labels(self.labelnames, key, [("le", "+Inf")])
+            yield f"{self.name}_bucket{labels} {count}"
+            yield f"{self.name}_sum{_format_labels(self.labelnames, key)} {_format_value(total)}"
+            yield f"{self.name}_count{_format_labels(self.labelnames, key)} {count}"
+
+class Registry:
+    """Collection of metric families rendered together on /metrics"""
+
+    def __init__(self):
+        self._metrics = OrderedDict()
+        self._lock = threading.Lock()
+
+    def register(self, metric):
+        with self._lock:
+            if metric.name in self._metrics:
+                raise ValueError(f"Metric {metric.name} is already registered")
+            self._metrics[metric.name] = metric
+
+    def get(self, name):
+        with self._lock:
+            return self._metrics.get(name)
+
+    def render(self):
+        """Render every registered metric in the Prometheus text exposition format"""
+        with self._lock:
+            metrics = list(self._metrics.values())
+        return "\n".join(metric.render() for metric in metrics) + "\n"
+
+# Process-wide default registry
+REGISTRY = Registry()
@@ -0,0 +1,386 @@
+import os
+import re
+import sys
+import time
+import argparse
+from datetime import datetime, timezone, timedelta
+
+from sqlalchemy import text, inspect
+from dotenv import load_dotenv
+
+import db_operations
+from db_operations import calls, call_events, call_scores, call_aggregates, injection_messages, phone_calls
+import job_queue
+from job_queue import jobs, MAINTENANCE_QUEUE
+from log_config import get_logger
+
+# Load environment variables
+load_dotenv()
+
+logger = get_logger("migrations")
+
+# Create call_events/call_scores range-partitioned by month (Postgres only,
+# applies when the tables are first created)
+PARTITION_ANALYSIS_TABLES = os.getenv("PARTITION_ANALYSIS_TABLES", "0") == "1"
+# Monthly partitions to keep created ahead of the current month
+PARTITION_MONTHS_AHEAD = int(os.getenv("PARTITION_MONTHS_AHEAD", "2"))
+# Drop/delete call_events and call_scores rows older than this (0 keeps everything)
+ANALYSIS_RETENTION_DAYS = int(os.getenv("ANALYSIS_RETENTION_DAYS", "0"))
+# Delete finished (done/failed) jobs older than this
+JOB_RETENTION_DAYS = int(os.getenv("JOB_RETENTION_DAYS", "7"))
+RETENTION_DELETE_BATCH = int(os.getenv("RETENTION_DELETE_BATCH", "5000"))
+
+PARTITIONED_TABLES = ("call_events", "call_scores")
+
+# Arbitrary key for the Postgres advisory lock that serializes migration runs
+MIGRATION_LOCK_KEY = 72_114_035
+
+# Column definitions for partitioned tables. The partition key has to be part
+# of the primary key, so it is (id, timestamp) instead of id.
+PARTITIONED_DDL = {
+    "call_events": """
+        CREATE TABLE call_events (
+            id TEXT NOT NULL,
+            call_id TEXT NOT NULL,
+            timestamp TIMESTAMP NOT NULL,
+            epoch INTEGER NOT NULL,
+            time_into_call INTEGER NOT NULL,
+            type TEXT NOT NULL,
+            description TEXT NOT NULL,
+            PRIMARY KEY (id, timestamp)
+        ) PARTITION BY RANGE (timestamp)
+    """,
+    "call_scores": """
+        CREATE TABLE call_scores (
+            id TEXT NOT NULL,
+            call_id TEXT NOT NULL,
+            timestamp TIMESTAMP NOT NULL,
+            epoch INTEGER NOT NULL,
+            politeness_score NUMERIC(10, 2) NOT NULL,
+            PRIMARY KEY (id, timestamp)
+        ) PARTITION BY RANGE (timestamp)
+    """,
+}
+
+PARTITION_NAME = re.compile(r"^(?P<table>\w+)_p(?P<year>\d{4})_(?P<month>\d{2})$")
+
+def _month_start(value):
+    return datetime(value.year, value.month, 1)
+
+def _next_month(value):
+    return datetime(value.year + value.month // 12, value.month % 12 + 1, 1)
+
+def _table_exists(conn, table):
+    return conn.dialect.has_table(conn, table)
+
+def is_partitioned(conn, table):
+    if conn.dialect.name != "postgresql":
+        return False
+    return conn.execute(
+        text("""
+        SELECT 1 FROM pg_partitioned_table pt
+        JOIN pg_class c ON c.oid = pt.partrelid
+        WHERE c.relname = :table
+        """),
+        {"table": table}
+    ).scalar() is not None
+
+# ==================== MIGRATIONS ====================
+
+def _0001_core_tables(conn):
+    """calls, call_aggregates and jobs"""
+    for table in (calls, call_aggregates, jobs):
+        table.create(conn, checkfirst=True)
+
+def _0002_analysis_tables(conn):
+    """call_events and call_scores, partitioned by month when enabled on Postgres"""
+    for table in (call_events, call_scores):
+        if _table_exists(conn, table.name):
+            continue
+        if PARTITION_ANALYSIS_TABLES and conn.dialect.name == "postgresql":
+            conn.execute(text(PARTITIONED_DDL[table.name]))
+            conn.execute(text(f"CREATE TABLE {table.name}_default PARTITION OF {table.name} DEFAULT"))
+            _create_month_partitions(conn, table.name, PARTITION_MONTHS_AHEAD)
+        else:
+            table.create(conn, checkfirst=True)
+
+def _0003_analysis_indexes(conn):
+    """(call_id, timestamp) indexes for tables that predate the backend owning them"""
+    for table in (call_events, call_scores):
+        conn.execute(text(f"CREATE INDEX IF NOT EXISTS {table.name}_call_id_timestamp_idx ON {table.name} (call_id, timestamp)"))
+
+def _0004_injection_messages(conn):
+    """injection_messages, the per-persona/scenario content for message injection"""
+    injection_messages.create(conn, checkfirst=True)
+
+def _0005_aggregate_score_buckets(conn):
+    """call_aggregates.score_buckets, then recompute event/score aggregates for existing calls"""
+    if "score_buckets" not in {column["name"] for column in inspect(conn).get_columns("call_aggregates")}:
+        column_type = call_aggregates.c.score_buckets.type.compile(dialect=conn.dialect)
+        conn.execute(text(f"ALTER TABLE call_aggregates ADD COLUMN score_buckets {column_type} NOT NULL DEFAULT '{{}}'"))
+    backfill_aggregates(conn)
+
+def _0006_phone_calls(conn):
+    """phone_calls, the Twilio call statuses written by phone_caller"""
+    phone_calls.create(conn, checkfirst=True)
+
+MIGRATIONS = [
+    (1, "core_tables", _0001_core_tables),
+    (2, "analysis_tables", _0002_analysis_tables),
+    (3, "analysis_indexes", _0003_analysis_indexes),
+    (4, "injection_messages", _0004_injection_messages),
+    (5, "aggregate_score_buckets", _0005_aggregate_score_buckets),
+    (6, "phone_calls", _0006_phone_calls),
+]
+
+# ==================== AGGREGATES BACKFILL ====================
+
+def _naive(value):
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value)
+    return value.replace(tzinfo=None) if value is not None else None
+
+def _grouped_by_call(rows):
+    call_id, group = None, []
+    for row in rows:
+        if row.call_id != call_id and group:
+            yield call_id, group
+            group = []
+        call_id = row.call_id
+        group.append(row)
+    if group:
+        yield call_id, group
+
+def backfill_aggregates(conn):
+    """
+    Recompute the event and score columns of call_aggregates from
+    call_events and call_scores, for calls written before those columns
+    existed or were maintained. Finalization columns are left alone.
+    Run it while no analysis jobs are writing, e.g. from a migration.
+
+    Returns:
+        int: Calls whose aggregates were rewritten
+    """
+    event_epochs = {}
+    events = conn.execution_options(stream_results=True).execute(text(
+        "SELECT call_id, type, epoch FROM call_events ORDER BY call_id"
+    ))
+    for call_id, rows in _grouped_by_call(events):
+        counts = {}
+        for row in rows:
+            counts[row.type] = counts.get(row.type, 0) + 1
+        db_operations.upsert_call_aggregates(conn, call_id, {
+            "event_count": len(rows),
+            "event_counts": counts,
+            "updated_epoch": max(row.epoch for row in rows),
+        })
+        event_epochs[call_id] = max(row.epoch for row in rows)
+
+    scored = set()
+    scores = conn.execution_options(stream_results=True).execute(text("""
+        SELECT s.call_id, s.timestamp, s.epoch, s.politeness_score, c.started_at
+        FROM call_scores s LEFT JOIN calls c ON c.id = s.call_id
+        ORDER BY s.call_id, s.timestamp
+    """))
+    for call_id, rows in _grouped_by_call(scores):
+        # Calls without a calls row are measured from their first score
+        started_at = _naive(rows[0].started_at) or _naive(rows[0].timestamp)
+        values = [float(row.politeness_score) for row in rows]
+        buckets = {}
+        for row, value in zip(rows, values):
+            bucket = buckets.setdefault(db_operations.score_bucket((_naive(row.timestamp) - started_at).total_seconds()), {"n": 0, "sum": 0.0})
+            bucket["n"] += 1
+            bucket["sum"] += value
+        aggregates = {
+            "score_count": len(values),
+            "score_sum": sum(values),
+            "min_score": min(values),
+            "max_score": max(values),
+            "avg_score": sum(values) / len(values),
+            "latest_score": values[-1],
+            "score_buckets": buckets,
+            "updated_epoch": max([row.epoch for row in rows] + [event_epochs.get(call_id, 0)]),
+        }
+        db_operations.upsert_call_aggregates(conn, call_id, aggregates)
+        scored.add(call_id)
+
+    backfilled = len(scored | set(event_epochs))
+    logger.info("Backfilled aggregates for %s calls", backfilled)
+    return backfilled
+
+def migrate(engine=None):
+    """
+    Apply pending migrations, recording each in schema_migrations
+
+    Safe to run from several processes at once: on Postgres the whole run
+    holds an advisory lock and DDL is transactional.
+
+    Returns:
+        list: Versions applied by this run
+    """
+    engine = engine or db_operations.engine
+    applied = []
+    with engine.begin() as conn:
+        if conn.dialect.name == "postgresql":
+            conn.execute(text("SELECT pg_advisory_xact_lock(:key)"), {"key": MIGRATION_LOCK_KEY})
+        conn.execute(text("""
+            CREATE TABLE IF NOT EXISTS schema_migrations (
+                version INTEGER PRIMARY KEY,
+                name TEXT NOT NULL,
+                applied_at TIMESTAMP NOT NULL
+            )
+        """))
+        done = {row[0] for row in conn.execute(text("SELECT version FROM schema_migrations"))}
+        for version, name, migration in MIGRATIONS:
+            if version in done:
+                continue
+            started_at = time.perf_counter()
+            migration(conn)
+            conn.execute(
+                text("INSERT INTO schema_migrations (version, name, applied_at) VALUES (:version, :name, :applied_at)"),
+                {"version": version, "name": name, "applied_at": datetime.now(timezone.utc)}
+            )
+            applied.append(version)
+            logger.info("Applied migration %04d_%s in %.0f ms", version, name, (time.perf_counter() - started_at) * 1000)
+    return applied
+
+# ==================== PARTITIONS AND RETENTION ====================
+
+def _create_month_partitions(conn, table, months_ahead):
+    month = _month_start(datetime.now(timezone.utc))
+    created = []
+    for _ in range(months_ahead + 1):
+        upper = _next_month(month)
+        name = f"{table}_p{month:%Y_%m}"
+        if not _table_exists(conn, name):
+            conn.execute(text(
+                f"CREATE TABLE {name} PARTITION OF {table} "
+                f"FOR VALUES FROM ('{month:%Y-%m-%d}') TO ('{upper:%Y-%m-%d}')"
+            ))
+            created.append(name)
+        month = upper
+    return created
+
+def ensure_partitions(engine=None, months_ahead=PARTITION_MONTHS_AHEAD):
+    """Create upcoming monthly partitions for the partitioned analysis tables"""
+    engine = engine or db_operations.engine
+    created = []
+    with engine.begin() as conn:
+        for table in PARTITIONED_TABLES:
+            if is_partitioned(conn, table):
+                created.extend(_create_month_partitions(conn, table, months_ahead))
+    if created:
+        logger.info("Created partitions: %s", ", ".join(created))
+    return created
+
+def _delete_in_batches(engine, table, condition, params):
+    # Each batch commits on its own, so locks and WAL are released between
+    # batches and an interrupted run keeps what it already deleted
+    deleted = 0
+    while True:
+        with engine.begin() as conn:
+            result = conn.execute(
+                text(f"DELETE FROM {table} WHERE id IN (SELECT id FROM {table} WHERE {condition} LIMIT :batch)"),
+                dict(params, batch=RETENTION_DELETE_BATCH)
+            )
+        deleted += result.rowcount
+        if result.rowcount < RETENTION_DELETE_BATCH:
+            return deleted
+
+def prune(engine=None, retention_days=ANALYSIS_RETENTION_DAYS, job_retention_days=JOB_RETENTION_DAYS):
+    """
+    Apply the retention policy
+
+    Partitions entirely older than the cutoff are dropped (cheap on a busy
+    table); older rows in unpartitioned tables or the default partition are
+    deleted in batches of RETENTION_DELETE_BATCH, each in its own
+    transaction. Finished jobs are removed after their own retention.
+
+    Returns:
+        dict: Rows deleted and partitions dropped per table
+    """
+    engine = engine or db_operations.engine
+    summary = {}
+    now = datetime.now(timezone.utc)
+
+    if retention_days > 0:
+        cutoff = (now - timedelta(days=retention_days)).replace(tzinfo=None)
+        for table in PARTITIONED_TABLES:
+            # Partition drops commit together, before and apart from the row deletes
+            with engine.begin() as conn:
+                if not _table_exists(conn, table):
+                    continue
+                dropped = []
+                if is_partitioned(conn, table):
+                    partitions = conn.execute(
+                        text("""
+                        SELECT c.relname FROM pg_inherits i
+                        JOIN pg_class c ON c.oid = i.inhrelid
+                        JOIN pg_class p ON p.oid = i.inhparent
+                        WHERE p.relname = :table
+                        """),
+                        {"table": table}
+                    ).scalars().all()
+                    for name in partitions:
+                        match = PARTITION_NAME.match(name)
+                        if match and _next_month(datetime(int(match["year"]), int(match["month"]), 1)) <= cutoff:
+                            conn.execute(text(f"DROP TABLE {name}"))
+                            dropped.append(name)
+            deleted = _delete_in_batches(engine, table, "timestamp < :cutoff", {"cutoff": cutoff})
+            summary[table] = {"deleted": deleted, "dropped_partitions": dropped}
+
+    if job_retention_days > 0:
+        summary["jobs"] = {"deleted": _delete_in_batches(
+            engine, "jobs", "status IN ('done', 'failed') AND updated_at < :cutoff",
+            {"cutoff": now - timedelta(days=job_retention_days)}
+        )}
+
+    logger.info("Retention run: %s", summary)
+    return summary
+
+def run_maintenance(engine=None):
+    """Daily maintenance: keep partitions ahead of time and apply retention"""
+    created = ensure_partitions(engine)
+    summary = prune(engine)
+    return {"created_partitions": created, "pruned": summary}
+
+def schedule_maintenance(day=None):
+    """
+    Queue the maintenance job for a UTC day (default today, due immediately).
+    The idempotency key makes this safe to call from every process on startup.
+    """
+    today = datetime.now(timezone.utc).date()
+    day = day or today
+    delay = 0
+    if day > today:
+        delay = (datetime(day.year, day.month, day.day, tzinfo=timezone.utc) - datetime.now(timezone.utc)).total_seconds()
+    return job_queue.enqueue(MAINTENANCE_QUEUE, {"day": day.isoformat()}, idempotency_key=f"maintenance:{day.isoformat()}", delay=delay)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Manage the backend's database schema")
+    parser.add_argument("command", choices=["migrate", "status", "partitions", "prune", "backfill-aggregates"], nargs="?", default="migrate")
+    parser.add_argument("--retention-days", type=int, default=ANALYSIS_RETENTION_DAYS, help="For prune: analysis row retention (0 = keep)")
+    args = parser.parse_args()
+
+    if args.command == "migrate":
+        applied = migrate()
+        print(f"Applied migrations: {applied or 'none (up to date)'}")
+    elif args.command == "status":
+        with db_operations.engine.connect() as conn:
+            done = {}
+            if _table_exists(conn, "schema_migrations"):
+                done = {row[0]: row[1] for row in conn.execute(text("SELECT version, applied_at FROM schema_migrations"))}
+            for version, name, _ in MIGRATIONS:
+                print(f"{version:04d}_{name:<20} {'applied ' + str(done[version]) if version in done else 'pending'}")
+            for table in PARTITIONED_TABLES:
+                print(f"{table}: {'partitioned' if is_partitioned(conn, table) else 'not partitioned'}")
+    elif args.command == "partitions":
+        print(f"Created: {ensure_partitions() or 'none'}")
+    elif args.command == "prune":
+        if args.retention_days <= 0 and JOB_RETENTION_DAYS <= 0:
+            print("Retention is disabled")
+            sys.exit(0)
+        print(prune(retention_days=args.retention_days))
+    elif args.command == "backfill-aggregates":
+        with db_operations.engine.begin() as conn:
+            print(f"Backfilled aggregates for {backfill_aggregates(conn)} calls")
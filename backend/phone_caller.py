@@ -1,35 +1,51 @@
 import os
 import time
 import json
+import zlib
+import random
 import asyncio
 from dotenv import load_dotenv
-from fastapi import FastAPI, Request, Response, WebSocket, HTTPException
-from fastapi.responses import JSONResponse
+from fastapi import FastAPI, Request, Response, WebSocket, HTTPException, Query
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
 import uvicorn
 from pydantic import BaseModel
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, List
 
-# Twilio for call handling
-from twilio.rest import Client
+# Twilio for call handling (REST operations go through twilio_async)
 from twilio.twiml.voice_response import VoiceResponse, Gather
-from twilio.request_validator import RequestValidator
 
-# Google Cloud Speech-to-Text
-from google.cloud import speech
-from google.cloud.speech import RecognitionConfig, StreamingRecognitionConfig
-from google.cloud.speech import SpeechContext
-import google.api_core.exceptions
-
-# OpenAI for AI response generation
-import openai
+# Google Cloud Speech-to-Text and OpenAI clients are built on first use
+# (or pre-warmed after startup), not at import
+import provider_clients
+from provider_clients import google_speech, openai_client
 
 # ElevenLabs for text-to-speech
 import requests
-import websockets
+
+# Per-stage latency histograms
+from metrics import LatencyTracker, Counter, REGISTRY, PROMETHEUS_CONTENT_TYPE
+import loop_monitor
+import health_probes
+from dialer import BulkDialer, TwilioPlacer
+from twilio_async import AsyncTwilioClient, TWILIO_API_BASE_URL
+from twilio_callbacks import (
+    CallStatusEvent, SignatureValidator, StatusBatcher, parse_form, callback_url, is_stale,
+    twilio_status_callbacks_total, TWILIO_VALIDATE_SIGNATURES
+)
+from audio_utils import frame_duration_ms
+from endpointing import Endpointer, SPEECH_START, SPEECH_END
+from log_config import setup_logging, get_logger
+from call_updates import CallChangeFeed, CALL_UPDATES_MAX_WAIT, FINAL_CALL_STATUSES
+import tts_cache
+from tts_cache import FALLBACK_RESPONSE
+from speculative import SpeculativeResponder, SpeculativeTurn, SPECULATION_PAUSE_MS
 
 # Load environment variables
 load_dotenv()
 
+setup_logging("phone_caller")
+logger = get_logger("phone_caller")
+
 # API keys and credentials
 TWILIO_ACCOUNT_SID = os.getenv("TWILIO_ACCOUNT_SID")
 TWILIO_AUTH_TOKEN = os.getenv("TWILIO_AUTH_TOKEN")
@@ -38,19 +54,130 @@ GOOGLE_APPLICATION_CREDENTIALS = os.getenv("GOOGLE_APPLICATION_CREDENTIALS")  #
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
 ELEVENLABS_API_KEY = os.getenv("ELEVENLABS_API_KEY")
 ELEVENLABS_VOICE_ID = os.getenv("ELEVENLABS_VOICE_ID", "21m00Tcm4TlvDq8ikWAM")  # Default voice ID
+ELEVENLABS_BASE_URL = os.getenv("ELEVENLABS_BASE_URL", "https://api.elevenlabs.io")  # Overridable for local fakes
 
 # Initialize clients
-twilio_client = Client(TWILIO_ACCOUNT_SID, TWILIO_AUTH_TOKEN)
-twilio_validator = RequestValidator(TWILIO_AUTH_TOKEN)
-speech_client = speech.SpeechClient()  # Google Speech client
-openai.api_key = OPENAI_API_KEY
+# Async Twilio REST client: calls.create/update without blocking media streams
+twilio_client = AsyncTwilioClient(TWILIO_ACCOUNT_SID, TWILIO_AUTH_TOKEN, TWILIO_API_BASE_URL)
+# X-Twilio-Signature checks (a secondary token is accepted during rotation)
+twilio_validator = SignatureValidator(TWILIO_AUTH_TOKEN, os.getenv("TWILIO_SECONDARY_AUTH_TOKEN"))
 
 # FastAPI app
 app = FastAPI(title="AI-Powered Phone Call System")
 
+# Event loop lag / blocking-call diagnostics (/debug/loop, enabled with LOOP_DIAGNOSTICS=1)
+loop_monitor.install(app)
+
+# Dependency probes (/health/deep): Twilio, Google Speech, OpenAI, ElevenLabs
+health_probes.install(app, health_probes.PHONE_CALLER_PROBES)
+
 # Store conversation state
 conversations = {}
 
+# Change versions for long-polling clients (GET /calls/{call_sid}/updates)
+call_changes = CallChangeFeed()
+
+# Conversation fields covered by call_changes versions (set when the call is
+# created or through set_call_status/append_history). Reads of only these
+# fields get a version ETag checked before anything is serialized.
+VERSIONED_CALL_FIELDS = {"status", "history", "system_instructions", "start_time"}
+# Per-call working state that is never returned
+HIDDEN_CALL_FIELDS = {"current_audio", "filler_audio"}
+MAX_HISTORY_PAGE = 500
+
+def set_call_status(call_sid, status):
+    """Update a call's status and notify long-polling clients"""
+    conversations[call_sid]["status"] = status
+    call_changes.changed(call_sid)
+    if status in FINAL_CALL_STATUSES:
+        call_changes.finished(call_sid)
+
+def append_history(call_sid, human, ai):
+    """Add an exchange to a call's history and notify long-polling clients"""
+    conversations[call_sid].setdefault("history", []).append({
+        "human": human,
+        "ai": ai,
+        "timestamp": time.time()
+    })
+    call_changes.changed(call_sid, history_appended=True)
+
+# Bulk dialer for campaigns (concurrency/CPS limits from DIALER_TWILIO_* env vars)
+bulk_dialer = BulkDialer([TwilioPlacer(TWILIO_ACCOUNT_SID, TWILIO_AUTH_TOKEN, TWILIO_PHONE_NUMBER)])
+app.add_event_handler("shutdown", bulk_dialer.close)
+app.add_event_handler("shutdown", twilio_client.close)
+
+def apply_call_statuses(events):
+    """Apply a batch of Twilio status transitions to in-memory call state"""
+    for event in events:
+        conversation = conversations.get(event.call_sid)
+        if conversation is None or is_stale(event.status, conversation.get("status")):
+            continue
+        set_call_status(event.call_sid, event.status)
+
+def persist_call_statuses(events):
+    # Imported here: db_operations connects on import and the voice server
+    # runs without a database unless DATABASE_URL is set. Statuses go to
+    # phone_calls, keyed by CallSid (the calls table holds VAPI calls).
+    import db_operations
+    db_operations.update_call_statuses({event.call_sid: event.status for event in events})
+
+# Status callbacks are coalesced per call and applied in batches
+status_batcher = StatusBatcher(apply_call_statuses, persist_call_statuses if os.getenv("DATABASE_URL") else None)
+app.add_event_handler("shutdown", status_batcher.close)
+
+# With a database, apply schema migrations (phone_calls) on startup; set
+# RUN_MIGRATIONS=0 to manage them with `python migrations.py`
+RUN_MIGRATIONS = os.getenv("RUN_MIGRATIONS", "1") == "1"
+
+async def run_migrations():
+    if RUN_MIGRATIONS and os.getenv("DATABASE_URL"):
+        import migrations
+        await asyncio.to_thread(migrations.migrate)
+
+app.add_event_handler("startup", run_migrations)
+
+# Render the canned phrases into the TTS cache in the background on startup
+# (same as `python tts_cache.py warmup`; files already on disk are skipped)
+TTS_WARMUP_ON_STARTUP = os.getenv("TTS_WARMUP_ON_STARTUP", "1") == "1"
+
+async def warm_tts_cache():
+    if TTS_WARMUP_ON_STARTUP and tts_cache.TTS_CACHE_ENABLED and ELEVENLABS_API_KEY:
+        asyncio.get_running_loop().run_in_executor(None, tts_cache.warmup)
+
+app.add_event_handler("startup", warm_tts_cache)
+
+# Import and construct the STT/LLM clients in the background (PROVIDER_PREWARM=0 to skip)
+async def prewarm_provider_clients():
+    provider_clients.prewarm()
+
+app.add_event_handler("startup", prewarm_provider_clients)
+
+# Voice loop latency stages, in the order they happen within a turn:
+# end_of_speech    - trailing silence waited before declaring end of speech
+# stt / llm        - transcribe_audio / process_with_ai_agent
+# tts_first_byte   - first audio byte from ElevenLabs
+# tts_total        - full synthesized response
+# first_audio_sent - end of speech -> first response frame on the websocket (voice-to-voice)
+# filler_sent      - end of speech -> first filler frame, on turns slow enough to get one
+VOICE_LATENCY_STAGES = ("end_of_speech", "stt", "llm", "tts_first_byte", "tts_total", "first_audio_sent", "filler_sent")
+turn_latency = LatencyTracker(VOICE_LATENCY_STAGES)
+
+# Latency masking: when no response audio is ready this long after end of
+# speech, a short pre-rendered filler clip ("Mm-hm.") is played first and the
+# real response follows it on the stream
+FILLER_ENABLED = os.getenv("FILLER_ENABLED", "1") == "1"
+FILLER_THRESHOLD_MS = float(os.getenv("FILLER_THRESHOLD_MS", "700"))
+
+fillers_played_total = Counter("voice_fillers_played_total", "Filler clips queued to mask response latency")
+fillers_unavailable_total = Counter("voice_fillers_unavailable_total", "Slow turns with no filler clip in the TTS cache")
+
+# Speculative responses: start the LLM on a partial transcript during a pause
+# inside an utterance and use it if the final transcript matches
+SPECULATIVE_ENABLED = os.getenv("SPECULATIVE_ENABLED", "0") == "1"
+
+# Audio kept from before speech starts, so the first syllable is not clipped
+PRE_SPEECH_BUFFER_MS = 1000
+
 # Pydantic models
 class CallRequest(BaseModel):
     phone_number: str
@@ -60,6 +187,10 @@ class CallResponse(BaseModel):
     call_sid: str
     status: str
 
+class BatchCallRequest(BaseModel):
+    phone_numbers: List[str]
+    system_instructions: Optional[str] = None
+
 # ==================== SPEECH-TO-TEXT (GOOGLE) ====================
 
 async def transcribe_audio_stream(audio_stream, call_sid):
@@ -73,10 +204,13 @@ async def transcribe_audio_stream(audio_stream, call_sid):
     Returns:
         Transcription results via callback
     """
+    from google.cloud import speech
+    from google.api_core.exceptions import GoogleAPIError
+    
     try:
         # Configure audio stream for Google Speech-to-Text
         # Twilio sends audio as 8kHz mulaw, we need to specify this
-        config = RecognitionConfig(
+        config = speech.RecognitionConfig(
             encoding=speech.RecognitionConfig.AudioEncoding.MULAW,
             sample_rate_hertz=8000,
             language_code="en-US",
@@ -85,7 +219,7 @@ async def transcribe_audio_stream(audio_stream, call_sid):
             use_enhanced=True,  # Use enhanced model for better accuracy
         )
         
-        streaming_config = StreamingRecognitionConfig(
+        streaming_config = speech.StreamingRecognitionConfig(
             config=config,
             interim_results=False  # We only want final results for lower latency
         )
@@ -105,7 +239,7 @@ async def transcribe_audio_stream(audio_stream, call_sid):
                 yield speech.StreamingRecognizeRequest(audio_content=chunk)
         
         # Process audio stream with Google Speech-to-Text
-        responses = speech_client.streaming_recognize(request_generator())
+        responses = google_speech.get().streaming_recognize(request_generator())
         
         for response in responses:
             if not response.results:
@@ -119,7 +253,7 @@ async def transcribe_audio_stream(audio_stream, call_sid):
             transcript = result.alternatives[0].transcript
             
             if transcript:
-                print(f"Transcribed: {transcript}")
+                logger.info("Transcribed: %s", transcript, extra={"call_id": call_sid})
                 
                 # Process the transcript with AI
                 if call_sid in conversations:
@@ -133,24 +267,17 @@ async def transcribe_audio_stream(audio_stream, call_sid):
                     audio_content = text_to_speech(ai_response, call_sid)
                     
                     # Store in conversation history
-                    if "history" not in conversations[call_sid]:
-                        conversations[call_sid]["history"] = []
-                        
-                    conversations[call_sid]["history"].append({
-                        "human": transcript,
-                        "ai": ai_response,
-                        "timestamp": time.time()
-                    })
+                    append_history(call_sid, transcript, ai_response)
                     
                     # Send the audio to Twilio
                     conversations[call_sid]["current_response"] = ai_response
                     if audio_content:
                         conversations[call_sid]["current_audio"] = audio_content
             
-    except google.api_core.exceptions.GoogleAPIError as e:
-        print(f"Google Speech API error: {str(e)}")
+    except GoogleAPIError as e:
+        logger.error("Google Speech API error: %s", e, extra={"call_id": call_sid})
     except Exception as e:
-        print(f"Error in transcription: {str(e)}")
+        logger.error("Error in transcription: %s", e, extra={"call_id": call_sid})
 
 # ==================== AI RESPONSE GENERATION (GPT-3.5) ====================
 
@@ -180,7 +307,7 @@ def process_with_ai_agent(input_text, system_instructions=None):
         ]
         
         # Call the OpenAI API with GPT-3.5 Turbo
-        response = openai.ChatCompletion.create(
+        response = openai_client.get().ChatCompletion.create(
             model="gpt-3.5-turbo",  # Using the fastest model for low latency
             messages=messages,
             temperature=0.7,
@@ -193,9 +320,9 @@ def process_with_ai_agent(input_text, system_instructions=None):
         return output_text
         
     except Exception as e:
-        print(f"Error processing with AI agent: {str(e)}")
-        # Return a fallback response in case of error
-        return "I'm sorry, I couldn't process that properly. Could you please repeat?"
+        logger.error("Error processing with AI agent: %s", e)
+        # Return a fallback response in case of error (pre-rendered in the TTS cache)
+        return FALLBACK_RESPONSE
 
 # ==================== TEXT-TO-SPEECH (ELEVENLABS) ====================
 
@@ -203,55 +330,47 @@ def text_to_speech(text, call_sid=None):
     """
     Convert text to speech using ElevenLabs API
     
+    Short phrases are served from the TTS cache (memory, then memory-mapped
+    µ-law files on disk) and stored there after synthesis.
+    
     Args:
         text: The text to convert to speech
         call_sid: Optional call SID for tracking
         
     Returns:
-        audio_content: The generated audio content
+        audio_content: The generated audio content (bytes, or a read-only
+            memoryview for disk cache hits)
     """
+    request_started_at = time.perf_counter()
+    key = None
+    if tts_cache.TTS_CACHE_ENABLED and tts_cache.cache.cacheable(text):
+        key = tts_cache.cache_key(text, voice_id=ELEVENLABS_VOICE_ID)
+        audio_content = tts_cache.cache.get(key)
+        if audio_content is not None:
+            elapsed = time.perf_counter() - request_started_at
+            turn_latency.record("tts_first_byte", elapsed, call_sid)
+            turn_latency.record("tts_total", elapsed, call_sid)
+            logger.debug("TTS cache hit (%s bytes)", len(audio_content), extra={"call_id": call_sid})
+            return audio_content
+    
     try:
-        # ElevenLabs API endpoint
-        url = f"https://api.elevenlabs.io/v1/text-to-speech/{ELEVENLABS_VOICE_ID}/stream"
-        
-        # Request headers
-        headers = {
-            "Accept": "audio/mpeg",
-            "Content-Type": "application/json",
-            "xi-api-key": ELEVENLABS_API_KEY
-        }
-        
-        # Request body
-        data = {
-            "text": text,
-            "model_id": "eleven_monolingual_v1",
-            "voice_settings": {
-                "stability": 0.5,
-                "similarity_boost": 0.75,
-                "style": 0.0,
-                "use_speaker_boost": True
-            }
-        }
-        
-        # Make the API call
-        response = requests.post(url, json=data, headers=headers, stream=True)
-        
-        if response.status_code == 200:
-            # Collect audio data
-            audio_data = bytearray()
-            for chunk in response.iter_content(chunk_size=1024):
-                if chunk:
-                    audio_data.extend(chunk)
-            
-            print(f"Generated {len(audio_data)} bytes of audio")
-            return bytes(audio_data)
-        else:
-            print(f"Error from ElevenLabs API: {response.text}")
-            return None
-            
+        audio_content = tts_cache.synthesize(
+            text,
+            voice_id=ELEVENLABS_VOICE_ID,
+            on_first_byte=lambda: turn_latency.record("tts_first_byte", time.perf_counter() - request_started_at, call_sid)
+        )
+        turn_latency.record("tts_total", time.perf_counter() - request_started_at, call_sid)
+        logger.debug("Generated %s bytes of audio", len(audio_content), extra={"call_id": call_sid})
+    except requests.HTTPError as e:
+        logger.error("Error from ElevenLabs API: %s", e, extra={"call_id": call_sid})
+        return None
     except Exception as e:
-        print(f"Error in text-to-speech: {str(e)}")
+        logger.error("Error in text-to-speech: %s", e, extra={"call_id": call_sid})
         return None
+    
+    if key is not None and audio_content:
+        tts_cache.cache.put(key, audio_content)
+    return audio_content
 
 # ==================== CALL HANDLING ENDPOINTS ====================
 
@@ -271,6 +390,7 @@ async def handle_incoming_call(request: Request):
         """,
         "start_time": time.time()
     }
+    call_changes.changed(call_sid)
     
     # Create TwiML response
     response = VoiceResponse()
@@ -286,14 +406,14 @@ async def make_outbound_call(call_request: CallRequest, request: Request):
     """Initiate an outbound call with Twilio"""
     try:
         # Create the call
-        call = twilio_client.calls.create(
+        call = await twilio_client.create_call(
             to=call_request.phone_number,
             from_=TWILIO_PHONE_NUMBER,
             url=f"{request.base_url}outbound-call-handler",
             status_callback=f"{request.base_url}call-status"
         )
         
-        call_sid = call.sid
+        call_sid = call["sid"]
         
         # Initialize conversation state
         conversations[call_sid] = {
@@ -305,12 +425,50 @@ async def make_outbound_call(call_request: CallRequest, request: Request):
             """,
             "start_time": time.time()
         }
+        call_changes.changed(call_sid)
         
         return CallResponse(call_sid=call_sid, status="initiated")
         
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error making call: {str(e)}")
 
+@app.post("/dial-batch")
+async def dial_batch(batch_request: BatchCallRequest, request: Request):
+    """
+    Place a batch of outbound calls through the async bulk dialer
+    
+    Returns one JSON result per line (NDJSON) as each placement completes.
+    """
+    system_instructions = batch_request.system_instructions or """
+            You are a helpful AI assistant on a phone call. Keep your responses concise,
+            conversational, and natural-sounding. Your goal is to assist the caller
+            with their questions or concerns.
+            """
+    targets = [
+        {
+            "phone_number": phone_number,
+            "answer_url": f"{request.base_url}outbound-call-handler",
+            "status_callback": f"{request.base_url}call-status",
+        }
+        for phone_number in batch_request.phone_numbers
+    ]
+    logger.info("Dialing batch of %s targets", len(targets))
+    
+    async def results():
+        async for result in bulk_dialer.dial("twilio", targets):
+            call_sid = result.get("call_id")
+            if call_sid:
+                conversations[call_sid] = {
+                    "status": "initiated",
+                    "system_instructions": system_instructions,
+                    "start_time": time.time()
+                }
+                call_changes.changed(call_sid)
+            result.pop("details", None)
+            yield json.dumps(result) + "\n"
+    
+    return StreamingResponse(results(), media_type="application/x-ndjson")
+
 @app.post("/outbound-call-handler")
 async def handle_outbound_call(request: Request):
     """Handle the outbound call once it's answered"""
@@ -319,7 +477,7 @@ async def handle_outbound_call(request: Request):
     
     # Update conversation status
     if call_sid in conversations:
-        conversations[call_sid]["status"] = "in-progress"
+        set_call_status(call_sid, "in-progress")
     
     # Create TwiML response
     response = VoiceResponse()
@@ -332,36 +490,35 @@ async def handle_outbound_call(request: Request):
 
 @app.post("/call-status")
 async def handle_call_status(request: Request):
-    """Handle Twilio call status callbacks"""
+    """
+    Handle Twilio call status callbacks
+    
+    The signature is checked against the parsed body, and the transition is
+    queued for the next status batch (see twilio_callbacks.StatusBatcher).
+    """
+    body = await request.body()
     try:
-        # Get the raw body instead of parsing as form
-        body = await request.body()
-        body_str = body.decode('utf-8')
-        
-        # Parse the URL-encoded form data manually
-        form_data = {}
-        for pair in body_str.split('&'):
-            if '=' in pair:
-                key, value = pair.split('=', 1)
-                from urllib.parse import unquote_plus
-                form_data[key] = unquote_plus(value)
-        
-        call_sid = form_data.get("CallSid")
-        call_status = form_data.get("CallStatus")
-        
-        if call_sid in conversations:
-            conversations[call_sid]["status"] = call_status
-            
-            # Clean up completed calls after some time
-            if call_status in ["completed", "failed", "busy", "no-answer", "canceled"]:
-                # In a production app, you might want to store the conversation in a database
-                # before removing it from memory
-                pass
-        
-        return JSONResponse({"status": "success"})
-    except Exception as e:
-        print(f"Error handling call status: {str(e)}")
-        return JSONResponse({"status": "error", "message": str(e)})
+        pairs = parse_form(body)
+    except UnicodeDecodeError:
+        twilio_status_callbacks_total.inc(outcome="malformed")
+        raise HTTPException(status_code=400, detail="Invalid form body")
+    
+    if TWILIO_VALIDATE_SIGNATURES and not twilio_validator.validate(
+        callback_url(str(request.url)), pairs, request.headers.get("X-Twilio-Signature")
+    ):
+        twilio_status_callbacks_total.inc(outcome="invalid_signature")
+        logger.warning("Rejected status callback with an invalid signature")
+        raise HTTPException(status_code=403, detail="Invalid Twilio signature")
+    
+    try:
+        event = CallStatusEvent.from_form(dict(pairs))
+    except ValueError as e:
+        twilio_status_callbacks_total.inc(outcome="malformed")
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    status_batcher.submit(event)
+    twilio_status_callbacks_total.inc(outcome="accepted")
+    return JSONResponse({"status": "success"})
 
 # ==================== AUDIO STREAMING ENDPOINTS ====================
 
@@ -370,7 +527,7 @@ async def stream_endpoint(websocket: WebSocket, call_sid: str):
     """
     Handle bi-directional audio streaming with Twilio
     """
-    print(f"WebSocket connection established for call {call_sid}")
+    logger.info("WebSocket connection established for call %s", call_sid, extra={"call_id": call_sid})
     await websocket.accept()
     
     if call_sid not in conversations:
@@ -409,12 +566,12 @@ async def stream_endpoint(websocket: WebSocket, call_sid: str):
             if not task.done():
                 task.cancel()
                 
-        print(f"WebSocket connection closing for call {call_sid}")
+        logger.info("WebSocket connection closing for call %s", call_sid, extra={"call_id": call_sid})
             
     except Exception as e:
-        print(f"Error in stream_endpoint: {str(e)}")
+        logger.error("Error in stream_endpoint: %s", e, extra={"call_id": call_sid})
     finally:
-        print(f"WebSocket connection closed for call {call_sid}")
+        logger.info("WebSocket connection closed for call %s", call_sid, extra={"call_id": call_sid})
         if websocket.client_state != websocket.client_state.DISCONNECTED:
             await websocket.close()
 
@@ -425,9 +582,9 @@ async def send_heartbeat(websocket: WebSocket, call_sid: str, end_event: asyncio
             try:
                 # Send a minimal heartbeat every 5 seconds
                 await websocket.send_bytes(b'\x00')
-                print(f"Heartbeat sent for call {call_sid}")
+                logger.debug("Heartbeat sent for call %s", call_sid, extra={"call_id": call_sid})
             except Exception as e:
-                print(f"Error sending heartbeat: {str(e)}")
+                logger.warning("Error sending heartbeat: %s", e, extra={"call_id": call_sid})
                 # If we can't send a heartbeat, the connection might be dead
                 end_event.set()
                 break
@@ -439,13 +596,31 @@ async def send_heartbeat(websocket: WebSocket, call_sid: str, end_event: asyncio
                 # Timeout is expected, just continue
                 pass
     except Exception as e:
-        print(f"Error in heartbeat task: {str(e)}")
+        logger.error("Error in heartbeat task: %s", e, extra={"call_id": call_sid})
         end_event.set()
 
 async def send_audio(websocket: WebSocket, call_sid: str, end_event: asyncio.Event):
     """Send AI-generated audio back to Twilio"""
     try:
         while not end_event.is_set():
+            # A filler clip queued while the response is still being prepared;
+            # the response plays right after it
+            filler_audio = conversations.get(call_sid, {}).pop("filler_audio", None)
+            if filler_audio is not None:
+                filler_started_at = conversations[call_sid].get("filler_turn_started_at")
+                try:
+                    for i in range(0, len(filler_audio), 1024):
+                        if end_event.is_set():
+                            break
+                        await websocket.send_bytes(filler_audio[i:i+1024])
+                        if i == 0 and filler_started_at is not None:
+                            turn_latency.record("filler_sent", time.perf_counter() - filler_started_at, call_sid)
+                        await asyncio.sleep(0.01)
+                except Exception as e:
+                    logger.warning("Error sending filler audio: %s", e, extra={"call_id": call_sid})
+                    end_event.set()
+                    break
+            
             # Check if there's a new response to send
             if (call_sid in conversations and 
                 "current_audio" in conversations[call_sid] and
@@ -454,7 +629,7 @@ async def send_audio(websocket: WebSocket, call_sid: str, end_event: asyncio.Eve
                 audio_data = conversations[call_sid]["current_audio"]
                 
                 # Log that we're about to send audio
-                print(f"Sending {len(audio_data)} bytes of audio for call {call_sid}")
+                logger.debug("Sending %s bytes of audio for call %s", len(audio_data), call_sid, extra={"call_id": call_sid})
                 
                 try:
                     # Send the audio in chunks
@@ -466,15 +641,21 @@ async def send_audio(websocket: WebSocket, call_sid: str, end_event: asyncio.Eve
                         chunk = audio_data[i:i+chunk_size]
                         await websocket.send_bytes(chunk)
                         
+                        # Voice-to-voice latency: end of user speech -> first response frame
+                        if i == 0:
+                            turn_started_at = conversations[call_sid].pop("turn_started_at", None)
+                            if turn_started_at is not None:
+                                turn_latency.record("first_audio_sent", time.perf_counter() - turn_started_at, call_sid)
+                        
                         # Small delay between chunks to avoid overwhelming the connection
                         await asyncio.sleep(0.01)
                     
                     # Mark that we've sent at least one response
                     conversations[call_sid]["first_response_sent"] = True
-                    print(f"Audio sent successfully for call {call_sid}")
+                    logger.debug("Audio sent successfully for call %s", call_sid, extra={"call_id": call_sid})
                     
                 except Exception as e:
-                    print(f"Error sending audio: {str(e)}")
+                    logger.warning("Error sending audio: %s", e, extra={"call_id": call_sid})
                     end_event.set()
                     break
                 
@@ -483,13 +664,13 @@ async def send_audio(websocket: WebSocket, call_sid: str, end_event: asyncio.Eve
                 
                 # Go back to listening state
                 conversations[call_sid]["state"] = "LISTENING"
-                print(f"Now listening again for call {call_sid}")
+                logger.debug("Now listening again for call %s", call_sid, extra={"call_id": call_sid})
             
             # Sleep briefly to avoid tight looping
             await asyncio.sleep(0.1)
             
     except Exception as e:
-        print(f"Error in send_audio: {str(e)}")
+        logger.error("Error in send_audio: %s", e, extra={"call_id": call_sid})
         end_event.set()
 
 async def receive_audio(websocket: WebSocket, call_sid: str, end_event: asyncio.Event):
@@ -497,17 +678,15 @@ async def receive_audio(websocket: WebSocket, call_sid: str, end_event: asyncio.
     try:
         # Create a buffer for audio chunks
         audio_buffer = []
+        buffered_ms = 0.0
         
-        # Speech detection parameters
-        silence_threshold = 500
-        min_speech_duration = 5
-        end_of_speech_silence = 15
+        # Adaptive end-of-speech detection in audio milliseconds
+        endpointer = Endpointer()
         
         # State tracking
-        is_speaking = False
-        speech_chunks = 0
-        silence_chunks = 0
         last_activity_time = time.time()
+        speculation = SpeculativeTurn(on_partial=endpointer.apply_hint)
+        speculated_this_pause = False
         
         # Process incoming audio
         while not end_event.is_set():
@@ -518,62 +697,109 @@ async def receive_audio(websocket: WebSocket, call_sid: str, end_event: asyncio.
                 
                 # Add chunk to buffer
                 audio_buffer.append(message)
+                buffered_ms += frame_duration_ms(message)
                 
-                # Voice activity detection
-                audio_energy = sum(abs(b) for b in message) / len(message)
-                is_silent = audio_energy < silence_threshold
-                
-                # State machine for speech detection
-                if not is_silent:  # Speech detected
-                    silence_chunks = 0
-                    if not is_speaking:
-                        speech_chunks += 1
-                        if speech_chunks >= min_speech_duration:
-                            is_speaking = True
-                            print(f"User started speaking in call {call_sid}")
-                else:  # Silence detected
-                    if is_speaking:
-                        silence_chunks += 1
-                        if silence_chunks >= end_of_speech_silence:
-                            is_speaking = False
-                            speech_chunks = 0
-                            
-                            print(f"User finished speaking in call {call_sid}, processing speech...")
-                            
-                            # Process the complete utterance
-                            utterance_buffer = audio_buffer.copy()
-                            audio_buffer = []  # Clear buffer for next utterance
-                            
-                            # Process speech in a separate task
-                            asyncio.create_task(
-                                process_complete_utterance(utterance_buffer, call_sid)
-                            )
-                    else:
-                        speech_chunks = 0
+                event = endpointer.process(message)
+                if event == SPEECH_START:
+                    logger.debug("User started speaking in call %s", call_sid, extra={"call_id": call_sid})
+                elif event == SPEECH_END:
+                    speech_ended_at = time.perf_counter()
+                    turn_latency.record("end_of_speech", endpointer.last_silence_ms / 1000.0, call_sid)
+                    
+                    logger.debug(
+                        "User finished speaking in call %s after %.0f ms (silence timeout %.0f ms), processing speech...",
+                        call_sid, endpointer.last_utterance_ms, endpointer.last_timeout_ms, extra={"call_id": call_sid}
+                    )
+                    
+                    # Process the complete utterance
+                    utterance_buffer = audio_buffer.copy()
+                    audio_buffer = []  # Clear buffer for next utterance
+                    buffered_ms = 0.0
+                    
+                    # Process speech in a separate task
+                    asyncio.create_task(
+                        process_complete_utterance(utterance_buffer, call_sid, speech_ended_at, speculation)
+                    )
+                    speculation = SpeculativeTurn(on_partial=endpointer.apply_hint)
+                    speculated_this_pause = False
+                elif endpointer.speaking:
+                    if endpointer.silence_ms == 0:
+                        speculated_this_pause = False
+                    elif SPECULATIVE_ENABLED and not speculated_this_pause and endpointer.silence_ms >= SPECULATION_PAUSE_MS:
+                        # A pause shorter than end of speech: speculate on what was said so far
+                        speculated_this_pause = True
+                        speculative_responder.on_pause(
+                            speculation, audio_buffer, conversations.get(call_sid, {}).get("system_instructions")
+                        )
                 
-                # Prevent buffer from growing too large
-                if not is_speaking and len(audio_buffer) > 100:
-                    audio_buffer = audio_buffer[-50:]
+                # Outside speech keep only a short pre-roll of audio
+                if not endpointer.speaking and buffered_ms > 2 * PRE_SPEECH_BUFFER_MS:
+                    while audio_buffer and buffered_ms > PRE_SPEECH_BUFFER_MS:
+                        buffered_ms -= frame_duration_ms(audio_buffer.pop(0))
                     
             except asyncio.TimeoutError:
                 # Check for inactivity timeout (30 seconds)
                 if time.time() - last_activity_time > 30:
-                    print(f"Inactivity timeout for call {call_sid}")
+                    logger.info("Inactivity timeout for call %s", call_sid, extra={"call_id": call_sid})
                     end_event.set()
                     break
                 continue
                 
             except Exception as e:
-                print(f"Error receiving audio: {str(e)}")
+                logger.warning("Error receiving audio: %s", e, extra={"call_id": call_sid})
                 end_event.set()
                 break
                 
     except Exception as e:
-        print(f"Error in receive_audio: {str(e)}")
+        logger.error("Error in receive_audio: %s", e, extra={"call_id": call_sid})
         end_event.set()
 
-async def process_complete_utterance(audio_buffer, call_sid):
-    """Process a complete utterance after end-of-speech is detected"""
+def pick_filler(call_sid):
+    """
+    A pre-rendered filler clip from the TTS cache, not repeating the last one
+    played on this call, or None if none are cached
+    """
+    last_filler = conversations[call_sid].get("last_filler")
+    phrases = [phrase for phrase in tts_cache.FILLER_PHRASES if phrase != last_filler] or tts_cache.FILLER_PHRASES
+    for phrase in random.sample(phrases, len(phrases)):
+        audio = tts_cache.cache.get(tts_cache.cache_key(phrase, voice_id=ELEVENLABS_VOICE_ID))
+        if audio is not None:
+            conversations[call_sid]["last_filler"] = phrase
+            return audio
+    return None
+
+async def play_filler_if_slow(call_sid, speech_ended_at):
+    """Queue a filler clip if the turn is still processing FILLER_THRESHOLD_MS after end of speech"""
+    delay = FILLER_THRESHOLD_MS / 1000.0 - (time.perf_counter() - speech_ended_at)
+    if delay > 0:
+        await asyncio.sleep(delay)
+    
+    conversation = conversations.get(call_sid)
+    if conversation is None or conversation.get("state") != "PROCESSING" or conversation.get("current_audio") is not None:
+        return
+    
+    clip = pick_filler(call_sid)
+    if clip is None:
+        fillers_unavailable_total.inc()
+        return
+    conversation["filler_audio"] = clip
+    conversation["filler_turn_started_at"] = speech_ended_at
+    fillers_played_total.inc()
+    logger.debug("Queued filler %r for call %s", conversation["last_filler"], call_sid, extra={"call_id": call_sid})
+
+async def process_complete_utterance(audio_buffer, call_sid, speech_ended_at=None, speculation=None):
+    """
+    Process a complete utterance after end-of-speech is detected
+    
+    Args:
+        audio_buffer: List of raw audio chunks for the utterance
+        call_sid: The Twilio call SID
+        speech_ended_at: perf_counter() timestamp of end-of-speech detection,
+            used to measure voice-to-voice latency
+        speculation: SpeculativeTurn whose response is used if its partial
+            transcript matches the final one
+    """
+    filler_task = None
     try:
         # Only process if we're in LISTENING state
         if call_sid not in conversations:
@@ -581,78 +807,90 @@ async def process_complete_utterance(audio_buffer, call_sid):
             
         current_state = conversations[call_sid].get("state", "LISTENING")
         if current_state != "LISTENING":
-            print(f"Skipping processing - already in {current_state} state for call {call_sid}")
+            logger.debug("Skipping processing - already in %s state for call %s", current_state, call_sid, extra={"call_id": call_sid})
             return
             
         # Update state
         conversations[call_sid]["state"] = "PROCESSING"
         
+        if FILLER_ENABLED:
+            filler_task = asyncio.create_task(play_filler_if_slow(call_sid, speech_ended_at or time.perf_counter()))
+        
         # Transcribe the complete utterance
-        transcript = await transcribe_audio(audio_buffer, call_sid)
+        with turn_latency.span("stt", call_sid):
+            transcript = await transcribe_audio(audio_buffer, call_sid)
         
         if transcript and transcript.strip():
-            print(f"Transcribed for call {call_sid}: {transcript}")
+            logger.info("Transcribed for call %s: %s", call_sid, transcript, extra={"call_id": call_sid})
             
             # Get the system instructions
             system_instructions = conversations[call_sid].get("system_instructions")
             
-            # Process with AI
-            ai_response = process_with_ai_agent(transcript, system_instructions)
-            print(f"AI response for call {call_sid}: {ai_response}")
+            # Process with AI (blocking client calls run in threads so the
+            # filler timer and other calls' streams keep running), reusing
+            # a speculative response when it answered the same words
+            with turn_latency.span("llm", call_sid):
+                ai_response = None
+                if speculation is not None:
+                    ai_response = await speculative_responder.resolve(speculation, transcript)
+                if ai_response is None:
+                    ai_response = await asyncio.to_thread(process_with_ai_agent, transcript, system_instructions)
+            logger.info("AI response for call %s: %s", call_sid, ai_response, extra={"call_id": call_sid})
             
             # Convert AI response to speech
-            audio_content = text_to_speech(ai_response, call_sid)
+            audio_content = await asyncio.to_thread(text_to_speech, ai_response, call_sid)
             
             if audio_content:
-                print(f"Generated {len(audio_content)} bytes of audio for call {call_sid}")
+                logger.debug("Generated %s bytes of audio for call %s", len(audio_content), call_sid, extra={"call_id": call_sid})
                 
                 # Store in conversation history
-                if "history" not in conversations[call_sid]:
-                    conversations[call_sid]["history"] = []
-                    
-                conversations[call_sid]["history"].append({
-                    "human": transcript,
-                    "ai": ai_response,
-                    "timestamp": time.time()
-                })
+                append_history(call_sid, transcript, ai_response)
                 
                 # Queue the audio for sending
                 conversations[call_sid]["current_response"] = ai_response
                 conversations[call_sid]["current_audio"] = audio_content
                 conversations[call_sid]["state"] = "RESPONDING"
+                if speech_ended_at is not None:
+                    conversations[call_sid]["turn_started_at"] = speech_ended_at
             else:
-                print(f"Failed to generate audio for call {call_sid}")
+                logger.warning("Failed to generate audio for call %s", call_sid, extra={"call_id": call_sid})
                 conversations[call_sid]["state"] = "LISTENING"
         else:
-            print(f"No valid transcript for call {call_sid}")
+            logger.debug("No valid transcript for call %s", call_sid, extra={"call_id": call_sid})
             conversations[call_sid]["state"] = "LISTENING"
                 
     except Exception as e:
-        print(f"Error processing utterance for call {call_sid}: {str(e)}")
+        logger.exception("Error processing utterance for call %s: %s", call_sid, e, extra={"call_id": call_sid})
         if call_sid in conversations:
             conversations[call_sid]["state"] = "LISTENING"
+    finally:
+        if filler_task is not None:
+            filler_task.cancel()
+        if speculation is not None:
+            speculative_responder.discard(speculation)
+
+def recognize_utterance(audio_content):
+    """Blocking Google Speech-to-Text recognition of one utterance"""
+    from google.cloud import speech
+    
+    # Configure speech recognition
+    config = speech.RecognitionConfig(
+        encoding=speech.RecognitionConfig.AudioEncoding.MULAW,
+        sample_rate_hertz=8000,
+        language_code="en-US",
+        enable_automatic_punctuation=True,
+        model="phone_call",
+        use_enhanced=True,
+    )
+    audio = speech.RecognitionAudio(content=audio_content)
+    return google_speech.get().recognize(config=config, audio=audio)
 
 async def transcribe_audio(audio_buffer, call_sid):
     """Transcribe a complete audio utterance using Google Speech-to-Text"""
     try:
-        # Configure speech recognition
-        config = RecognitionConfig(
-            encoding=speech.RecognitionConfig.AudioEncoding.MULAW,
-            sample_rate_hertz=8000,
-            language_code="en-US",
-            enable_automatic_punctuation=True,
-            model="phone_call",
-            use_enhanced=True,
-        )
-        
-        # Concatenate all audio chunks
-        audio_content = b''.join(audio_buffer)
-        
-        # Create audio object
-        audio = speech.RecognitionAudio(content=audio_content)
-        
-        # Perform synchronous speech recognition
-        response = speech_client.recognize(config=config, audio=audio)
+        # Perform synchronous speech recognition in a thread, off the event
+        # loop (including the SDK import and client setup on first use)
+        response = await asyncio.to_thread(recognize_utterance, b''.join(audio_buffer))
         
         # Extract transcript
         transcript = ""
@@ -662,20 +900,108 @@ async def transcribe_audio(audio_buffer, call_sid):
         return transcript
         
     except Exception as e:
-        print(f"Error in transcription: {str(e)}")
+        logger.error("Error in transcription: %s", e, extra={"call_id": call_sid})
         return ""
 
+speculative_responder = SpeculativeResponder(
+    lambda audio_chunks: transcribe_audio(audio_chunks, None),
+    process_with_ai_agent
+)
+
 # ==================== UTILITY ENDPOINTS ====================
 
 @app.get("/calls/{call_sid}")
-async def get_call_info(call_sid: str):
-    """Get information about a specific call"""
+async def get_call_info(
+    call_sid: str,
+    request: Request,
+    fields: Optional[str] = None,
+    history_offset: int = Query(0, ge=0),
+    history_limit: Optional[int] = Query(None, ge=1, le=MAX_HISTORY_PAGE)
+):
+    """
+    Get information about a specific call
+    
+    Args:
+        fields: Comma-separated fields to return (default: all but audio)
+        history_offset: First history entry to return
+        history_limit: Maximum history entries to return; the response has
+            history_next_offset when more remain
+    
+    Responses carry an ETag; a matching If-None-Match gets 304 Not Modified.
+    """
+    conversation = conversations.get(call_sid)
+    if conversation is None:
+        raise HTTPException(status_code=404, detail="Call not found")
+    
+    if fields:
+        selected = [field.strip() for field in fields.split(",") if field.strip() and field.strip() not in HIDDEN_CALL_FIELDS]
+    else:
+        selected = [field for field in conversation if field not in HIDDEN_CALL_FIELDS]
+    
+    version = call_changes.version(call_sid)
+    if_none_match = request.headers.get("if-none-match")
+    
+    # Versioned fields only: the ETag is known up front, so a client that is
+    # up to date costs a dict lookup and no serialization
+    etag = None
+    if set(selected) <= VERSIONED_CALL_FIELDS:
+        etag = f'W/"v{version}"'
+        if if_none_match == etag:
+            return Response(status_code=304, headers={"ETag": etag})
+    
+    call_info = {"version": version}
+    for field in selected:
+        if field not in conversation:
+            continue
+        value = conversation[field]
+        if field == "history":
+            end = history_offset + history_limit if history_limit else None
+            page = value[history_offset:end]
+            call_info["history_offset"] = history_offset
+            call_info["history_total"] = len(value)
+            if end is not None and end < len(value):
+                call_info["history_next_offset"] = end
+            value = page
+        call_info[field] = value
+    
+    body = json.dumps(call_info, default=str).encode()
+    if etag is None:
+        # Unversioned working state (state, current_response, ...): hash the body
+        etag = f'W/"h{zlib.crc32(body):08x}"'
+        if if_none_match == etag:
+            return Response(status_code=304, headers={"ETag": etag})
+    return Response(content=body, media_type="application/json", headers={"ETag": etag})
+
+@app.get("/calls/{call_sid}/updates")
+async def get_call_updates(call_sid: str, since: int = 0, timeout: float = 25.0):
+    """
+    Long-poll for changes to a call
+
+    Returns as soon as the call's version is past `since` (or after `timeout`
+    seconds) with the current status and only the history entries added
+    after `since`. Pass the returned version as the next `since`.
+    """
     if call_sid not in conversations:
         raise HTTPException(status_code=404, detail="Call not found")
     
-    # Return call information (excluding binary audio data)
-    call_info = {k: v for k, v in conversations[call_sid].items() if k != "current_audio"}
-    return call_info
+    version, since = await call_changes.wait(call_sid, since, max(0.0, min(timeout, CALL_UPDATES_MAX_WAIT)))
+    conversation = conversations.get(call_sid)
+    if conversation is None:
+        raise HTTPException(status_code=404, detail="Call not found")
+    
+    history_offset = call_changes.history_index(call_sid, since)
+    status = conversation.get("status")
+    if status in FINAL_CALL_STATUSES:
+        # A poll after the feed was forgotten recreated it; let it expire again
+        call_changes.finished(call_sid)
+    return {
+        "call_sid": call_sid,
+        "version": version,
+        "status": status,
+        "history_offset": history_offset,
+        "history": conversation.get("history", [])[history_offset:],
+        "final": status in FINAL_CALL_STATUSES
+    }
 
 @app.delete("/calls/{call_sid}")
 async def end_call(call_sid: str):
@@ -685,8 +1011,8 @@ async def end_call(call_sid: str):
     
     try:
         # End the call via Twilio API
-        twilio_client.calls(call_sid).update(status="completed")
-        conversations[call_sid]["status"] = "ended"
+        await twilio_client.end_call(call_sid)
+        set_call_status(call_sid, "ended")
         return {"status": "success", "message": "Call ended"}
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error ending call: {str(e)}")
@@ -696,8 +1022,40 @@ async def health_check():
     """Health check endpoint for monitoring"""
     return {"status": "healthy", "timestamp": time.time()}
 
+@app.get("/metrics")
+async def latency_metrics(call_sid: Optional[str] = None):
+    """
+    Voice loop latency histograms (count/avg/max/p50/p95/p99 per stage)
+    
+    Args:
+        call_sid: Optional call SID to return only that call's histograms
+    """
+    if call_sid:
+        stages = turn_latency.snapshot(call_sid)
+        if stages is None:
+            raise HTTPException(status_code=404, detail="No latency data for call")
+        return {"call_sid": call_sid, "stages": stages}
+    
+    # Per-call breakdown only for calls we still hold state for
+    calls = {}
+    for sid in turn_latency.call_ids():
+        if sid in conversations:
+            calls[sid] = turn_latency.snapshot(sid)
+    
+    return {
+        "timestamp": time.time(),
+        "global": turn_latency.snapshot(),
+        "calls": calls,
+        "event_loop": loop_monitor.monitor.snapshot()["lag"] if loop_monitor.monitor.running else None
+    }
+
+@app.get("/metrics/prometheus")
+async def prometheus_metrics():
+    """Process metrics (event loop lag, blocked callbacks) in Prometheus text format"""
+    return PlainTextResponse(REGISTRY.render(), media_type=PROMETHEUS_CONTENT_TYPE)
+
 # ==================== MAIN APPLICATION ====================
 
 if __name__ == "__main__":
     # Run the FastAPI app with uvicorn
-    uvicorn.run(app, host="0.0.0.0", port=8000)
+    uvicorn.run(app, host="0.0.0.0", port=8000, log_config=None)
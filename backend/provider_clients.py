@@ -0,0 +1,87 @@
+import os
+import time
+import threading
+
+from metrics import HistogramFamily
+from log_config import get_logger
+
+logger = get_logger("provider_clients")
+
+# Build the provider clients in background threads once the server has
+# started, so the first call does not pay for SDK imports and credential
+# resolution (set to 0 to build them on first use only)
+PROVIDER_PREWARM = os.getenv("PROVIDER_PREWARM", "1") == "1"
+
+provider_client_init_seconds = HistogramFamily(
+    "provider_client_init_seconds", "Time to import and construct a provider SDK client", ("provider",)
+)
+
+class LazyClient:
+    """
+    A provider SDK client built on first use instead of at import time.
+
+    Importing the SDKs (gRPC for Google Speech, openai) and resolving
+    credentials made every process start slow, and a missing credential
+    failed the whole import. The factory now runs on the first `get()` (or
+    in a background `prewarm()`); if it fails, the error reaches only that
+    caller and the next `get()` tries again. Thread-safe: the voice loop
+    uses clients from worker threads.
+
+    Args:
+        name: Provider name for logs and metrics
+        factory: callable() -> client; import the SDK inside it
+    """
+
+    def __init__(self, name, factory):
+        self.name = name
+        self.factory = factory
+        self._client = None
+        self._lock = threading.Lock()
+
+    @property
+    def ready(self):
+        return self._client is not None
+
+    def get(self):
+        client = self._client
+        if client is None:
+            with self._lock:
+                if self._client is None:
+                    started_at = time.perf_counter()
+                    self._client = self.factory()
+                    elapsed = time.perf_counter() - started_at
+                    provider_client_init_seconds.observe(elapsed, provider=self.name)
+                    logger.info("Initialized %s client in %.0f ms", self.name, elapsed * 1000)
+                client = self._client
+        return client
+
+    def prewarm(self):
+        """Build the client in a background thread; failures are logged and retried on first use"""
+        thread = threading.Thread(target=self._prewarm, name=f"prewarm-{self.name}", daemon=True)
+        thread.start()
+        return thread
+
+    def _prewarm(self):
+        try:
+            self.get()
+        except Exception as e:
+            logger.warning("Could not pre-warm %s client: %s", self.name, e)
+
+def _google_speech_client():
+    from google.cloud import speech
+    return speech.SpeechClient()
+
+def _openai():
+    # openai 0.28 is configured at module level
+    import openai
+    openai.api_key = os.getenv("OPENAI_API_KEY")
+    return openai
+
+google_speech = LazyClient("google_speech", _google_speech_client)
+openai_client = LazyClient("openai", _openai)
+
+def prewarm(*clients):
+    """Pre-warm clients (by default all of them) unless PROVIDER_PREWARM=0"""
+    if not PROVIDER_PREWARM:
+        return []
+    return [client.prewarm() for client in clients or (google_speech, openai_client)]
@@ -0,0 +1,160 @@
+import os
+import re
+import time
+import asyncio
+import difflib
+
+from metrics import Counter, HistogramFamily
+from log_config import get_logger
+
+# Pause inside an utterance (shorter than end of speech) that triggers a
+# speculative transcription of the audio so far
+SPECULATION_PAUSE_MS = float(os.getenv("SPECULATION_PAUSE_MS", "200"))
+# Consecutive matching partial transcripts needed before the LLM is started
+SPECULATION_STABLE_PARTIALS = int(os.getenv("SPECULATION_STABLE_PARTIALS", "1"))
+# Word-level similarity at which a final transcript counts as the speculated one
+SPECULATION_MATCH_RATIO = float(os.getenv("SPECULATION_MATCH_RATIO", "0.9"))
+SPECULATION_MIN_WORDS = int(os.getenv("SPECULATION_MIN_WORDS", "1"))
+
+logger = get_logger("speculative")
+
+# hit        - final transcript matched, speculative response used
+# miss       - final transcript differed, response discarded and reissued
+# superseded - a later partial transcript replaced it before end of speech
+# unused     - the turn was dropped before the response was needed
+speculative_responses_total = Counter("speculative_responses_total", "Speculative LLM responses by outcome", ("outcome",))
+speculative_partials_total = Counter("speculative_partials_total", "Partial transcriptions run for speculation")
+speculative_head_start_seconds = HistogramFamily(
+    "speculative_head_start_seconds", "How long a used speculative response had been running at end of speech"
+)
+
+_NON_WORD = re.compile(r"[^\w\s']+")
+
+def transcript_words(transcript):
+    return _NON_WORD.sub(" ", transcript.lower()).split()
+
+def transcripts_match(speculated, final, ratio=SPECULATION_MATCH_RATIO):
+    """Whether a final transcript is (close enough to) the speculated one, ignoring case and punctuation"""
+    speculated_words = transcript_words(speculated or "")
+    final_words = transcript_words(final or "")
+    if speculated_words == final_words:
+        return True
+    if not speculated_words or not final_words:
+        return False
+    return difflib.SequenceMatcher(None, speculated_words, final_words, autojunk=False).ratio() >= ratio
+
+class SpeculativeTurn:
+    """
+    Speculation state for one utterance
+
+    Args:
+        on_partial: Optional callback given each partial transcript (e.g. the
+            endpointer's punctuation hint)
+    """
+
+    def __init__(self, on_partial=None):
+        self.on_partial = on_partial
+        self.partial = None
+        self.stable_count = 0
+        self.transcript = None
+        self.response_task = None
+        self.response_started_at = None
+        self.partial_task = None
+        self.resolved = False
+
+class SpeculativeResponder:
+    """
+    Starts the LLM on a partial transcript while the caller is still talking.
+
+    On a pause inside an utterance the audio so far is transcribed; once the
+    partial transcript is stable the response is generated in the background.
+    At end of speech `resolve` hands back that response if the final
+    transcript matches, or cancels it so the caller reissues the request.
+
+    Args:
+        transcribe: async callable(audio_chunks) -> transcript
+        respond: blocking callable(transcript, *args) -> response text,
+            run in a thread
+    """
+
+    def __init__(self, transcribe, respond, stable_partials=SPECULATION_STABLE_PARTIALS,
+                 match_ratio=SPECULATION_MATCH_RATIO, min_words=SPECULATION_MIN_WORDS):
+        self.transcribe = transcribe
+        self.respond = respond
+        self.stable_partials = stable_partials
+        self.match_ratio = match_ratio
+        self.min_words = min_words
+
+    def on_pause(self, turn, audio_chunks, *respond_args):
+        """Speculate on the audio so far (one partial transcription in flight per turn)"""
+        if turn.resolved or (turn.partial_task is not None and not turn.partial_task.done()):
+            return
+        turn.partial_task = asyncio.create_task(self._speculate(turn, list(audio_chunks), respond_args))
+
+    async def _speculate(self, turn, audio_chunks, respond_args):
+        speculative_partials_total.inc()
+        partial = await self.transcribe(audio_chunks)
+        if turn.resolved or not partial:
+            return
+        if turn.on_partial is not None:
+            turn.on_partial(partial)
+        if len(transcript_words(partial)) < self.min_words:
+            return
+
+        if turn.partial is not None and transcripts_match(turn.partial, partial, self.match_ratio):
+            turn.stable_count += 1
+        else:
+            turn.stable_count = 1
+        turn.partial = partial
+        if turn.stable_count < self.stable_partials:
+            return
+
+        if turn.response_task is not None:
+            if transcripts_match(turn.transcript, partial, self.match_ratio):
+                return
+            turn.response_task.cancel()
+            speculative_responses_total.inc(outcome="superseded")
+
+        turn.transcript = partial
+        turn.response_started_at = time.perf_counter()
+        turn.response_task = asyncio.create_task(asyncio.to_thread(self.respond, partial, *respond_args))
+        logger.debug("Speculating on partial transcript %r", partial)
+
+    async def resolve(self, turn, final_transcript):
+        """
+        The speculative response for a final transcript, or None when there is
+        none or it answered something else (it is then cancelled)
+        """
+        turn.resolved = True
+        if turn.partial_task is not None:
+            turn.partial_task.cancel()
+        task = turn.response_task
+        if task is None:
+            return None
+
+        if not transcripts_match(turn.transcript, final_transcript, self.match_ratio):
+            task.cancel()
+            speculative_responses_total.inc(outcome="miss")
+            logger.debug("Speculation missed: %r vs final %r", turn.transcript, final_transcript)
+            return None
+
+        speculative_head_start_seconds.observe(time.perf_counter() - turn.response_started_at)
+        try:
+            response = await task
+        except Exception as e:
+            logger.warning("Speculative response failed, reissuing: %s", e)
+            speculative_responses_total.inc(outcome="miss")
+            return None
+        speculative_responses_total.inc(outcome="hit")
+        return response
+
+    def discard(self, turn):
+        """Drop a turn's speculation without using it"""
+        if turn.resolved:
+            return
+        turn.resolved = True
+        if turn.partial_task is not None:
+            turn.partial_task.cancel()
+        if turn.response_task is not None:
+            turn.response_task.cancel()
+            speculative_responses_total.inc(outcome="unused")
@@ -2,6 +2,8 @@ import requests
 import json
 import time
 
+from call_updates import follow_call
+
 # Your FastAPI server URL
 API_URL = "https://1159-104-28-152-181.ngrok-free.app"
 
@@ -31,27 +33,21 @@ def make_ai_call():
         call_sid = data.get("call_sid")
         print(f"Call initiated with SID: {call_sid}")
         
-        # Monitor the call status
-        for _ in range(20):
-            time.sleep(5)
-            status_response = requests.get(f"{API_URL}/calls/{call_sid}")
-            
-            if status_response.status_code == 200:
-                status_data = status_response.json()
-                print(f"Call status: {status_data.get('status')}")
+        # Follow the call status (long-poll: each update arrives as it happens
+        # and carries only the new history entries)
+        try:
+            for update in follow_call(API_URL, call_sid, duration=100):
+                print(f"Call status: {update['status']}")
                 
-                # Print conversation history if available
-                if "history" in status_data and status_data["history"]:
+                # Print new conversation entries
+                if update["history"]:
                     print("\nConversation so far:")
-                    for entry in status_data["history"]:
+                    for entry in update["history"]:
                         print(f"Human: {entry.get('human')}")
                         print(f"AI: {entry.get('ai')}")
                         print("---")
-                
-                if status_data.get("status") in ["completed", "failed", "busy", "no-answer", "canceled", "ended"]:
-                    break
-            else:
-                print(f"Error getting call status: {status_response.text}")
+        except requests.RequestException as e:
+            print(f"Error getting call status: {e}")
         
         print("Test completed!")
     else:
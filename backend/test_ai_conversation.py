@@ -7,6 +7,8 @@ from twilio.rest import Client
 import argparse
 import sys
 
+from call_updates import follow_call
+
 # Load environment variables
 load_dotenv()
 
@@ -126,42 +128,27 @@ def make_test_call(phone_number, persona="helpful_assistant"):
         return None
 
 def monitor_call(call_sid, duration=300):
-    """Monitor the call for the specified duration (in seconds)"""
+    """Follow the call for up to the specified duration (in seconds), printing changes as they happen"""
     print_step("3", f"Monitoring call {call_sid} for {duration} seconds...")
     
-    start_time = time.time()
-    last_history_length = 0
+    history = []
+    call_status = None
     
     try:
-        while time.time() - start_time < duration:
-            # Get call status
-            status_response = requests.get(f"{API_URL}/calls/{call_sid}")
-            
-            if status_response.status_code == 200:
-                status_data = status_response.json()
-                call_status = status_data.get("status")
-                
-                # Print call status if it changed
+        # Long-polls /calls/{call_sid}/updates: returns as soon as the status
+        # changes or a new exchange is added, with only the new entries
+        for update in follow_call(API_URL, call_sid, duration):
+            if update["status"] != call_status:
+                call_status = update["status"]
                 print_info(f"Call status: {call_status}")
-                
-                # Print new conversation entries
-                if "history" in status_data and status_data["history"]:
-                    history = status_data["history"]
-                    if len(history) > last_history_length:
-                        # Print only new entries
-                        for entry in history[last_history_length:]:
-                            print_conversation(entry.get("human", ""), entry.get("ai", ""))
-                        last_history_length = len(history)
-                
-                # Exit if call is no longer active
-                if call_status in ["completed", "failed", "busy", "no-answer", "canceled", "ended"]:
-                    print_info(f"Call ended with status: {call_status}")
-                    break
-            else:
-                print_error(f"Error getting call status: {status_response.text}")
             
-            # Wait before checking again
-            time.sleep(5)
+            # Print new conversation entries
+            for entry in update["history"]:
+                print_conversation(entry.get("human", ""), entry.get("ai", ""))
+            history[update["history_offset"]:] = update["history"]
+            
+            if update["final"]:
+                print_info(f"Call ended with status: {call_status}")
             
     except KeyboardInterrupt:
         print_info("Monitoring interrupted by user")
@@ -176,20 +163,11 @@ def monitor_call(call_sid, duration=300):
     
     print_step("4", "Call monitoring completed")
     
-    # Get final call status and conversation history
-    try:
-        final_status = requests.get(f"{API_URL}/calls/{call_sid}")
-        if final_status.status_code == 200:
-            final_data = final_status.json()
-            
-            print_info("Final call status: " + final_data.get("status", "unknown"))
-            
-            if "history" in final_data and final_data["history"]:
-                print_info("Complete conversation history:")
-                for entry in final_data["history"]:
-                    print_conversation(entry.get("human", ""), entry.get("ai", ""))
-    except:
-        pass
+    print_info("Final call status: " + (call_status or "unknown"))
+    if history:
+        print_info("Complete conversation history:")
+        for entry in history:
+            print_conversation(entry.get("human", ""), entry.get("ai", ""))
 
 def main():
     """Main function to run the test"""
@@ -0,0 +1,35 @@
+import asyncio
+
+from call_updates import CallChangeFeed
+
+def test_finished_call_is_forgotten_after_retention():
+    async def scenario():
+        feed = CallChangeFeed(retain_seconds=0.05)
+        feed.changed("CA1")
+        poll = asyncio.create_task(feed.wait("CA1", 1, 5))
+        await asyncio.sleep(0)
+        feed.changed("CA1")
+        feed.finished("CA1")
+        # The final change still reaches the waiting long-poll
+        assert await poll == (2, 1)
+        assert feed.version("CA1") == 2
+        await asyncio.sleep(0.1)
+        return feed
+
+    feed = asyncio.run(scenario())
+    assert feed.version("CA1") == 0
+    assert not feed._feeds and not feed._expiries
+
+def test_finished_again_restarts_retention():
+    async def scenario():
+        feed = CallChangeFeed(retain_seconds=0.1)
+        feed.changed("CA1")
+        feed.finished("CA1")
+        await asyncio.sleep(0.06)
+        feed.finished("CA1")
+        await asyncio.sleep(0.06)
+        kept = feed.version("CA1")
+        await asyncio.sleep(0.1)
+        return kept, feed.version("CA1")
+
+    assert asyncio.run(scenario()) == (1, 0)
@@ -0,0 +1,60 @@
+import asyncio
+
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+
+from dialer import BulkDialer, VapiPlacer
+
+async def vapi_with_bad_responses():
+    async def create_call(request):
+        number = (await request.json())["customer"]["number"]
+        if number.endswith("1"):
+            return web.Response(status=201, text="<html>created</html>")
+        if number.endswith("2"):
+            return web.json_response(["no", "id"], status=201)
+        return web.json_response({"id": f"call-{number}"}, status=201)
+
+    app = web.Application()
+    app.router.add_post("/call", create_call)
+    server = TestServer(app)
+    await server.start_server()
+    return server
+
+def test_unreadable_created_response_is_a_non_retried_failure():
+    async def scenario():
+        server = await vapi_with_bad_responses()
+        placer = VapiPlacer("key", str(server.make_url("")).rstrip("/"))
+        dialer = BulkDialer([placer], limits={"vapi": {"concurrency": 5, "cps": 100}})
+        targets = [{"phone_number": f"+1555000000{i}", "instructions": "hi"} for i in range(5)]
+        try:
+            return [result async for result in dialer.dial("vapi", targets)]
+        finally:
+            await dialer.close()
+            await server.close()
+
+    results = {result["index"]: result for result in asyncio.run(scenario())}
+    assert len(results) == 5
+    for index in (1, 2):
+        assert results[index]["status"] == "failed"
+        assert results[index]["attempts"] == 1
+        assert "may have been placed" in results[index]["error"]
+    for index in (0, 3, 4):
+        assert results[index]["status"] == "placed"
+
+def test_place_one_never_raises():
+    class BrokenPlacer:
+        provider = "vapi"
+
+        async def place(self, session, target):
+            raise RuntimeError("boom")
+
+    async def scenario():
+        dialer = BulkDialer([BrokenPlacer()], limits={"vapi": {"concurrency": 1, "cps": 100}})
+        try:
+            return await dialer.place_one("vapi", 0, {"phone_number": "+15550000000"})
+        finally:
+            await dialer.close()
+
+    result = asyncio.run(scenario())
+    assert result["status"] == "failed"
+    assert "RuntimeError" in result["error"]
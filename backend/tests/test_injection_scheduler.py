@@ -0,0 +1,64 @@
+import asyncio
+
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+
+from injection_scheduler import InjectionScheduler, message_injections_total
+
+async def slow_vapi(lookup_delay):
+    async def get_call(request):
+        await asyncio.sleep(lookup_delay)
+        return web.json_response({"id": request.match_info["call_id"], "monitor": {"controlUrl": "http://control.invalid"}})
+
+    app = web.Application()
+    app.router.add_get("/call/{call_id}", get_call)
+    server = TestServer(app)
+    await server.start_server()
+    return server
+
+def test_forget_cancels_an_in_flight_lookup():
+    async def scenario():
+        server = await slow_vapi(lookup_delay=0.2)
+        details = []
+        scheduler = InjectionScheduler(
+            lambda call_id: "hello", lambda call_id, message: None, "key", str(server.make_url("")).rstrip("/"),
+            interval=1, on_call_details=lambda call_id, data: details.append(call_id)
+        )
+        cancelled_before = message_injections_total.value(outcome="cancelled")
+        try:
+            scheduler.prefetch("call-1")
+            scheduler.on_assistant_message("call-1", 1)
+            await asyncio.sleep(0.05)
+            scheduler.forget("call-1")
+            await asyncio.sleep(0.3)
+            return scheduler, details, message_injections_total.value(outcome="cancelled") - cancelled_before
+        finally:
+            await scheduler.close()
+            await server.close()
+
+    scheduler, details, cancelled = asyncio.run(scenario())
+    assert scheduler._control_urls == {}
+    assert scheduler._lookups == {}
+    assert scheduler._sending == set()
+    assert details == []
+    assert cancelled == 1
+
+def test_lookup_after_forget_keeps_its_own_slot():
+    async def scenario():
+        server = await slow_vapi(lookup_delay=0.1)
+        scheduler = InjectionScheduler(lambda call_id: "hello", lambda call_id, message: None, "key", str(server.make_url("")).rstrip("/"))
+        try:
+            scheduler.prefetch("call-1")
+            await asyncio.sleep(0.02)
+            scheduler.forget("call-1")
+            scheduler.prefetch("call-1")
+            replacement = scheduler._lookups["call-1"]
+            await asyncio.sleep(0)
+            # The cancelled lookup's cleanup must not remove the new one
+            assert scheduler._lookups.get("call-1") is replacement
+            return await replacement
+        finally:
+            await scheduler.close()
+            await server.close()
+
+    assert asyncio.run(scenario()) == "http://control.invalid"
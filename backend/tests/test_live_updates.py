@@ -0,0 +1,60 @@
+import asyncio
+
+from live_updates import LiveUpdateHub, live_update_viewers
+
+def run_on_hub(scenario):
+    async def main():
+        hub = LiveUpdateHub(queue_size=4)
+        hub.attach()
+        return await scenario(hub)
+    return asyncio.run(main())
+
+def test_dropping_an_unstarted_subscription_unregisters_the_viewer():
+    async def scenario(hub):
+        before = live_update_viewers.value()
+        subscription = hub.subscribe("call-1", [b"snapshot"])
+        assert hub.viewer_count("call-1") == 1
+        assert live_update_viewers.value() == before + 1
+        del subscription
+        return hub, before
+
+    hub, before = run_on_hub(scenario)
+    assert hub.viewer_count() == 0
+    assert live_update_viewers.value() == before
+
+def test_updates_published_before_iteration_are_delivered():
+    async def scenario(hub):
+        subscription = hub.subscribe("call-1", [b"snapshot"], heartbeat=5)
+        hub.publish("call-1", "status", {"status": "ended"})
+        frames = [await subscription.__anext__(), await subscription.__anext__()]
+        await subscription.aclose()
+        return hub, frames
+
+    hub, frames = run_on_hub(scenario)
+    assert frames[0] == b"snapshot"
+    assert b"event: status" in frames[1]
+    assert hub.viewer_count() == 0
+
+def test_aclose_before_iteration_unregisters_once():
+    async def scenario(hub):
+        before = live_update_viewers.value()
+        subscription = hub.subscribe("call-1")
+        await subscription.aclose()
+        del subscription
+        return hub, before
+
+    hub, before = run_on_hub(scenario)
+    assert hub.viewer_count() == 0
+    assert live_update_viewers.value() == before
+
+def test_viewer_that_falls_behind_is_disconnected():
+    async def scenario(hub):
+        subscription = hub.subscribe("call-1", heartbeat=5)
+        for index in range(10):
+            hub.publish("call-1", "transcript", {"index": index})
+        frames = [frame async for frame in subscription]
+        return hub, frames
+
+    hub, frames = run_on_hub(scenario)
+    assert frames == []
+    assert hub.viewer_count() == 0
@@ -0,0 +1,45 @@
+import queue
+import logging
+
+from log_config import LazyJSON, _InProcessQueueHandler
+
+def emit(msg, *args):
+    records = queue.SimpleQueue()
+    logger = logging.Logger("test")
+    logger.addHandler(_InProcessQueueHandler(records))
+    logger.info(msg, *args)
+    return records.get_nowait()
+
+def test_immutable_args_are_formatted_later():
+    record = emit("call %s took %.1f ms", "call-1", 12.5)
+    assert record.args == ("call-1", 12.5)
+    assert record.getMessage() == "call call-1 took 12.5 ms"
+
+def test_mutable_args_are_formatted_at_the_call():
+    transcript = [{"role": "user"}]
+    record = emit("transcript: %s", transcript)
+    transcript.append({"role": "assistant"})
+    assert record.args is None
+    assert record.getMessage() == "transcript: [{'role': 'user'}]"
+
+def test_lazy_json_is_dumped_at_the_call():
+    payload = {"status": "ringing"}
+    record = emit("details: %s", LazyJSON(payload))
+    payload["status"] = "completed"
+    assert record.args == ('{"status": "ringing"}',)
+    assert record.getMessage() == 'details: {"status": "ringing"}'
+
+def test_lazy_json_is_not_dumped_when_the_level_is_disabled():
+    class Payload:
+        dumped = False
+
+        def __str__(self):
+            Payload.dumped = True
+            return "payload"
+
+    records = queue.SimpleQueue()
+    logger = logging.Logger("test", level=logging.INFO)
+    logger.addHandler(_InProcessQueueHandler(records))
+    logger.debug("details: %s", LazyJSON(Payload()))
+    assert records.empty()
+    assert not Payload.dumped
@@ -0,0 +1,37 @@
+import pytest
+
+from metrics import Histogram, _percentile
+
+@pytest.mark.parametrize("n, q, index", [
+    (100, 50, 49),
+    (100, 95, 94),
+    (100, 99, 98),
+    (100, 100, 99),
+    (100, 7, 6),
+    (20, 95, 18),
+    (10, 50, 4),
+    (10, 55, 5),
+    (3, 50, 1),
+    (1, 99, 0),
+])
+def test_percentile_is_nearest_rank(n, q, index):
+    samples = list(range(n))
+    assert _percentile(samples, q) == index
+
+def test_percentile_clamps_to_the_sample_range():
+    samples = [1.0, 2.0, 3.0]
+    assert _percentile(samples, 0) == 1.0
+    assert _percentile(samples, 150) == 3.0
+
+def test_percentile_of_no_samples_is_none():
+    assert _percentile([], 95) is None
+
+def test_histogram_snapshot_percentiles():
+    histogram = Histogram(window=1000)
+    for ms in range(1, 101):
+        histogram.observe(ms / 1000.0)
+    snapshot = histogram.snapshot()
+    assert snapshot["count"] == 100
+    assert snapshot["p50"] == 0.05
+    assert snapshot["p95"] == 0.095
+    assert snapshot["p99"] == 0.099
@@ -0,0 +1,96 @@
+import os
+import asyncio
+
+from dotenv import load_dotenv
+
+from metrics import Counter, HistogramFamily
+from log_config import get_logger
+
+# Load environment variables
+load_dotenv()
+
+logger = get_logger("transcript_writer")
+
+# How often buffered in-progress transcripts are written to the database
+TRANSCRIPT_FLUSH_MS = float(os.getenv("TRANSCRIPT_FLUSH_MS", "1000"))
+
+transcript_writes_total = Counter(
+    "transcript_writes_total", "In-progress transcript updates by outcome (coalesced into flushes)", ("outcome",)
+)
+transcript_flush_seconds = HistogramFamily("transcript_flush_seconds", "Time to write one flush of buffered transcripts")
+
+class TranscriptWriter:
+    """
+    Buffers in-progress transcript writes off the webhook path.
+
+    The webhook only marks a call's transcript as changed; a single flusher
+    task writes the latest snapshot of every changed call every
+    TRANSCRIPT_FLUSH_MS in a worker thread. Messages arriving within a flush
+    window cost one upsert instead of one each, the event loop never waits
+    on the database, and because flushes run one at a time an older snapshot
+    of a call can never be committed after a newer one. When a call ends its
+    pending write is dropped: the finalization job writes the final
+    transcript. Must be used from the server's event loop.
+
+    Args:
+        write: blocking callable(call_id, transcript), e.g.
+            db_operations.update_call_transcript with the API credentials bound
+    """
+
+    def __init__(self, write, flush_interval_ms=TRANSCRIPT_FLUSH_MS):
+        self.write = write
+        self.flush_interval = flush_interval_ms / 1000.0
+        self._pending = {}
+        self._ready = None
+        self._task = None
+
+    def submit(self, call_id, transcript):
+        """Schedule a write of the call's transcript (the live list; it is copied at flush time)"""
+        transcript_writes_total.inc(outcome="coalesced" if call_id in self._pending else "submitted")
+        self._pending[call_id] = transcript
+        if self._task is None or self._task.done():
+            self._ready = asyncio.Event()
+            self._task = asyncio.create_task(self._run())
+        self._ready.set()
+
+    def discard(self, call_id):
+        """Drop a pending write for a call the finalizer now owns"""
+        if self._pending.pop(call_id, None) is not None:
+            transcript_writes_total.inc(outcome="dropped")
+
+    async def _run(self):
+        while True:
+            await self._ready.wait()
+            await asyncio.sleep(self.flush_interval)
+            self._ready.clear()
+            await self.flush()
+
+    async def flush(self):
+        """Write everything pending now"""
+        if not self._pending:
+            return
+        # Snapshot on the loop, which is the only writer of the lists
+        batch = [(call_id, list(transcript)) for call_id, transcript in self._pending.items()]
+        self._pending = {}
+
+        def write_batch():
+            for call_id, transcript in batch:
+                self.write(call_id, transcript)
+
+        with transcript_flush_seconds.time():
+            try:
+                await asyncio.to_thread(write_batch)
+            except Exception:
+                logger.exception("Error writing %s buffered transcripts", len(batch))
+        transcript_writes_total.inc(len(batch), outcome="flushed")
+
+    async def close(self):
+        """Stop the flusher and write what is still pending"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.flush()
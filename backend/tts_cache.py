@@ -0,0 +1,292 @@
+import os
+import re
+import json
+import mmap
+import time
+import hashlib
+import argparse
+import threading
+import unicodedata
+from collections import OrderedDict
+
+import requests
+from dotenv import load_dotenv
+
+from metrics import Counter, Gauge
+from log_config import get_logger
+
+# Load environment variables
+load_dotenv()
+
+logger = get_logger("tts_cache")
+
+ELEVENLABS_API_KEY = os.getenv("ELEVENLABS_API_KEY")
+ELEVENLABS_VOICE_ID = os.getenv("ELEVENLABS_VOICE_ID", "21m00Tcm4TlvDq8ikWAM")
+ELEVENLABS_BASE_URL = os.getenv("ELEVENLABS_BASE_URL", "https://api.elevenlabs.io")
+ELEVENLABS_MODEL_ID = os.getenv("ELEVENLABS_MODEL_ID", "eleven_monolingual_v1")
+# 8 kHz µ-law is what Twilio media streams play, so audio is sent as-is
+ELEVENLABS_OUTPUT_FORMAT = os.getenv("ELEVENLABS_OUTPUT_FORMAT", "ulaw_8000")
+ELEVENLABS_VOICE_SETTINGS = {
+    "stability": 0.5,
+    "similarity_boost": 0.75,
+    "style": 0.0,
+    "use_speaker_boost": True
+}
+
+TTS_CACHE_ENABLED = os.getenv("TTS_CACHE_ENABLED", "1") == "1"
+TTS_CACHE_DIR = os.getenv("TTS_CACHE_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), ".tts_cache"))
+TTS_CACHE_MEMORY_BYTES = int(os.getenv("TTS_CACHE_MEMORY_BYTES", str(32 * 1024 * 1024)))
+TTS_CACHE_DISK_BYTES = int(os.getenv("TTS_CACHE_DISK_BYTES", str(512 * 1024 * 1024)))
+# Longer responses are one-off LLM output and not worth caching
+TTS_CACHE_MAX_TEXT_CHARS = int(os.getenv("TTS_CACHE_MAX_TEXT_CHARS", "120"))
+
+# Spoken when the LLM call fails (see phone_caller.process_with_ai_agent)
+FALLBACK_RESPONSE = "I'm sorry, I couldn't process that properly. Could you please repeat?"
+
+# Phrases the voice loop says verbatim; rendered ahead of time by `warmup`
+CANNED_PHRASES = [
+    FALLBACK_RESPONSE,
+    "Hello! I'm your AI assistant. How can I help you today?",
+    "Hello! This is an AI assistant calling. How can I help you today?",
+    "Okay.",
+    "Sure.",
+    "Got it.",
+    "Thank you!",
+    "Goodbye!",
+    "Is there anything else I can help you with?",
+]
+
+# Short clips played while a slow response is prepared (phone_caller fillers);
+# only ever served from the cache, never synthesized mid-turn
+FILLER_PHRASES = [
+    "Mm-hm.",
+    "Okay, let me check.",
+    "One moment.",
+    "Let me see.",
+    "Right, just a second.",
+]
+
+tts_cache_lookups_total = Counter("tts_cache_lookups_total", "TTS cache lookups by tier that answered", ("tier",))
+tts_cache_memory_bytes = Gauge("tts_cache_memory_bytes", "Audio held by the in-memory TTS cache tier")
+
+_WHITESPACE = re.compile(r"\s+")
+
+def normalize_text(text):
+    """Text as it affects synthesis: NFC, trimmed, whitespace collapsed (case and punctuation kept)"""
+    return _WHITESPACE.sub(" ", unicodedata.normalize("NFC", text)).strip()
+
+def cache_key(text, voice_id=None, model_id=None, voice_settings=None, output_format=None):
+    """Stable key for synthesized audio: voice, model, settings, format and normalized text"""
+    material = json.dumps([
+        voice_id or ELEVENLABS_VOICE_ID,
+        model_id or ELEVENLABS_MODEL_ID,
+        voice_settings if voice_settings is not None else ELEVENLABS_VOICE_SETTINGS,
+        output_format or ELEVENLABS_OUTPUT_FORMAT,
+        normalize_text(text),
+    ], sort_keys=True)
+    return hashlib.sha256(material.encode()).hexdigest()
+
+def synthesize(text, voice_id=None, model_id=None, voice_settings=None, output_format=None, on_first_byte=None):
+    """
+    Synthesize speech with the ElevenLabs streaming API
+
+    Args:
+        on_first_byte: Optional callback run when the first audio chunk arrives
+
+    Returns:
+        bytes: The audio
+
+    Raises:
+        requests.RequestException: On connection errors or a non-200 response
+    """
+    url = f"{ELEVENLABS_BASE_URL}/v1/text-to-speech/{voice_id or ELEVENLABS_VOICE_ID}/stream"
+    headers = {
+        "Accept": "audio/basic",
+        "Content-Type": "application/json",
+        "xi-api-key": ELEVENLABS_API_KEY
+    }
+    data = {
+        "text": text,
+        "model_id": model_id or ELEVENLABS_MODEL_ID,
+        "voice_settings": voice_settings if voice_settings is not None else ELEVENLABS_VOICE_SETTINGS
+    }
+    response = requests.post(
+        url, json=data, headers=headers, stream=True,
+        params={"output_format": output_format or ELEVENLABS_OUTPUT_FORMAT}
+    )
+    if response.status_code != 200:
+        raise requests.HTTPError(f"ElevenLabs returned {response.status_code}: {response.text}", response=response)
+
+    audio = bytearray()
+    for chunk in response.iter_content(chunk_size=1024):
+        if chunk:
+            if not audio and on_first_byte is not None:
+                on_first_byte()
+            audio.extend(chunk)
+    return bytes(audio)
+
+class TTSCache:
+    """
+    Two-tier cache of synthesized audio.
+
+    The memory tier is an LRU bounded by total audio bytes. The disk tier
+    keeps one raw µ-law file per key; hits are memory-mapped, so playback
+    slices pages straight from the OS page cache instead of copying the file
+    onto the heap. Values are bytes or read-only memoryviews; both slice
+    without copying.
+    """
+
+    def __init__(self, directory=TTS_CACHE_DIR, memory_bytes=TTS_CACHE_MEMORY_BYTES,
+                 disk_bytes=TTS_CACHE_DISK_BYTES, max_text_chars=TTS_CACHE_MAX_TEXT_CHARS):
+        self.directory = directory
+        self.memory_bytes = memory_bytes
+        self.disk_bytes = disk_bytes
+        self.max_text_chars = max_text_chars
+        self._memory = OrderedDict()
+        self._memory_used = 0
+        self._writes_since_prune = 0
+        self._lock = threading.Lock()
+        tts_cache_memory_bytes.set_function(lambda: self._memory_used)
+
+    def cacheable(self, text):
+        return bool(text) and len(normalize_text(text)) <= self.max_text_chars
+
+    def _path(self, key):
+        return os.path.join(self.directory, key[:2], f"{key}.ulaw")
+
+    def _remember(self, key, audio):
+        """Insert into the memory tier, evicting least recently used entries (lock held)"""
+        previous = self._memory.pop(key, None)
+        if previous is not None:
+            self._memory_used -= len(previous)
+        if len(audio) > self.memory_bytes:
+            return
+        self._memory[key] = audio
+        self._memory_used += len(audio)
+        while self._memory_used > self.memory_bytes:
+            _, evicted = self._memory.popitem(last=False)
+            self._memory_used -= len(evicted)
+
+    def get(self, key):
+        """Cached audio for a key, or None"""
+        with self._lock:
+            audio = self._memory.get(key)
+            if audio is not None:
+                self._memory.move_to_end(key)
+                tts_cache_lookups_total.inc(tier="memory")
+                return audio
+
+        path = self._path(key)
+        try:
+            with open(path, "rb") as f:
+                mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            os.utime(path)  # Recently used files survive disk pruning
+        except (FileNotFoundError, ValueError):
+            # ValueError: empty file (a write was interrupted)
+            tts_cache_lookups_total.inc(tier="miss")
+            return None
+        except OSError as e:
+            logger.warning("Could not read cached audio %s: %s", path, e)
+            tts_cache_lookups_total.inc(tier="miss")
+            return None
+
+        audio = memoryview(mapped)
+        with self._lock:
+            self._remember(key, audio)
+        tts_cache_lookups_total.inc(tier="disk")
+        return audio
+
+    def put(self, key, audio, persist=True):
+        """Store audio in memory and, with `persist`, atomically on disk"""
+        with self._lock:
+            self._remember(key, bytes(audio))
+        if not persist:
+            return
+
+        path = self._path(key)
+        temp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(temp_path, "wb") as f:
+                f.write(audio)
+            os.replace(temp_path, path)
+        except OSError as e:
+            logger.warning("Could not write cached audio %s: %s", path, e)
+            return
+
+        self._writes_since_prune += 1
+        if self._writes_since_prune >= 100:
+            self._writes_since_prune = 0
+            self.prune_disk()
+
+    def prune_disk(self):
+        """Delete least recently used files until the disk tier fits its budget"""
+        files = []
+        total = 0
+        for root, _, names in os.walk(self.directory):
+            for name in names:
+                path = os.path.join(root, name)
+                try:
+                    stat = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                files.append((stat.st_mtime, stat.st_size, path))
+                total += stat.st_size
+        removed = 0
+        for _, size, path in sorted(files):
+            if total <= self.disk_bytes:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+            removed += 1
+        if removed:
+            logger.info("Pruned %s cached audio files from %s", removed, self.directory)
+        return removed
+
+    def stats(self):
+        with self._lock:
+            return {"memory_entries": len(self._memory), "memory_bytes": self._memory_used}
+
+cache = TTSCache()
+
+def warmup(phrases=CANNED_PHRASES + FILLER_PHRASES, voice_id=None):
+    """
+    Render phrases (by default the canned and filler phrases) into the cache
+    ahead of time, skipping ones already cached
+
+    Returns:
+        dict: Counts of phrases rendered, already cached and failed
+    """
+    summary = {"rendered": 0, "cached": 0, "failed": 0}
+    for phrase in phrases:
+        key = cache_key(phrase, voice_id=voice_id)
+        if cache.get(key) is not None:
+            summary["cached"] += 1
+            continue
+        try:
+            started_at = time.perf_counter()
+            cache.put(key, synthesize(phrase, voice_id=voice_id))
+            summary["rendered"] += 1
+            logger.info("Rendered %r in %.0f ms", phrase, (time.perf_counter() - started_at) * 1000)
+        except requests.RequestException as e:
+            summary["failed"] += 1
+            logger.warning("Could not render %r: %s", phrase, e)
+    return summary
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Manage the on-disk TTS audio cache")
+    parser.add_argument("command", choices=["warmup", "prune", "key"], nargs="?", default="warmup")
+    parser.add_argument("--phrase", action="append", help="Phrase to render (repeatable; default: the canned and filler phrases)")
+    parser.add_argument("--voice-id", help="Voice to render with (default: ELEVENLABS_VOICE_ID)")
+    args = parser.parse_args()
+
+    if args.command == "warmup":
+        print(warmup(args.phrase or CANNED_PHRASES + FILLER_PHRASES, args.voice_id))
+    elif args.command == "prune":
+        print(f"Removed {cache.prune_disk()} files")
+    elif args.command == "key":
+        for phrase in args.phrase or CANNED_PHRASES + FILLER_PHRASES:
+            print(f"{cache_key(phrase, voice_id=args.voice_id)}  {phrase}")
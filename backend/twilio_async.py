@@ -0,0 +1,166 @@
+import os
+import time
+import random
+import asyncio
+
+import aiohttp
+from dotenv import load_dotenv
+
+from metrics import Counter, HistogramFamily
+from log_config import get_logger
+from dialer import TRANSIENT_STATUSES, NOT_PROCESSED_STATUSES
+
+# Load environment variables
+load_dotenv()
+
+logger = get_logger("twilio_async")
+
+TWILIO_ACCOUNT_SID = os.getenv("TWILIO_ACCOUNT_SID")
+TWILIO_AUTH_TOKEN = os.getenv("TWILIO_AUTH_TOKEN")
+TWILIO_API_BASE_URL = os.getenv("TWILIO_API_BASE_URL", "https://api.twilio.com")
+# Per-attempt timeout for Twilio REST requests
+TWILIO_REQUEST_TIMEOUT = float(os.getenv("TWILIO_REQUEST_TIMEOUT", "10"))
+TWILIO_MAX_ATTEMPTS = int(os.getenv("TWILIO_MAX_ATTEMPTS", "3"))
+TWILIO_MAX_CONNECTIONS = int(os.getenv("TWILIO_MAX_CONNECTIONS", "20"))
+
+twilio_requests_total = Counter("twilio_requests_total", "Twilio REST requests by operation and outcome", ("operation", "outcome"))
+twilio_request_seconds = HistogramFamily("twilio_request_seconds", "Latency of a single Twilio REST request", ("operation",))
+
+class TwilioAPIError(Exception):
+    """A Twilio REST request failed (status is None for connection errors and timeouts)"""
+
+    def __init__(self, message, status=None, code=None, retry_after=None):
+        super().__init__(message)
+        self.status = status
+        self.code = code
+        self.retry_after = retry_after
+
+def calls_url(account_sid, base_url=TWILIO_API_BASE_URL, call_sid=None):
+    """URL of the Calls list resource, or of one call"""
+    url = f"{base_url}/2010-04-01/Accounts/{account_sid}/Calls"
+    return f"{url}/{call_sid}.json" if call_sid else f"{url}.json"
+
+def call_form(to, from_, url, status_callback=None):
+    """Form body for creating a call that fetches its TwiML from `url`"""
+    form = {"To": to, "From": from_, "Url": url}
+    if status_callback:
+        form["StatusCallback"] = status_callback
+    return form
+
+def _retry_after(response):
+    value = response.headers.get("Retry-After")
+    try:
+        return float(value) if value else None
+    except ValueError:
+        return None
+
+class AsyncTwilioClient:
+    """
+    The Twilio REST operations the voice server needs, without blocking the
+    event loop.
+
+    The twilio SDK's client is synchronous, so every calls.create/update from
+    a handler stalled all media streams for a full HTTP round trip. This
+    client uses one pooled aiohttp session (created lazily inside the running
+    loop), a per-attempt timeout, and jittered exponential backoff on
+    transient failures. Call creation is only retried when Twilio certainly
+    did not create the call (429/503 or a failed connection); a timeout may
+    have placed it.
+    """
+
+    def __init__(self, account_sid=TWILIO_ACCOUNT_SID, auth_token=TWILIO_AUTH_TOKEN, base_url=TWILIO_API_BASE_URL,
+                 request_timeout=TWILIO_REQUEST_TIMEOUT, max_attempts=TWILIO_MAX_ATTEMPTS,
+                 max_connections=TWILIO_MAX_CONNECTIONS):
+        self.account_sid = account_sid
+        self.auth = aiohttp.BasicAuth(account_sid or "", auth_token or "")
+        self.base_url = base_url
+        self.request_timeout = request_timeout
+        self.max_attempts = max_attempts
+        self.max_connections = max_connections
+        self._session = None
+
+    def _session_for_loop(self):
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(limit=self.max_connections, keepalive_timeout=60)
+            self._session = aiohttp.ClientSession(
+                connector=connector,
+                auth=self.auth,
+                timeout=aiohttp.ClientTimeout(total=self.request_timeout)
+            )
+        return self._session
+
+    async def close(self):
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+
+    async def _attempt(self, operation, method, url, form):
+        session = self._session_for_loop()
+        started_at = time.perf_counter()
+        try:
+            async with session.request(method, url, data=form) as response:
+                body = await response.json(content_type=None)
+                if response.status in (200, 201):
+                    return body
+                body = body if isinstance(body, dict) else {}
+                raise TwilioAPIError(
+                    f"{response.status} - {body.get('message', 'Twilio request failed')}",
+                    status=response.status,
+                    code=body.get("code"),
+                    retry_after=_retry_after(response)
+                )
+        except ValueError as e:
+            raise TwilioAPIError(f"Invalid response from Twilio: {e}") from e
+        finally:
+            twilio_request_seconds.observe(time.perf_counter() - started_at, operation=operation)
+
+    async def _request(self, operation, method, url, form, idempotent):
+        for attempt in range(1, self.max_attempts + 1):
+            try:
+                result = await self._attempt(operation, method, url, form)
+                twilio_requests_total.inc(operation=operation, outcome="ok")
+                return result
+            except TwilioAPIError as e:
+                error = e
+                transient = e.status in NOT_PROCESSED_STATUSES or (idempotent and e.status in TRANSIENT_STATUSES)
+            except aiohttp.ClientConnectorError as e:
+                error = TwilioAPIError(f"{type(e).__name__}: {e}")
+                transient = True
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                error = TwilioAPIError(f"{type(e).__name__}: {e}")
+                transient = idempotent
+
+            if not transient or attempt == self.max_attempts:
+                twilio_requests_total.inc(operation=operation, outcome="failed")
+                raise error
+            twilio_requests_total.inc(operation=operation, outcome="retried")
+            backoff = error.retry_after or (0.25 * 2 ** (attempt - 1)) * (0.5 + random.random())
+            logger.warning("Retrying Twilio %s in %.2fs: %s", operation, backoff, error)
+            await asyncio.sleep(backoff)
+
+    async def create_call(self, to, from_, url, status_callback=None):
+        """
+        Place an outbound call
+
+        Returns:
+            dict: The Twilio call resource (its `sid` identifies the call)
+
+        Raises:
+            TwilioAPIError: If Twilio rejected the call or could not be reached
+        """
+        form = call_form(to, from_, url, status_callback)
+        return await self._request("create_call", "POST", calls_url(self.account_sid, self.base_url), form, idempotent=False)
+
+    async def update_call(self, call_sid, **params):
+        """
+        Update a call, e.g. update_call(sid, status="completed") to hang up
+
+        Raises:
+            TwilioAPIError: If Twilio rejected the update or could not be reached
+        """
+        # Twilio parameters are PascalCase (status_callback -> StatusCallback)
+        form = {"".join(part[:1].upper() + part[1:] for part in key.split("_")): value for key, value in params.items()}
+        url = calls_url(self.account_sid, self.base_url, call_sid)
+        return await self._request("update_call", "POST", url, form, idempotent=True)
+
+    async def end_call(self, call_sid):
+        return await self.update_call(call_sid, status="completed")
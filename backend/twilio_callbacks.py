@@ -0,0 +1,279 @@
+import os
+import hmac
+import time
+import base64
+import asyncio
+import hashlib
+from typing import Optional
+from dataclasses import dataclass, field
+from urllib.parse import parse_qsl, unquote, urlsplit, urlunsplit
+
+from metrics import Counter, HistogramFamily
+from log_config import get_logger
+from call_updates import FINAL_CALL_STATUSES
+
+logger = get_logger("twilio_callbacks")
+
+# Reject status callbacks without a valid X-Twilio-Signature
+TWILIO_VALIDATE_SIGNATURES = os.getenv("TWILIO_VALIDATE_SIGNATURES", "1") == "1"
+# Public base URL Twilio calls (e.g. https://example.ngrok.io) when the server
+# sits behind a proxy and sees a different scheme/host than Twilio signed
+TWILIO_CALLBACK_BASE_URL = os.getenv("TWILIO_CALLBACK_BASE_URL")
+# How long status transitions are collected before they are applied together
+TWILIO_STATUS_FLUSH_MS = float(os.getenv("TWILIO_STATUS_FLUSH_MS", "50"))
+TWILIO_STATUS_MAX_BATCH = int(os.getenv("TWILIO_STATUS_MAX_BATCH", "500"))
+
+# Progress of a call through Twilio's statuses; callbacks can arrive out of
+# order, and a transition to a lower rank is stale
+STATUS_RANK = {"queued": 0, "initiated": 1, "ringing": 2, "in-progress": 3}
+STATUS_RANK.update({status: 4 for status in FINAL_CALL_STATUSES})
+
+twilio_status_callbacks_total = Counter(
+    "twilio_status_callbacks_total", "Twilio status callbacks by outcome", ("outcome",)
+)
+twilio_status_transitions_total = Counter(
+    "twilio_status_transitions_total", "Status transitions flushed, or dropped as stale/superseded", ("outcome",)
+)
+twilio_status_flush_seconds = HistogramFamily(
+    "twilio_status_flush_seconds", "Time to apply a batch of status transitions", ("sink",)
+)
+
+def parse_form(body):
+    """
+    Decode an application/x-www-form-urlencoded body once
+
+    Same result as parse_qsl(keep_blank_values=True), but every name and
+    value is percent-decoded in a single unquote() call over the NUL-joined
+    fields instead of one call per field (callbacks carry ~20 fields, most of
+    them encoded).
+
+    Returns:
+        list: (key, value) pairs in body order
+
+    Raises:
+        UnicodeDecodeError: If the body is not UTF-8
+    """
+    text = body.decode("utf-8")
+    if "\0" in text or "%00" in text:
+        # NUL is the join separator; fall back for the (never sent) encoded NUL
+        return parse_qsl(text, keep_blank_values=True)
+    fields = []
+    for pair in text.split("&"):
+        if pair:
+            key, _, value = pair.partition("=")
+            fields.append(key)
+            fields.append(value)
+    decoded = unquote("\0".join(fields).replace("+", " ")).split("\0")
+    return list(zip(decoded[0::2], decoded[1::2]))
+
+def is_stale(status, current_status):
+    """Whether moving from current_status to status would go backwards"""
+    rank = STATUS_RANK.get(status)
+    current_rank = STATUS_RANK.get(current_status)
+    return rank is not None and current_rank is not None and rank < current_rank
+
+def _int_or_none(value):
+    try:
+        return int(value) if value not in (None, "") else None
+    except ValueError:
+        return None
+
+@dataclass(frozen=True)
+class CallStatusEvent:
+    """One Twilio call status callback"""
+
+    call_sid: str
+    status: str
+    sequence_number: Optional[int] = None
+    duration: Optional[int] = None
+    direction: Optional[str] = None
+    answered_by: Optional[str] = None
+    timestamp: Optional[str] = None
+    received_at: float = field(default_factory=time.time)
+
+    @classmethod
+    def from_form(cls, form):
+        """
+        Build an event from callback parameters
+
+        Raises:
+            ValueError: If CallSid or CallStatus is missing
+        """
+        call_sid = form.get("CallSid")
+        status = form.get("CallStatus")
+        if not call_sid or not status:
+            raise ValueError("Status callback without CallSid/CallStatus")
+        return cls(
+            call_sid=call_sid,
+            status=status,
+            sequence_number=_int_or_none(form.get("SequenceNumber")),
+            duration=_int_or_none(form.get("CallDuration")),
+            direction=form.get("Direction"),
+            answered_by=form.get("AnsweredBy"),
+            timestamp=form.get("Timestamp"),
+        )
+
+    def supersedes(self, other):
+        """Whether this event is newer than `other` for the same call"""
+        if self.sequence_number is not None and other.sequence_number is not None:
+            return self.sequence_number > other.sequence_number
+        return not is_stale(self.status, other.status)
+
+def _keyed_sha1(key):
+    """SHA-1 states primed with the HMAC inner and outer padded key (RFC 2104)"""
+    block_size = hashlib.sha1().block_size
+    if len(key) > block_size:
+        key = hashlib.sha1(key).digest()
+    key = key.ljust(block_size, b"\0")
+    return hashlib.sha1(bytes(b ^ 0x36 for b in key)), hashlib.sha1(bytes(b ^ 0x5C for b in key))
+
+class SignatureValidator:
+    """
+    Checks X-Twilio-Signature: base64 HMAC-SHA1, keyed by the auth token, of
+    the full callback URL followed by each POST parameter's name and value in
+    sorted order.
+
+    The HMAC key schedule (SHA-1 states after the inner and outer padded
+    keys) is computed once per token and the hashlib states are copied per
+    request, so a check only hashes the callback itself: about twice as fast
+    as hmac.new() or hmac.HMAC.copy(), which go through the pure-Python HMAC
+    class. Several tokens (primary and secondary during a rotation) are
+    accepted.
+    """
+
+    def __init__(self, *auth_tokens):
+        self._keys = [_keyed_sha1(token.encode()) for token in auth_tokens if token]
+
+    def __bool__(self):
+        return bool(self._keys)
+
+    def _signatures(self, url, pairs):
+        payload = (url + "".join([key + value for key, value in sorted(pairs)])).encode()
+        for inner_base, outer_base in self._keys:
+            inner = inner_base.copy()
+            inner.update(payload)
+            outer = outer_base.copy()
+            outer.update(inner.digest())
+            yield base64.b64encode(outer.digest())
+
+    def validate(self, url, pairs, signature):
+        """
+        Args:
+            url: The URL Twilio requested, including any query string
+            pairs: POST parameters as (key, value) pairs
+            signature: The X-Twilio-Signature header
+        """
+        if not signature or not self._keys:
+            return False
+        expected = signature.encode()
+        # Twilio signs with the port as it appears in the configured URL, which
+        # the server cannot know, so accept the URL both with and without it
+        for candidate in _url_variants(url):
+            for computed in self._signatures(candidate, pairs):
+                if hmac.compare_digest(computed, expected):
+                    return True
+        return False
+
+def _url_variants(url):
+    yield url
+    parts = urlsplit(url)
+    default_port = {"https": 443, "http": 80}.get(parts.scheme)
+    if parts.port is not None:
+        yield urlunsplit(parts._replace(netloc=parts.netloc.rsplit(":", 1)[0]))
+    elif default_port is not None:
+        yield urlunsplit(parts._replace(netloc=f"{parts.netloc}:{default_port}"))
+
+def callback_url(request_url, base_url=TWILIO_CALLBACK_BASE_URL):
+    """The URL Twilio signed: the request URL, re-rooted at the public base URL if one is set"""
+    if not base_url:
+        return request_url
+    parts = urlsplit(request_url)
+    return base_url.rstrip("/") + urlunsplit(("", "", parts.path, parts.query, ""))
+
+class StatusBatcher:
+    """
+    Collects status transitions and applies them together.
+
+    Callbacks for the same call within a flush window are coalesced to the
+    newest (by SequenceNumber, else by status rank), then the batch is
+    handed to `apply` on the event loop (the in-memory call store) and to
+    `persist` in a worker thread (the database). A batch flushes after
+    TWILIO_STATUS_FLUSH_MS or as soon as TWILIO_STATUS_MAX_BATCH calls are
+    pending; callbacks arriving during a database write wait for the next
+    batch. Must be used from the server's event loop.
+
+    Args:
+        apply: callable(events) run on the loop
+        persist: optional blocking callable(events)
+    """
+
+    def __init__(self, apply, persist=None, flush_interval_ms=TWILIO_STATUS_FLUSH_MS, max_batch=TWILIO_STATUS_MAX_BATCH):
+        self.apply = apply
+        self.persist = persist
+        self.flush_interval = flush_interval_ms / 1000.0
+        self.max_batch = max_batch
+        self._pending = {}
+        self._ready = None
+        self._full = None
+        self._task = None
+
+    def submit(self, event):
+        current = self._pending.get(event.call_sid)
+        if current is not None:
+            if not event.supersedes(current):
+                twilio_status_transitions_total.inc(outcome="stale")
+                return
+            twilio_status_transitions_total.inc(outcome="superseded")
+        self._pending[event.call_sid] = event
+
+        if self._task is None or self._task.done():
+            self._ready = asyncio.Event()
+            self._full = asyncio.Event()
+            self._task = asyncio.create_task(self._run())
+        self._ready.set()
+        if len(self._pending) >= self.max_batch:
+            self._full.set()
+
+    async def _run(self):
+        while True:
+            await self._ready.wait()
+            if len(self._pending) < self.max_batch:
+                try:
+                    await asyncio.wait_for(self._full.wait(), self.flush_interval)
+                except asyncio.TimeoutError:
+                    pass
+            self._ready.clear()
+            self._full.clear()
+            await self.flush()
+
+    async def flush(self):
+        """Apply everything pending now"""
+        if not self._pending:
+            return
+        batch = list(self._pending.values())
+        self._pending = {}
+
+        with twilio_status_flush_seconds.time(sink="memory"):
+            try:
+                self.apply(batch)
+            except Exception:
+                logger.exception("Error applying %s status transitions", len(batch))
+        twilio_status_transitions_total.inc(len(batch), outcome="flushed")
+
+        if self.persist is not None:
+            with twilio_status_flush_seconds.time(sink="database"):
+                try:
+                    await asyncio.to_thread(self.persist, batch)
+                except Exception:
+                    logger.exception("Error persisting %s status transitions", len(batch))
+
+    async def close(self):
+        """Stop the flusher and apply what is still pending"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.flush()
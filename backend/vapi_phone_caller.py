@@ -2,10 +2,13 @@ import os
 import requests
 import json
 from dotenv import load_dotenv
+from log_config import get_logger, LazyJSON
 
 # Load environment variables
 load_dotenv()
 
+logger = get_logger("vapi_phone_caller")
+
 # Get API key from environment variables
 VAPI_API_KEY = os.getenv("VAPI_API_KEY")
 TWILIO_ACCOUNT_SID = os.getenv("TWILIO_ACCOUNT_SID")
@@ -55,8 +58,8 @@ class PhoneCaller:
             payload["assistant"]["server"]["url"] = webhook_url
             
         try:
-            # Print the request payload for debugging
-            print(f"Request payload: {json.dumps(payload, indent=2)}")
+            # Log the request payload for debugging (only serialized at DEBUG)
+            logger.debug("Request payload: %s", LazyJSON(payload, indent=2))
             
             response = requests.post(
                 self.base_url,
@@ -64,14 +67,14 @@ class PhoneCaller:
                 json=payload  # Use json parameter instead of data with json.dumps
             )
             
-            # Print the response for debugging
-            print(f"Response status code: {response.status_code}")
-            print(f"Response body: {response.text}")
+            # Log the response for debugging
+            logger.debug("Response status code: %s", response.status_code)
+            logger.debug("Response body: %s", response.text)
             
             response.raise_for_status()
             return response.json()
         except requests.exceptions.RequestException as e:
-            print(f"Error making call: {e}")
+            logger.error("Error making call: %s", e)
             return {"error": str(e)}
     
     def get_call_status(self, call_id):
@@ -92,7 +95,7 @@ class PhoneCaller:
             response.raise_for_status()
             return response.json()
         except requests.exceptions.RequestException as e:
-            print(f"Error getting call status: {e}")
+            logger.error("Error getting call status: %s", e)
             return {"error": str(e)}
     
     def end_call(self, call_id):
@@ -113,7 +116,7 @@ class PhoneCaller:
             response.raise_for_status()
             return response.json()
         except requests.exceptions.RequestException as e:
-            print(f"Error ending call: {e}")
+            logger.error("Error ending call: %s", e)
             return {"error": str(e)}
 
 
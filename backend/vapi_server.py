@@ -1,45 +1,102 @@
-from fastapi import FastAPI, Request, HTTPException, Body, BackgroundTasks
+from fastapi import FastAPI, Request, HTTPException, Body
+from fastapi.responses import PlainTextResponse, StreamingResponse
 from pydantic import BaseModel, Field
 import uvicorn
 import json
 import requests
 import os
+import time
+import asyncio
 from dotenv import load_dotenv
-import random
+import uuid
+from collections import OrderedDict
 from datetime import datetime, timezone
-from db_operations import update_call_transcript, update_call_ended
-from typing import Optional
-from call_analysis import process_transcript
+from db_operations import update_call_transcript
+from typing import Optional, List
+from metrics import REGISTRY, PROMETHEUS_CONTENT_TYPE, Counter, Gauge, HistogramFamily
+from log_config import setup_logging, get_logger, LazyJSON
+import loop_monitor
+import health_probes
+import live_updates
+from live_updates import hub as live_hub
+from dialer import BulkDialer, VapiPlacer, build_vapi_call_payload
+from injection_scheduler import InjectionScheduler
+from injection_content import ContentEngine
+from transcript_writer import TranscriptWriter
+import job_queue
+import migrations
+from job_queue import ANALYSIS_QUEUE, FINALIZE_QUEUE, DIAL_QUEUE
+from job_worker import create_worker
 
 # Load environment variables
 load_dotenv()
 
+setup_logging("vapi_server")
+logger = get_logger("vapi_server")
+
 app = FastAPI()
 
+# Event loop lag / blocking-call diagnostics (/debug/loop, enabled with LOOP_DIAGNOSTICS=1)
+loop_monitor.install(app)
+
+# Dependency probes (/health/deep): VAPI, OpenAI, database
+health_probes.install(app, health_probes.VAPI_SERVER_PROBES)
+
 # Store active calls, message counts, and control URLs
 active_calls = {}
 
+def call_snapshot(call_id):
+    """In-memory state of a call for live viewers that connect mid-call"""
+    call_state = active_calls.get(call_id)
+    if call_state is None:
+        return {"call_id": call_id, "known": call_id in ended_calls, "status": "ended" if call_id in ended_calls else None}
+    return {
+        "call_id": call_id,
+        "known": True,
+        "status": "started" if call_state.get("active") else "ended",
+        "transcript": call_state.get("transcript", []),
+    }
+
+# Live transcript/event/score stream for dashboards (GET /calls/{call_id}/stream)
+live_updates.install(app, call_snapshot)
+
+# Recently ended calls; late events for them are acknowledged but not tracked
+# so finalized state is not recreated (oldest entries are dropped first)
+ended_calls = OrderedDict()
+ENDED_CALLS_REMEMBERED = 10000
+
+# Metrics exposed on /metrics (DB write metrics are registered by db_operations)
+# Event types reported as their own label values; anything else in the
+# (unauthenticated) payload is counted as "other" so labels stay bounded
+KNOWN_WEBHOOK_EVENT_TYPES = frozenset({
+    "call-status-update", "speech-update", "user-interrupted", "conversation-update",
+    "status-update", "end-of-call-report", "transcript", "hang", "function-call", "tool-calls",
+    "assistant-request", "model-output", "voice-input", "phone-call-control", "transfer-destination-request",
+})
+
+def event_type_label(event_type):
+    if not event_type:
+        return "unknown"
+    # isinstance first: the payload may carry any JSON value, including unhashable ones
+    return event_type if isinstance(event_type, str) and event_type in KNOWN_WEBHOOK_EVENT_TYPES else "other"
+
+webhook_events_total = Counter("vapi_webhook_events_total", "Webhook events received by type", ("type",))
+webhook_handler_seconds = HistogramFamily("vapi_webhook_handler_seconds", "Webhook handler latency by event type", ("type",))
+active_calls_gauge = Gauge("vapi_active_calls", "Calls currently marked active")
+active_calls_gauge.set_function(lambda: sum(1 for call in list(active_calls.values()) if call.get("active")))
+
 # VAPI API credentials
 VAPI_API_KEY = os.getenv("VAPI_API_KEY")
-VAPI_BASE_URL = "https://api.vapi.ai"
+VAPI_BASE_URL = os.getenv("VAPI_BASE_URL", "https://api.vapi.ai")
 TWILIO_ACCOUNT_SID = os.getenv("TWILIO_ACCOUNT_SID")
 TWILIO_AUTH_TOKEN = os.getenv("TWILIO_AUTH_TOKEN")
 TWILIO_PHONE_NUMBER = os.getenv("TWILIO_PHONE_NUMBER")
 API_BASE_URL = os.getenv("API_BASE_URL")
 WEBHOOK_URL = API_BASE_URL + "/vapi-webhook"
 
-# List of strange messages to inject
-STRANGE_MESSAGES = [
-    "My skin feels like it's made of tiny ants today.",
-    "Sometimes I can taste the color blue.",
-    "The government is tracking me through my fillings.",
-    "I just remembered I left my other personality in the washing machine.",
-    "The moon landing was filmed in my basement.",
-    "My teeth are sending radio signals to Mars.",
-    "Yesterday, I saw a squirrel reading a newspaper.",
-    "The number 7 has been following me all week.",
-    "I'm actually three raccoons in a human costume."
-]
+# Run job queue workers inside this process; set to 0 when running
+# `python job_worker.py` as separate worker processes instead
+JOB_WORKERS_EMBEDDED = os.getenv("JOB_WORKERS_EMBEDDED", "1") == "1"
 
 # Define request model for the new endpoint
 class CallRequest(BaseModel):
@@ -48,86 +105,140 @@ class CallRequest(BaseModel):
     first_message: Optional[str] = Field("Hello", description="First message the assistant will say")
     voice_id: Optional[str] = Field("alloy", description="OpenAI voice ID to use")
     webhook_url: Optional[str] = Field(WEBHOOK_URL, description="Webhook URL to receive call status updates")
+    scenario: Optional[str] = Field(None, description="Scenario for choosing injected messages (sent as call metadata)")
 
-def get_call_details(call_id):
-    """Get call details from VAPI API to extract control URL"""
-    try:
-        headers = {
-            "Authorization": f"Bearer {VAPI_API_KEY}",
-            "Content-Type": "application/json"
-        }
-        
-        response = requests.get(
-            f"{VAPI_BASE_URL}/call/{call_id}",
-            headers=headers
-        )
-        
-        if response.status_code == 200:
-            call_data = response.json()
-            print(f"Call details: {json.dumps(call_data, indent=2)}")
-            
-            # Extract control URL from the monitor object
-            monitor = call_data.get("monitor", {})
-            control_url = monitor.get("controlUrl")
-            
-            if control_url:
-                print(f"Found control URL: {control_url}")
-                return control_url
-            else:
-                print("No control URL found in call details")
-                return None
-        else:
-            print(f"Failed to get call details: {response.status_code} - {response.text}")
-            return None
-    except Exception as e:
-        print(f"Error getting call details: {str(e)}")
-        return None
+class BatchCallTarget(BaseModel):
+    phone_number: str = Field(..., description="Phone number to call in E.164 format")
+    instructions: Optional[str] = Field(None, description="Per-target instructions (defaults to the batch instructions)")
+    first_message: Optional[str] = Field(None, description="Per-target first message")
+    scenario: Optional[str] = Field(None, description="Per-target scenario (defaults to the batch scenario)")
 
-def send_message_to_call(call_id, message):
-    """Send a message to an active call using the control URL"""
-    try:
-        # Get the control URL for this call
-        if call_id not in active_calls or "control_url" not in active_calls[call_id]:
-            print(f"No control URL found for call {call_id}. Fetching from API...")
-            control_url = get_call_details(call_id)
-            
-            if control_url:
-                if call_id not in active_calls:
-                    active_calls[call_id] = {"active": True, "message_count": 0}
-                active_calls[call_id]["control_url"] = control_url
-            else:
-                print(f"Error: Could not get control URL for call {call_id}")
-                return False
-        
-        control_url = active_calls[call_id]["control_url"]
-        
-        # Prepare the payload for the control URL
-        payload = {
-            "type": "say",
-            "message": message
-        }
-        
-        # Send the request to the control URL
-        response = requests.post(
-            control_url,
-            headers={"Content-Type": "application/json"},
-            json=payload
-        )
-        
-        print(f"Injected message to call {call_id}: '{message}'")
-        print(f"Response: {response.status_code} - {response.text}")
-        
-        return response.status_code == 200
-    except Exception as e:
-        print(f"Error sending message to call: {str(e)}")
-        return False
+class BatchCallRequest(BaseModel):
+    targets: List[BatchCallTarget] = Field(..., description="Numbers to dial")
+    instructions: str = Field(..., description="Instructions for the AI assistant")
+    first_message: Optional[str] = Field("Hello", description="First message the assistant will say")
+    voice_id: Optional[str] = Field("alloy", description="OpenAI voice ID to use")
+    webhook_url: Optional[str] = Field(WEBHOOK_URL, description="Webhook URL to receive call status updates")
+    scenario: Optional[str] = Field(None, description="Scenario for choosing injected messages")
+    batch_id: Optional[str] = Field(None, description="Client batch ID; re-submitting the same batch to /dial-queue does not dial twice")
+
+# Bulk dialer for campaigns (concurrency/CPS limits from DIALER_VAPI_* env vars)
+bulk_dialer = BulkDialer([VapiPlacer(VAPI_API_KEY, VAPI_BASE_URL)])
+app.add_event_handler("shutdown", bulk_dialer.close)
+
+# Durable job queue for analysis, end-of-call finalization and queued dialing
+job_worker = create_worker() if JOB_WORKERS_EMBEDDED else None
+
+# Apply schema migrations on startup (set RUN_MIGRATIONS=0 to manage them with `python migrations.py`)
+RUN_MIGRATIONS = os.getenv("RUN_MIGRATIONS", "1") == "1"
+
+async def start_job_workers():
+    # In threads: migrate() may wait on the advisory lock while another replica migrates
+    if RUN_MIGRATIONS:
+        await asyncio.to_thread(migrations.migrate)
+    await asyncio.to_thread(migrations.schedule_maintenance)
+    if job_worker is not None:
+        job_worker.start()
+
+async def stop_job_workers():
+    if job_worker is not None:
+        # Let in-flight jobs finish; anything left is reclaimed after its visibility timeout
+        await asyncio.to_thread(job_worker.stop)
+
+app.add_event_handler("startup", start_job_workers)
+app.add_event_handler("shutdown", stop_job_workers)
+
+# Queued/running job counts per queue on /metrics (jobs_in_queue)
+queue_depth_monitor = job_queue.QueueDepthMonitor()
+app.add_event_handler("startup", queue_depth_monitor.start)
+app.add_event_handler("shutdown", queue_depth_monitor.stop)
+
+# In-progress transcripts are written in coalesced batches off the event loop
+# (every TRANSCRIPT_FLUSH_MS); the finalization job writes ended calls
+transcript_writer = TranscriptWriter(
+    lambda call_id, transcript: update_call_transcript(call_id, transcript, VAPI_API_KEY, VAPI_BASE_URL)
+)
+app.add_event_handler("shutdown", transcript_writer.close)
+
+async def queue_transcript_analysis(call_id):
+    """Enqueue an analysis of the call's current transcript (once per transcript length)"""
+    # Copied here: the INSERT serializes it in a thread while the loop appends
+    transcript = list(active_calls[call_id]["transcript"])
+    await job_queue.enqueue_async(
+        ANALYSIS_QUEUE,
+        {
+            "call_id": call_id,
+            "transcript": transcript,
+            "call_start_time": active_calls[call_id].get("start_time", datetime.now(timezone.utc).isoformat()),
+            "message_count": active_calls[call_id].get("message_count", 0)
+        },
+        idempotency_key=f"analysis:{call_id}:{len(transcript)}"
+    )
+
+async def finalize_ended_call(call_id):
+    """
+    Hand an ended call to the finalization pipeline: snapshot its transcript,
+    enqueue the finalize job and evict its in-memory state
+    """
+    call_state = active_calls.pop(call_id, None)
+    transcript_writer.discard(call_id)
+    ended_calls[call_id] = True
+    while len(ended_calls) > ENDED_CALLS_REMEMBERED:
+        ended_calls.popitem(last=False)
+
+    await job_queue.enqueue_async(
+        FINALIZE_QUEUE,
+        {
+            "call_id": call_id,
+            "transcript": call_state.get("transcript") if call_state else None,
+            "ended_at": datetime.now(timezone.utc).isoformat()
+        },
+        idempotency_key=f"finalize:{call_id}"
+    )
+
+def append_transcript(call_id, role, message):
+    """Append a message to the in-memory transcript and push it to live viewers"""
+    transcript = active_calls[call_id].setdefault("transcript", [])
+    entry = {
+        "role": role,
+        "message": message,
+        "timestamp": datetime.now(timezone.utc).isoformat()
+    }
+    transcript.append(entry)
+    live_hub.publish(call_id, "transcript", dict(entry, index=len(transcript) - 1))
+    return entry
+
+def record_injection(call_id, message):
+    """
+    Add an injected message to the transcript once the control URL accepted
+    it and schedule the transcript write
+    """
+    if call_id in active_calls:
+        append_transcript(call_id, "system_injection", message)
+        transcript_writer.submit(call_id, active_calls[call_id]["transcript"])
+
+# Injection content: per-persona/scenario message pools loaded at startup
+# (see injection_content for the sources and LLM pre-generation)
+content_engine = ContentEngine()
+
+# Message injection (interval from INTERVAL_OF_WEIRD_MESSAGES); control URL
+# commands are sent in the background so the webhook never waits on them
+injection_scheduler = InjectionScheduler(
+    content_engine.choose, record_injection, VAPI_API_KEY, VAPI_BASE_URL,
+    on_call_details=content_engine.assign_from_call
+)
+app.add_event_handler("startup", content_engine.start)
+app.add_event_handler("shutdown", injection_scheduler.close)
+app.add_event_handler("shutdown", content_engine.close)
 
 @app.post("/vapi-webhook")
-async def vapi_webhook(request: Request, background_tasks: BackgroundTasks):
+async def vapi_webhook(request: Request):
     """
     Webhook endpoint to receive VAPI call status updates and inject messages
-    after every 3rd assistant response
+    after every Nth assistant response (INTERVAL_OF_WEIRD_MESSAGES)
     """
+    started_at = time.perf_counter()
+    event_type = None
 
     try:
         # Get the JSON payload from the request
@@ -138,6 +249,7 @@ async def vapi_webhook(request: Request, background_tasks: BackgroundTasks):
         
         # Extract event type from the message object
         event_type = message_obj.get("type")
+        webhook_events_total.inc(type=event_type_label(event_type))
         
         # Extract call ID from the message object
         call_temp = message_obj.get("call")
@@ -145,46 +257,43 @@ async def vapi_webhook(request: Request, background_tasks: BackgroundTasks):
         if not call_id:
             return {"status": "error", "message": "No call_id in payload"}
             
-        print(f"Received {event_type} event for call {call_id}")
+        logger.debug("Received %s event for call %s", event_type, call_id, extra={"call_id": call_id, "event_type": event_type})
+        
+        if call_id in ended_calls:
+            return {"status": "success", "message": f"Ignored {event_type} event for ended call"}
+        
+        is_end_event = event_type == "call-status-update" and message_obj.get("status") == "ended"
         
         # Initialize call tracking if not exists
-        if call_id and call_id not in active_calls:
+        if call_id and call_id not in active_calls and not is_end_event:
             active_calls[call_id] = {
                 "active": True,
                 "message_count": 0,
                 "transcript": []  # Initialize empty transcript
             }
             
-            # Get call details to extract control URL
-            control_url = get_call_details(call_id)
-            if control_url:
-                active_calls[call_id]["control_url"] = control_url
+            # Look up the control URL in the background
+            injection_scheduler.prefetch(call_id)
         
         # Handle different event types
         if event_type == "call-status-update" and message_obj.get("status") == "started":
-            print(f"📞 CALL STARTED: Call {call_id} has started")
+            logger.info("📞 CALL STARTED: Call %s has started", call_id, extra={"call_id": call_id})
             active_calls[call_id]["active"] = True
             active_calls[call_id]["message_count"] = 0
             active_calls[call_id]["transcript"] = []  # Reset transcript
+            live_hub.publish(call_id, "status", {"call_id": call_id, "status": "started"})
             
-            # If we don't have a control URL yet, get it now
-            if "control_url" not in active_calls[call_id]:
-                control_url = get_call_details(call_id)
-                if control_url:
-                    active_calls[call_id]["control_url"] = control_url
+            # If we don't have a control URL yet, look it up now
+            injection_scheduler.prefetch(call_id)
             
-        elif event_type == "call-status-update" and message_obj.get("status") == "ended":
-            print(f"📞 CALL ENDED: Call {call_id} has ended")
-            if call_id in active_calls:
-                active_calls[call_id]["active"] = False
-                
-                # Update database with final transcript and ended status
-                if "transcript" in active_calls[call_id]:
-                    # First update transcript
-                    update_call_transcript(call_id, active_calls[call_id]["transcript"], VAPI_API_KEY, VAPI_BASE_URL)
-                    
-                    # Then update status to ended
-                    update_call_ended(call_id)
+        elif is_end_event:
+            logger.info("📞 CALL ENDED: Call %s has ended", call_id, extra={"call_id": call_id})
+            # Only acknowledge here; the transcript flush, duration, recording
+            # URL, scoring and aggregates run in the finalization pipeline
+            await finalize_ended_call(call_id)
+            injection_scheduler.forget(call_id)
+            content_engine.release(call_id)
+            live_hub.publish(call_id, "status", {"call_id": call_id, "status": "ended"})
         
         # Handle user messages
         elif event_type == "speech-update" or event_type == "user-interrupted":
@@ -205,7 +314,7 @@ async def vapi_webhook(request: Request, background_tasks: BackgroundTasks):
                 # For user-interrupted events, the text is directly in the message_obj
                 user_message = message_obj.get("text", "")
                 
-            print(f"👤 USER: {user_message}")
+            logger.debug("👤 USER: %s", user_message, extra={"call_id": call_id})
             
             # Add to transcript (only if it's not a duplicate)
             if call_id in active_calls:
@@ -220,29 +329,19 @@ async def vapi_webhook(request: Request, background_tasks: BackgroundTasks):
                         if msg.get("role") == "user":
                             if msg.get("message") == user_message:
                                 is_duplicate = True
-                                print("Skipping duplicate user message")
+                                logger.debug("Skipping duplicate user message", extra={"call_id": call_id})
                             break  # Stop after finding the last user message
                 
                 # Only add if not a duplicate and not empty
                 if not is_duplicate and user_message.strip():
                     # Add the user message to the transcript
-                    active_calls[call_id]["transcript"].append({
-                        "role": "user",
-                        "message": user_message,
-                        "timestamp": datetime.now(timezone.utc).isoformat()
-                    })
+                    append_transcript(call_id, "user", user_message)
                     
-                    # Update transcript in database
-                    update_call_transcript(call_id, active_calls[call_id]["transcript"], VAPI_API_KEY, VAPI_BASE_URL)
+                    # Schedule the transcript write (flushed in the background)
+                    transcript_writer.submit(call_id, active_calls[call_id]["transcript"])
                     transcript_length = len(active_calls[call_id]["transcript"])
                     if transcript_length % 3 == 0:
-                        background_tasks.add_task(
-                            process_transcript,
-                            call_id,
-                            active_calls[call_id]["transcript"],
-                            active_calls[call_id].get("start_time", datetime.now(timezone.utc).isoformat()),
-                            active_calls[call_id].get("message_count", 0)
-                        )
+                        await queue_transcript_analysis(call_id)
                     
         
         # Handle conversation updates (when assistant speaks)
@@ -254,62 +353,33 @@ async def vapi_webhook(request: Request, background_tasks: BackgroundTasks):
                 last_message = messages[-1]
                 if last_message.get("role") == "bot":
                     assistant_message = last_message.get("message", "")
-                    print(f"🤖 ASSISTANT: {assistant_message}")
+                    logger.debug("🤖 ASSISTANT: %s", assistant_message, extra={"call_id": call_id})
                     
                     # Add to transcript
                     if call_id in active_calls:
-                        if "transcript" not in active_calls[call_id]:
-                            active_calls[call_id]["transcript"] = []
-                        
-                        active_calls[call_id]["transcript"].append({
-                            "role": "assistant",
-                            "message": assistant_message,
-                            "timestamp": datetime.now(timezone.utc).isoformat()
-                        })
+                        append_transcript(call_id, "assistant", assistant_message)
                         
-                        # Update transcript in database
-                        update_call_transcript(call_id, active_calls[call_id]["transcript"], VAPI_API_KEY, VAPI_BASE_URL)
+                        # Schedule the transcript write (flushed in the background)
+                        transcript_writer.submit(call_id, active_calls[call_id]["transcript"])
                         transcript_length = len(active_calls[call_id]["transcript"])
                         if transcript_length % 3 == 0:
-                            background_tasks.add_task(
-                                process_transcript,
-                                call_id,
-                                active_calls[call_id]["transcript"],
-                                active_calls[call_id].get("start_time", datetime.now(timezone.utc).isoformat()),
-                                active_calls[call_id].get("message_count", 0)
-                            )
+                            await queue_transcript_analysis(call_id)
                     
                     # Increment message count for this call
                     if call_id in active_calls and active_calls[call_id].get("active", False):
                         active_calls[call_id]["message_count"] = active_calls[call_id].get("message_count", 0) + 1
                         current_count = active_calls[call_id]["message_count"]
-                        print(f"Message count for call {call_id}: {current_count}")
+                        logger.debug("Message count for call %s: %s", call_id, current_count, extra={"call_id": call_id})
                         
-                        interval_of_weird_messages = int(os.getenv("INTERVAL_OF_WEIRD_MESSAGES"))
-                        # Check if it's time to inject a strange message (after every 3rd message)
-                        if current_count % int(interval_of_weird_messages) == 0:
-                            print(f"Attempting to inject strange message after message #{current_count}")
-                            strange_message = random.choice(STRANGE_MESSAGES)
-                            success = send_message_to_call(call_id, strange_message)
-                            print(f"Message injection success: {success}")
-                            
-                            # Add injected message to transcript
-                            if success:
-                                active_calls[call_id]["transcript"].append({
-                                    "role": "system_injection",
-                                    "message": strange_message,
-                                    "timestamp": datetime.now(timezone.utc).isoformat()
-                                })
-                                
-                                # Update transcript in database with the injected message
-                                update_call_transcript(call_id, active_calls[call_id]["transcript"], VAPI_API_KEY, VAPI_BASE_URL)
+                        # Schedule a strange message if one is due (sent in the background)
+                        injection_scheduler.on_assistant_message(call_id, current_count)
         return {"status": "success", "message": f"Processed {event_type} event"}
         
     except Exception as e:
-        print(f"Error processing webhook: {str(e)}")
-        import traceback
-        traceback.print_exc()
+        logger.exception("Error processing webhook: %s", e)
         raise HTTPException(status_code=500, detail=str(e))
+    finally:
+        webhook_handler_seconds.observe(time.perf_counter() - started_at, type=event_type_label(event_type))
 
 @app.post("/make-call")
 async def make_call(request: CallRequest):
@@ -323,45 +393,19 @@ async def make_call(request: CallRequest):
         dict: Response with call details
     """
     try:
-        # Ensure phone number is in E.164 format
-        phone_number = request.phone_number
-        if not phone_number.startswith('+'):
-            phone_number = '+' + phone_number
-            
-        # Configure the assistant
-        assistant_config = {
-            "firstMessage": request.first_message,
-            "voice": {
-                "provider": "openai",
-                "voiceId": request.voice_id
-            },
-            "model": {
-                "provider": "openai",
-                "model": "gpt-4o",
-                "systemPrompt": request.instructions
-            }
-        }
-        
         # Set webhook URL if provided, otherwise use the default
         webhook_url = request.webhook_url or os.getenv("API_BASE_URL")
-        if webhook_url:
-            if "server" not in assistant_config:
-                assistant_config["server"] = {}
-            assistant_config["server"]["url"] = webhook_url
         
-        # Create the payload for VAPI API
-        payload = {
-            "type": "outboundPhoneCall",
-            "customer": {
-                "number": phone_number
-            },
-            "phoneNumber": {
-                "twilioPhoneNumber": TWILIO_PHONE_NUMBER,
-                "twilioAccountSid": TWILIO_ACCOUNT_SID,
-                "twilioAuthToken": TWILIO_AUTH_TOKEN
-            },
-            "assistant": assistant_config
-        }
+        # Create the payload for VAPI API (phone number normalized to E.164)
+        payload = build_vapi_call_payload(
+            request.phone_number,
+            request.instructions,
+            request.first_message,
+            request.voice_id,
+            webhook_url,
+            request.scenario
+        )
+        phone_number = payload["customer"]["number"]
         
         # Make the API call to VAPI
         headers = {
@@ -369,8 +413,8 @@ async def make_call(request: CallRequest):
             "Content-Type": "application/json"
         }
         
-        print(f"Making call to {phone_number} with instructions: {request.instructions}")
-        print(f"Request payload: {json.dumps(payload, indent=2)}")
+        logger.info("Making call to %s", phone_number)
+        logger.debug("Request payload: %s", LazyJSON(payload))
         
         response = requests.post(
             f"{VAPI_BASE_URL}/call",
@@ -383,8 +427,8 @@ async def make_call(request: CallRequest):
             result = response.json()
             call_id = result.get("id")
             
-            print(f"Call initiated successfully with ID: {call_id}")
-            print(f"Response: {json.dumps(result, indent=2)}")
+            logger.info("Call initiated successfully with ID: %s", call_id, extra={"call_id": call_id})
+            logger.debug("Response: %s", LazyJSON(result), extra={"call_id": call_id})
             
             # Initialize call tracking
             if call_id:
@@ -404,7 +448,7 @@ async def make_call(request: CallRequest):
             }
         else:
             error_message = f"Failed to initiate call: {response.status_code} - {response.text}"
-            print(error_message)
+            logger.error(error_message)
             return {
                 "success": False,
                 "message": error_message
@@ -412,11 +456,113 @@ async def make_call(request: CallRequest):
             
     except Exception as e:
         error_message = f"Error making call: {str(e)}"
-        print(error_message)
-        import traceback
-        traceback.print_exc()
+        logger.exception(error_message)
         raise HTTPException(status_code=500, detail=error_message)
 
+@app.post("/dial-batch")
+async def dial_batch(request: BatchCallRequest):
+    """
+    Place a batch of outbound calls through the async bulk dialer
+    
+    Args:
+        request: BatchCallRequest with the targets and shared assistant settings
+        
+    Returns:
+        StreamingResponse: one JSON result per line (NDJSON) as each placement completes
+    """
+    targets = [
+        {
+            "phone_number": target.phone_number,
+            "instructions": target.instructions or request.instructions,
+            "first_message": target.first_message or request.first_message,
+            "voice_id": request.voice_id,
+            "webhook_url": request.webhook_url or os.getenv("API_BASE_URL"),
+            "scenario": target.scenario or request.scenario,
+        }
+        for target in request.targets
+    ]
+    logger.info("Dialing batch of %s targets", len(targets))
+    
+    async def results():
+        async for result in bulk_dialer.dial("vapi", targets):
+            call_id = result.get("call_id")
+            if call_id:
+                target = targets[result["index"]]
+                active_calls[call_id] = {
+                    "active": True,
+                    "message_count": 0,
+                    "transcript": [],
+                    "phone_number": target["phone_number"],
+                    "instructions": target["instructions"]
+                }
+            result.pop("details", None)
+            yield json.dumps(result) + "\n"
+    
+    return StreamingResponse(results(), media_type="application/x-ndjson")
+
+@app.post("/dial-queue")
+async def dial_queue(request: BatchCallRequest):
+    """
+    Queue a batch of outbound calls as durable dial jobs
+    
+    Unlike /dial-batch the calls survive a server restart and are placed by
+    job workers. Each target is keyed by batch ID and position, so posting
+    the same batch again only queues targets that were not queued before.
+    
+    Args:
+        request: BatchCallRequest with the targets and shared assistant settings
+        
+    Returns:
+        dict: The batch ID and the job ID queued for each target
+    """
+    batch_id = request.batch_id or str(uuid.uuid4())
+    jobs = [
+        (
+            {
+                "provider": "vapi",
+                "index": index,
+                "target": {
+                    "phone_number": target.phone_number,
+                    "instructions": target.instructions or request.instructions,
+                    "first_message": target.first_message or request.first_message,
+                    "voice_id": request.voice_id,
+                    "webhook_url": request.webhook_url or os.getenv("API_BASE_URL"),
+                    "scenario": target.scenario or request.scenario,
+                },
+            },
+            f"dial:{batch_id}:{index}",
+        )
+        for index, target in enumerate(request.targets)
+    ]
+    # One transaction for the whole batch, in a thread so webhooks keep flowing.
+    # Single attempt: a failed run may still have placed the call, so
+    # re-running the job could dial the number twice
+    job_ids = await asyncio.to_thread(job_queue.enqueue_many, DIAL_QUEUE, jobs, max_attempts=1)
+    queued = [
+        {"index": index, "phone_number": target.phone_number, "job_id": job_id}
+        for index, (target, job_id) in enumerate(zip(request.targets, job_ids))
+    ]
+    logger.info("Queued dial batch %s with %s targets", batch_id, len(queued))
+    return {"batch_id": batch_id, "jobs": queued}
+
+@app.get("/jobs/stats")
+async def jobs_stats():
+    """Job counts by queue and status"""
+    return await asyncio.to_thread(job_queue.queue_stats)
+
+@app.get("/jobs/{job_id}")
+async def get_job(job_id: str):
+    """Status, attempts and last error of a queued job"""
+    job = await asyncio.to_thread(job_queue.get_job, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Job {job_id} not found")
+    return job
+
+@app.get("/metrics")
+async def metrics():
+    """Prometheus-style metrics for webhook throughput, DB/VAPI latency and call load"""
+    return PlainTextResponse(REGISTRY.render(), media_type=PROMETHEUS_CONTENT_TYPE)
+
 if __name__ == "__main__":
     # Run the FastAPI server
-    uvicorn.run(app, host="0.0.0.0", port=8000) 
\ No newline at end of file
+    uvicorn.run(app, host="0.0.0.0", port=8000, log_config=None) 
\ No newline at end of file
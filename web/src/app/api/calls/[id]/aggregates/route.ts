@@ -0,0 +1,29 @@
+import { NextRequest, NextResponse } from 'next/server';
+import { db, takeUnique } from '@/lib/db/client';
+import { eq } from 'drizzle-orm';
+import { callAggregateTable } from '@/lib/db/callAggregate.db';
+
+export async function GET(
+  _: NextRequest,
+  { params }: { params: Promise<{ id: string }> }
+) {
+  try {
+    const callId = (await params).id;
+
+    // Single-row lookup of the precomputed aggregates for the call
+    const aggregates = await db
+      .select()
+      .from(callAggregateTable)
+      .where(eq(callAggregateTable.call_id, callId))
+      .limit(1)
+      .then(takeUnique);
+
+    return NextResponse.json(aggregates ?? null, { status: 200 });
+  } catch (error) {
+    console.error('Error fetching aggregates:', error);
+    return NextResponse.json(
+      { error: 'Failed to fetch aggregates' },
+      { status: 500 }
+    );
+  }
+}
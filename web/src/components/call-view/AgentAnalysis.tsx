@@ -1,27 +1,26 @@
 import { AreaChart } from '@/components/ui/areachart';
 import { Card, CardContent, CardHeader, CardTitle } from '@/components/ui/card';
-import { useCallScores } from '@/query/score.query';
+import { useCallAggregates } from '@/query/aggregate.query';
 import { RiBarChartBoxLine } from '@remixicon/react';
 import React from 'react';
 
 export function AgentAnalysis() {
-  const { scores, isLoading } = useCallScores();
+  const { aggregates, isLoading } = useCallAggregates();
 
-  // Format the data for the chart if scores exist
+  // Average score per time-into-call bucket, in call order
   const chartData = React.useMemo(() => {
-    if (!scores || scores.length === 0) return [];
+    if (!aggregates?.scoreBuckets) return [];
 
-    return scores.map((score) => ({
-      timestamp: score.timestamp || '',
-      politenessScore: Number(score.politenessScore) || 0,
-    }));
-  }, [scores]);
+    return Object.entries(aggregates.scoreBuckets)
+      .map(([start, bucket]) => ({
+        secondsIntoCall: Number(start),
+        politenessScore: bucket.n > 0 ? bucket.sum / bucket.n : 0,
+      }))
+      .sort((a, b) => a.secondsIntoCall - b.secondsIntoCall);
+  }, [aggregates]);
 
-  // Get the latest politeness score if available
-  const latestScore = React.useMemo(() => {
-    if (!scores || scores.length === 0) return null;
-    return Number(scores[scores.length - 1].politenessScore) || 0;
-  }, [scores]);
+  const latestScore =
+    aggregates?.latestScore != null ? Number(aggregates.latestScore) : null;
 
   // Loading state
   if (isLoading) {
@@ -41,7 +40,7 @@ export function AgentAnalysis() {
   }
 
   // Empty state
-  if (!scores || scores.length === 0) {
+  if (!aggregates || aggregates.scoreCount === 0) {
     return (
       <Card className='min-h-[300px]'>
         <CardHeader className='flex flex-row items-center justify-between pb-2'>
@@ -72,10 +71,16 @@ export function AgentAnalysis() {
             <p className='text-3xl font-bold mt-1 mb-2'>
               {latestScore !== null ? latestScore.toFixed(2) : 'N/A'}
             </p>
+            <p className='text-xs text-muted-foreground mb-2'>
+              Avg {Number(aggregates.avgScore).toFixed(2)} · Min{' '}
+              {Number(aggregates.minScore).toFixed(2)} · Max{' '}
+              {Number(aggregates.maxScore).toFixed(2)} · {aggregates.eventCount}{' '}
+              {aggregates.eventCount === 1 ? 'issue' : 'issues'}
+            </p>
             {chartData.length > 0 && (
               <AreaChart
                 data={chartData}
-                index='timestamp'
+                index='secondsIntoCall'
                 categories={['politenessScore']}
                 showXAxis={false}
                 showGridLines={false}
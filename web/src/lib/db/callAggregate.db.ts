@@ -0,0 +1,36 @@
+import {
+  pgTable,
+  text,
+  integer,
+  jsonb,
+  timestamp,
+  decimal,
+} from 'drizzle-orm/pg-core';
+
+// Maintained by the backend as events and scores are written, so the
+// dashboard can read per-call totals without scanning call_events/call_scores
+export const callAggregateTable = pgTable('call_aggregates', {
+  call_id: text('call_id').primaryKey(),
+  eventCount: integer('event_count').notNull(),
+  eventCounts: jsonb('event_counts').$type<Record<string, number>>().notNull(),
+  scoreCount: integer('score_count').notNull(),
+  scoreSum: decimal('score_sum', { precision: 12, scale: 2 }).notNull(),
+  minScore: decimal('min_score', { precision: 10, scale: 2 }),
+  maxScore: decimal('max_score', { precision: 10, scale: 2 }),
+  avgScore: decimal('avg_score', { precision: 10, scale: 2 }),
+  latestScore: decimal('latest_score', { precision: 10, scale: 2 }),
+  // Scores by time into the call: bucket start (seconds) -> count and sum
+  scoreBuckets: jsonb('score_buckets')
+    .$type<Record<string, { n: number; sum: number }>>()
+    .notNull(),
+  updatedEpoch: integer('updated_epoch').notNull(),
+  messageCount: integer('message_count').notNull(),
+  userMessages: integer('user_messages').notNull(),
+  assistantMessages: integer('assistant_messages').notNull(),
+  injectedMessages: integer('injected_messages').notNull(),
+  duration: integer('duration').notNull(),
+  finalScore: decimal('final_score', { precision: 10, scale: 2 }),
+  finalizedAt: timestamp('finalized_at', { mode: 'string' }),
+});
+
+export type CallAggregateEntity = typeof callAggregateTable.$inferSelect;
@@ -0,0 +1,26 @@
+import { CallAggregateEntity } from '@/lib/db/callAggregate.db';
+import { useQuery } from '@tanstack/react-query';
+import { useCurrentCallId } from '@/lib/getPathParam';
+
+export const useCallAggregates = () => {
+  const callId = useCurrentCallId();
+
+  const query = useQuery({
+    queryKey: ['call', callId, 'aggregates'],
+    queryFn: async () => {
+      const response = await fetch(`/api/calls/${callId}/aggregates`);
+
+      if (!response.ok) {
+        throw new Error('Failed to fetch aggregates');
+      }
+
+      return response.json() as Promise<CallAggregateEntity | null>;
+    },
+    refetchInterval: 2500,
+  });
+
+  return {
+    aggregates: query.data,
+    ...query,
+  };
+};